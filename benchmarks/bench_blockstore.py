@@ -0,0 +1,44 @@
+"""Pickled Blockchain vs the append-only BlockStore: open and append cost as the chain grows.
+
+Run with ``python benchmarks/bench_blockstore.py [n_blocks] [payload_rows]``.
+"""
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "pybacktestchain_options"))
+from blockstore import BlockStore  # noqa: E402
+from pybacktestchain.blockchain import Blockchain  # noqa: E402
+
+
+def main(n_blocks=200, payload_rows=2_000):
+    os.chdir(tempfile.mkdtemp())
+    os.makedirs("blockchain")
+    payload = pd.DataFrame(np.random.default_rng(0).normal(size=(payload_rows, 6))).to_string()
+    chain, store = Blockchain("legacy"), BlockStore("store")
+    print(f"{'blocks':>6} {'pickle open (ms)':>17} {'pickle add (ms)':>16} {'store open (ms)':>16} {'store add (ms)':>15}")
+    for i in range(1, n_blocks + 1):
+        start = time.perf_counter()
+        chain.add_block(f"bt{i}", payload + str(i))
+        pickle_add = time.perf_counter() - start
+        start = time.perf_counter()
+        store.add_block(f"bt{i}", payload + str(i))
+        store_add = time.perf_counter() - start
+        if i in (1, 10, 50) or i % 100 == 0:
+            start = time.perf_counter()
+            with open("blockchain/legacy.pkl", "rb") as f:
+                pickle.load(f)
+            pickle_open = time.perf_counter() - start
+            start = time.perf_counter()
+            BlockStore("store").last_hash
+            store_open = time.perf_counter() - start
+            print(f"{i:>6} {1e3 * pickle_open:>17.2f} {1e3 * pickle_add:>16.2f} {1e3 * store_open:>16.2f} {1e3 * store_add:>15.2f}")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
@@ -0,0 +1,46 @@
+"""Vectorized spread engine vs the CommoBroker.update_pos loop on 20 years of synthetic curves.
+
+Run with ``python benchmarks/bench_engine.py [n_days]``.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "pybacktestchain_options"))
+from broker import CommoBroker  # noqa: E402
+
+
+def prices(n_days, n_commo, seed=0):
+    rng = np.random.default_rng(seed)
+    near = 50 + np.cumsum(rng.normal(0, 0.5, (n_days, n_commo)), axis=0)
+    long = near + rng.normal(0, 1, (n_days, n_commo))
+    return np.abs(near) + 1, np.abs(long) + 1
+
+
+def main(n_days=5_000):
+    calendar = pd.bdate_range("2000-01-03", periods=n_days)
+    valid = np.ones(n_days, dtype=bool)
+    print(f"{'curves':>6} {'loop (s)':>9} {'vectorized (s)':>15} {'speed-up':>9}")
+    for n_commo in (4, 12, 50, 200, 500):
+        near, long = prices(n_days, n_commo)
+        commodities = [f"C{j}" for j in range(n_commo)]
+
+        broker = CommoBroker(1e12, verbose=False)
+        start = time.perf_counter()
+        for i, t in enumerate(calendar):
+            for j, commodity in enumerate(commodities):
+                broker.update_pos(commodity, 1, 1, near[i, j], long[i, j], t)
+        loop = time.perf_counter() - start
+
+        broker = CommoBroker(1e12, verbose=False)
+        start = time.perf_counter()
+        broker.execute_spread_book(calendar, commodities, near, long, valid)
+        vectorized = time.perf_counter() - start
+        print(f"{n_commo:>6} {loop:>9.3f} {vectorized:>15.3f} {loop / vectorized:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
@@ -0,0 +1,35 @@
+"""Sequential vs concurrent get_commodities_data against a local provider with injected latency.
+
+Run with ``python benchmarks/bench_fetch.py [latency_ms]``.
+"""
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "pybacktestchain_options"))
+from data_module import COMMODITY_TICKER_PAIRS, SyntheticProvider, get_commodities_data  # noqa: E402
+
+
+def timed_fetch(provider, **kwargs):
+    start = time.perf_counter()
+    data = get_commodities_data(COMMODITY_TICKER_PAIRS, "2020-01-01", "2024-01-01", provider=provider, **kwargs)
+    return time.perf_counter() - start, len(data)
+
+
+def main(latency_ms=200):
+    logging.getLogger().setLevel(logging.ERROR)
+    provider = SyntheticProvider(latency=latency_ms / 1000)
+    provider.history("warm-up", "2020-01-01", "2020-01-02")
+    n_legs = 2 * len(COMMODITY_TICKER_PAIRS)
+
+    print(f"legs: {n_legs}, latency per call: {latency_ms} ms")
+    elapsed, rows = timed_fetch(provider)
+    print(f"sequential:        {elapsed * 1e3:8.0f} ms ({rows} rows)")
+    for workers in (2, 4, n_legs):
+        elapsed, rows = timed_fetch(provider, max_workers=workers)
+        print(f"max_workers={workers:<3}    {elapsed * 1e3:8.0f} ms ({rows} rows)")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
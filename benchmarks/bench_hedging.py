@@ -0,0 +1,30 @@
+"""Delta hedge simulation throughput: many paths and rehedge frequencies in one simulate_hedge call.
+
+Run with ``python benchmarks/bench_hedging.py [n_paths] [n_steps]``.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "pybacktestchain_options"))
+from hedging import simulate_hedge  # noqa: E402
+from monte_carlo import OptionBook, PathModel  # noqa: E402
+
+
+def main(n_paths=2_000, n_steps=252):
+    paths = PathModel(S0=100.0, mu=0.0, sigma=0.25).sample(n_paths, n_steps, 1.0, seed=0)
+    book = OptionBook.straddle(100.0, 1.0)
+    frequencies = (1, 2, 5, 10, 21)
+
+    start = time.perf_counter()
+    result = simulate_hedge(book, paths, r=0.03, sigma=0.2, rehedge_every=frequencies, cost=0.0005)
+    elapsed = time.perf_counter() - start
+
+    cells = len(frequencies) * n_paths * (n_steps + 1)
+    print(f"paths x steps:      {n_paths} x {n_steps}, {len(frequencies)} rehedge frequencies")
+    print(f"simulate_hedge:     {elapsed:>10.3f} s ({cells / elapsed:,.0f} path-steps/s)")
+    print(result.summary().round(3).to_string())
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
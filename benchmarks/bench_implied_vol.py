@@ -0,0 +1,48 @@
+"""Vectorized implied-volatility solve of a full chain against a per-quote scipy root-finder loop.
+
+Run with ``python benchmarks/bench_implied_vol.py [n_quotes]``.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.optimize import brentq
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "pybacktestchain_options"))
+from utils import OptionUtils  # noqa: E402
+from bench_pricing import make_book  # noqa: E402
+
+
+def per_quote(prices, book, n):
+    for i in range(n):
+        option_type = "call" if book["is_call"][i] else "put"
+        args = (book["S"][i], book["K"][i], book["T"][i], book["r"])
+        try:
+            brentq(lambda v: OptionUtils.black_scholes_price(*args, v, option_type) - prices[i], 1e-6, 10.0)
+        except ValueError:
+            pass
+
+
+def main(n=50_000):
+    book = make_book(n)
+    prices = OptionUtils.price_and_greeks(**book).price
+    quote_args = (prices, book["S"], book["K"], book["T"], book["r"], book["is_call"])
+
+    n_loop = min(n, 500)
+    start = time.perf_counter()
+    per_quote(prices, book, n_loop)
+    loop = (time.perf_counter() - start) / n_loop
+
+    start = time.perf_counter()
+    result = OptionUtils.implied_volatility(*quote_args)
+    batched = time.perf_counter() - start
+
+    print(f"quotes:               {n}")
+    print(f"per-quote brentq:     {loop * n * 1e3:>10.1f} ms (extrapolated from {n_loop})")
+    print(f"implied_volatility:   {batched * 1e3:>10.1f} ms ({result.iterations} iterations, "
+          f"{result.converged.mean():.2%} converged)")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
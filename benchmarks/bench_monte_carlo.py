@@ -0,0 +1,32 @@
+"""Chunked Monte Carlo P&L of a straddle: peak working memory and time against path count.
+
+Run with ``python benchmarks/bench_monte_carlo.py [n_steps] [chunk_size]``.
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "pybacktestchain_options"))
+from monte_carlo import MonteCarloEngine, OptionBook, PathModel  # noqa: E402
+
+
+def main(n_steps=252, chunk_size=20_000):
+    model = PathModel(S0=100, mu=0.05, sigma=0.2, jump_intensity=1.0, jump_mean=-0.05, jump_std=0.1)
+    book = OptionBook.straddle(100, 1.0)
+    print(f"{'paths':>9} {'workers':>7} {'seconds':>8} {'peak MB':>8} {'paths x steps MB':>17}")
+    for n_paths in (20_000, 100_000, 400_000):
+        for workers in sorted({1, os.cpu_count()}):
+            engine = MonteCarloEngine(model, n_paths, n_steps, 1.0, chunk_size, seed=0, max_workers=workers, mark_every=21)
+            tracemalloc.start()
+            start = time.perf_counter()
+            result = engine.run(book, r=0.05)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{n_paths:>9} {workers:>7} {elapsed:>8.2f} {peak / 1e6:>8.1f} {8 * n_paths * n_steps / 1e6:>17.0f}"
+                  f"   VaR99={result.value_at_risk():.2f}")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
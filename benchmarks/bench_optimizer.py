@@ -0,0 +1,89 @@
+"""Batched hedge ratios and minimum variance portfolios against per-call scipy minimize.
+
+Run with ``python benchmarks/bench_optimizer.py [n_days] [n_pairs]``.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.optimize import minimize
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "pybacktestchain_options"))
+from optimizer import min_variance_weights, rolling_hedge_ratios, window_covariances  # noqa: E402
+
+WINDOWS = (20, 60, 120)
+GROSS_LIMIT = 1.5
+
+
+def make_legs(n_days, n_pairs, seed=0):
+    rng = np.random.default_rng(seed)
+    common = rng.normal(0, 0.02, (n_days, n_pairs))
+    basis = rng.normal(0, 0.03, (n_days, 1)) * rng.uniform(0.5, 1.5, n_pairs)  # shared by the spreads
+    near = 50 * np.exp(np.cumsum(common + basis + rng.normal(0, 0.01, (n_days, n_pairs)), axis=0))
+    long = 50 * np.exp(np.cumsum(0.8 * common + rng.normal(0, 0.01, (n_days, n_pairs)), axis=0))
+    return near, long
+
+
+def per_call_hedges(near, long, n):
+    """The optimize_spread way: one 2 x 2 covariance and one minimize per pair, window and day."""
+    dn, dl = np.diff(near, axis=0), np.diff(long, axis=0)
+    calls = [(t, p, w) for w in WINDOWS for p in range(near.shape[1]) for t in range(w, len(near))]
+    for t, p, w in calls[:n]:
+        cov = np.cov(dn[t - w:t, p], dl[t - w:t, p])
+        minimize(lambda x: x @ cov @ x, np.array([1.0, -1.0]),
+                 constraints=[{'type': 'eq', 'fun': lambda x: x[0] - 1}])
+    return len(calls)
+
+
+def per_call_portfolios(cov, n):
+    k = cov.shape[1]
+    constraints = [{'type': 'eq', 'fun': lambda w: w.sum() - 1},
+                   {'type': 'ineq', 'fun': lambda w: GROSS_LIMIT - np.abs(w).sum()}]
+    for c in cov[:n]:
+        minimize(lambda w: w @ c @ w, np.full(k, 1 / k), method='SLSQP', constraints=constraints)
+
+
+def main(n_days=1_000, n_pairs=8):
+    near, long = make_legs(n_days, n_pairs)
+
+    n_loop = 300
+    start = time.perf_counter()
+    n_calls = per_call_hedges(near, long, n_loop)
+    loop = (time.perf_counter() - start) / n_loop
+
+    start = time.perf_counter()
+    rolling_hedge_ratios(near, long, WINDOWS)
+    batched = time.perf_counter() - start
+
+    spreads = np.diff(near - long, axis=0)
+    ends = np.arange(59, len(spreads))
+    start = time.perf_counter()
+    cov = window_covariances(spreads, 60, ends)
+    estimate = time.perf_counter() - start
+
+    start = time.perf_counter()
+    per_call_portfolios(cov, n_loop)
+    slsqp = (time.perf_counter() - start) / n_loop
+
+    start = time.perf_counter()
+    cold = min_variance_weights(cov, GROSS_LIMIT)
+    qp = time.perf_counter() - start
+
+    start = time.perf_counter()
+    warm = min_variance_weights(cov[1:], GROSS_LIMIT, warm_start=cold.weights[:-1])
+    warm_qp = time.perf_counter() - start
+
+    print(f"hedge ratios:         {n_pairs} pairs x {len(WINDOWS)} windows x {n_days} days = {n_calls} problems")
+    print(f"per-call minimize:    {loop * n_calls * 1e3:>10.1f} ms (extrapolated from {n_loop})")
+    print(f"rolling_hedge_ratios: {batched * 1e3:>10.1f} ms")
+    print(f"portfolios:           {len(cov)} windows of {n_pairs} spreads, gross limit {GROSS_LIMIT}")
+    print(f"window_covariances:   {estimate * 1e3:>10.1f} ms")
+    print(f"per-call SLSQP:       {slsqp * len(cov) * 1e3:>10.1f} ms (extrapolated from {n_loop})")
+    print(f"min_variance_weights: {qp * 1e3:>10.1f} ms ({cold.iterations} iterations, "
+          f"{cold.converged.mean():.2%} converged)")
+    print(f"  warm started:       {warm_qp * 1e3:>10.1f} ms ({warm.iterations} iterations)")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
@@ -0,0 +1,36 @@
+"""Cost of the daily valuation stage (performance.evaluate) relative to the simulation.
+
+Run with ``python benchmarks/bench_performance.py [n_days]``.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "pybacktestchain_options"))
+from broker import CommoBroker  # noqa: E402
+from performance import evaluate  # noqa: E402
+from bench_engine import prices  # noqa: E402
+
+
+def main(n_days=5_000):
+    calendar = pd.bdate_range("2000-01-03", periods=n_days)
+    valid = np.ones(n_days, dtype=bool)
+    print(f"{'curves':>6} {'engine (s)':>11} {'evaluate (s)':>13} {'overhead':>9}")
+    for n_commo in (4, 50, 500):
+        near, long = prices(n_days, n_commo)
+        commodities = [f"C{j}" for j in range(n_commo)]
+        broker = CommoBroker(1e12, verbose=False)
+        start = time.perf_counter()
+        result = broker.execute_spread_book(calendar, commodities, near, long, valid)
+        engine = time.perf_counter() - start
+        start = time.perf_counter()
+        evaluate(calendar, commodities, near, long, result.near_qty, result.long_qty, result.cash)
+        valuation = time.perf_counter() - start
+        print(f"{n_commo:>6} {engine:>11.3f} {valuation:>13.4f} {valuation / engine:>8.1%}")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
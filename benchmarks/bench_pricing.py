@@ -0,0 +1,62 @@
+"""Options-per-second of the batched pricer against the per-call scalar OptionUtils path.
+
+Run with ``python benchmarks/bench_pricing.py [n_options]``.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "pybacktestchain_options"))
+from utils import OptionGreeks, OptionUtils  # noqa: E402
+
+
+def make_book(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return dict(
+        S=rng.uniform(50, 150, n),
+        K=rng.uniform(50, 150, n),
+        T=rng.uniform(0.05, 2.0, n),
+        r=0.03,
+        sigma=rng.uniform(0.1, 0.6, n),
+        is_call=rng.random(n) < 0.5,
+    )
+
+
+def scalar_path(book, n):
+    for i in range(n):
+        args = (book["S"][i], book["K"][i], book["T"][i], book["r"], book["sigma"][i])
+        option_type = "call" if book["is_call"][i] else "put"
+        OptionUtils.black_scholes_price(*args, option_type)
+        OptionUtils.delta(*args, option_type)
+        OptionUtils.gamma(*args)
+        OptionUtils.vega(*args)
+        OptionUtils.theta(*args, option_type)
+
+
+def best_of(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(n=50_000):
+    book = make_book(n)
+    n_scalar = min(n, 2_000)  # the scalar path is slow, time a slice and scale
+    scalar = best_of(lambda: scalar_path(book, n_scalar), repeat=1) / n_scalar
+
+    out = OptionGreeks.empty(n)
+    batched = best_of(lambda: OptionUtils.price_and_greeks(out=out, **book)) / n
+
+    print(f"options:            {n}")
+    print(f"scalar path:        {1 / scalar:>14,.0f} options/s (price + 4 Greeks)")
+    print(f"price_and_greeks:   {1 / batched:>14,.0f} options/s (out= buffers)")
+    print(f"speed-up:           {scalar / batched:>14,.0f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
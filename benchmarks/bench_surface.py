@@ -0,0 +1,58 @@
+"""Repricing a strike x maturity surface at a new spot: SurfacePricer against price_and_greeks on the grid.
+
+Run with ``python benchmarks/bench_surface.py [n_strikes] [n_maturities]``.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "pybacktestchain_options"))
+from surface import SurfacePricer  # noqa: E402
+from utils import OptionGreeks, OptionUtils  # noqa: E402
+
+
+def best_of(fn, repeat=20):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(n_strikes=200, n_maturities=40):
+    strikes = np.linspace(50, 150, n_strikes)
+    maturities = np.linspace(1 / 52, 3.0, n_maturities)
+    sigma = np.linspace(0.35, 0.2, n_maturities)[:, None]
+    T, K = np.meshgrid(maturities, strikes, indexing="ij")
+    sigma_grid = np.broadcast_to(sigma, T.shape)
+    spots = 100 + np.random.default_rng(0).standard_normal(100).cumsum() * 0.1
+    n = T.size * len(spots)
+
+    out = OptionGreeks.empty(T.shape)
+
+    def grid():
+        for S in spots:
+            OptionUtils.price_and_greeks(S, K, T, 0.03, sigma_grid, True, out=out)
+
+    pricer = SurfacePricer(strikes, maturities, r=0.03, sigma=sigma)
+
+    def surface():
+        for S in spots:
+            pricer.price(S, out=out)
+
+    build = best_of(lambda: SurfacePricer(strikes, maturities, r=0.03, sigma=sigma))
+    baseline = best_of(grid, repeat=5) / n
+    cached = best_of(surface, repeat=5) / n
+
+    print(f"grid:               {n_maturities} x {n_strikes}, {len(spots)} spot ticks")
+    print(f"price_and_greeks:   {1 / baseline:>14,.0f} options/s (out= buffers)")
+    print(f"SurfacePricer:      {1 / cached:>14,.0f} options/s (cached intermediates)")
+    print(f"speed-up:           {baseline / cached:>14.2f}x")
+    print(f"cache build:        {build * 1e6:>14,.0f} us")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
@@ -0,0 +1,37 @@
+"""Parameter sweep of CommoBackTest runs, serially and across process pools.
+
+Scaling is bounded by the number of cores of the machine.
+
+Run with ``python benchmarks/bench_sweep.py [n_configs]``.
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "pybacktestchain_options"))
+from data_module import COMMODITY_TICKER_PAIRS, SyntheticProvider  # noqa: E402
+from sweep import BacktestSweep, expand_grid  # noqa: E402
+
+
+def main(n_configs=32):
+    years = list(range(2000, 2000 + n_configs))
+    grid = expand_grid(initial_date=[datetime(y, 1, 1) for y in years])
+    base = {"final_date": datetime(2000 + n_configs + 10, 1, 1), "commodity_pairs": COMMODITY_TICKER_PAIRS,
+            "verbose": False, "engine": "loop"}
+    logging.getLogger().setLevel(logging.WARNING)
+    os.chdir(tempfile.mkdtemp())
+    print(f"{'workers':>7} {'seconds':>8} {'speed-up':>9}")
+    serial = None
+    for workers in sorted({1, 2, 4, os.cpu_count()}):
+        start = time.perf_counter()
+        BacktestSweep(grid, base, name=f"bench-{workers}", max_workers=workers, provider=SyntheticProvider()).run()
+        elapsed = time.perf_counter() - start
+        serial = serial or elapsed
+        print(f"{workers:>7} {elapsed:>8.2f} {serial / elapsed:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
@@ -0,0 +1,61 @@
+"""Scaling of CommoBroker.log_transaction up to 1M transactions.
+
+Run with ``python benchmarks/bench_transaction_log.py [max_transactions]``.
+"""
+import os
+import sys
+import time
+import warnings
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "pybacktestchain_options"))
+from broker import CommoBroker  # noqa: E402
+
+COMMODITIES = ["CORN", "GAS", "OIL", "WHEAT"]
+ACTIONS = ["Long ST, Short LT", "Long LT, Short ST"]
+
+
+def log_many(n):
+    broker = CommoBroker(1_000_000, verbose=False)
+    dates = pd.date_range("2000-01-03", periods=n // len(COMMODITIES) + 1, freq="min")
+    start = time.perf_counter()
+    for i in range(n):
+        broker.log_transaction(dates[i // len(COMMODITIES)], ACTIONS[i % 2], COMMODITIES[i % 4], i, -i, 1.5, 1)
+    logged = time.perf_counter() - start
+    start = time.perf_counter()
+    frame = broker.get_transaction_log()
+    assert len(frame) == n
+    return logged, time.perf_counter() - start
+
+
+def concat_many(n):
+    """The previous implementation: one pd.concat per logged transaction."""
+    log = pd.DataFrame(columns=["Date", "Action", "Commodity", "Near Term Qty", "Long Term Qty", "Spread", "Cash",
+                                "Portfolio Value"])
+    warnings.simplefilter("ignore", FutureWarning)  # concat with the empty initial frame
+    start = time.perf_counter()
+    for i in range(n):
+        row = pd.DataFrame([{"Date": i, "Action": ACTIONS[i % 2], "Commodity": COMMODITIES[i % 4],
+                             "Near Term Qty": i, "Long Term Qty": -i, "Spread": 1.5, "Cash": 0, "Portfolio Value": 1}])
+        log = pd.concat([log, row], ignore_index=True)
+    return time.perf_counter() - start
+
+
+def main(max_n=1_000_000):
+    print("pd.concat per transaction (previous implementation)")
+    print(f"{'transactions':>12} {'log (s)':>9} {'us/txn':>8}")
+    for n in (1_000, 2_000, 4_000):
+        elapsed = concat_many(n)
+        print(f"{n:>12,} {elapsed:>9.3f} {elapsed / n * 1e6:>8.2f}")
+    print("\ncolumnar TransactionLog")
+    print(f"{'transactions':>12} {'log (s)':>9} {'us/txn':>8} {'to DataFrame (s)':>17}")
+    n = 10_000
+    while n <= max_n:
+        logged, materialised = log_many(n)
+        print(f"{n:>12,} {logged:>9.3f} {logged / n * 1e6:>8.2f} {materialised:>17.3f}")
+        n *= 10
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
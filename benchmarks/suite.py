@@ -0,0 +1,398 @@
+"""Offline benchmark suite: pricing, data pivoting, simulation and persistence on synthetic data.
+
+Every case is timed (best of --repeat rounds, each round looping the case
+for at least --min-time seconds so that sub-millisecond cases are not
+dominated by timer noise) and then run once more under tracemalloc for its
+peak memory. A short reference workload is timed before every round, and
+throughputs are compared relative to it so that a machine that is
+momentarily slower (CPU steal, frequency scaling) does not look like a
+regression. Results are compared with the stored baselines
+(benchmarks/baselines.json): a case regresses when its throughput drops, or
+its peak memory grows, by more than --tolerance. Baselines are machine
+specific, refresh them with --save after an intended change or on a new
+machine.
+
+Run with ``python benchmarks/suite.py [--quick] [--filter NAME] [--save]``.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "pybacktestchain_options"))
+from blockstore import BlockStore  # noqa: E402
+from broker import CommoBroker  # noqa: E402
+from curves import FuturesCurves  # noqa: E402
+from data_module import DataModule, SpreadStrategy  # noqa: E402
+from surface import SurfacePricer  # noqa: E402
+from utils import OptionGreeks, OptionUtils  # noqa: E402
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+YEARS = {"1y": 252, "10y": 2_520, "30y": 7_560}
+NAMED_COMMODITIES = ["CORN", "GAS", "OIL", "WHEAT"]
+
+CASES = []
+
+#---------------------------------------------------------
+# Synthetic data
+#---------------------------------------------------------
+
+def option_book(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return dict(
+        S=rng.uniform(50, 150, n),
+        K=rng.uniform(50, 150, n),
+        T=rng.uniform(0.05, 2.0, n),
+        r=0.03,
+        sigma=rng.uniform(0.1, 0.6, n),
+        is_call=rng.random(n) < 0.5,
+    )
+
+
+def commodities(n):
+    return NAMED_COMMODITIES[:n] + [f"C{j:03d}" for j in range(len(NAMED_COMMODITIES), n)]
+
+
+def futures_prices(n_days, n_commo, seed=0):
+    """(days x commodities) near and long term prices: seeded random walks."""
+    rng = np.random.default_rng(seed)
+    near = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_days, n_commo)), axis=0))
+    long = near * np.exp(rng.normal(0.01, 0.02, (n_days, n_commo)))
+    return near, long
+
+
+def curve_frame(n_days, n_commo, n_tenors, seed=0):
+    """Long get_commodities_data frame of n_commo curves of n_tenors contracts each."""
+    rng = np.random.default_rng(seed)
+    front = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, (n_days, n_commo)), axis=0))
+    carry = np.exp(np.cumsum(rng.normal(0.005, 0.01, (n_days, n_commo, n_tenors)), axis=2))
+    dates = pd.bdate_range("1990-01-02", periods=n_days, tz="America/New_York")
+    contracts = [f"{name} - M{k + 1}" for name in commodities(n_commo) for k in range(n_tenors)]
+    return pd.DataFrame({
+        "Date": np.tile(dates, len(contracts)),
+        "Close": (front[:, :, None] * carry).reshape(n_days, -1).T.ravel(),
+        "Contract": np.repeat(contracts, n_days).astype(object),
+    })
+
+
+def futures_frame(n_days, n_commo, seed=0):
+    """Long frame with the Date / Contract / Close columns of get_commodities_data."""
+    near, long = futures_prices(n_days, n_commo, seed)
+    dates = pd.bdate_range("1990-01-02", periods=n_days, tz="America/New_York")
+    names = commodities(n_commo)
+    contracts = [f"{name} - {term}" for term in ("Near Term", "Long Term") for name in names]
+    close = np.concatenate([near, long], axis=1)
+    return pd.DataFrame({
+        "Date": np.tile(dates, len(contracts)),
+        "Close": close.T.ravel(),
+        "Contract": pd.Categorical(np.repeat(contracts, n_days)).astype(object),
+    })
+
+#---------------------------------------------------------
+# Cases
+#---------------------------------------------------------
+
+def case(name, sizes, unit):
+    """Register a benchmark: setup(size) returns (run, n_units) and run() is what is timed."""
+    def register(setup):
+        CASES.append((name, sizes, unit, setup))
+        return setup
+    return register
+
+
+def history_sizes(*pairs):
+    return [f"{years}x{n}" for years, n in pairs]
+
+
+def parse_history(size):
+    years, n = size.split("x")
+    return YEARS[years], int(n)
+
+
+@case("pricing.scalar", [1_000], "options")
+def scalar_pricing(n):
+    book = option_book(n)
+
+    def run():
+        for i in range(n):
+            args = (book["S"][i], book["K"][i], book["T"][i], book["r"], book["sigma"][i])
+            option_type = "call" if book["is_call"][i] else "put"
+            OptionUtils.black_scholes_price(*args, option_type)
+            OptionUtils.delta(*args, option_type)
+            OptionUtils.gamma(*args)
+            OptionUtils.vega(*args)
+            OptionUtils.theta(*args, option_type)
+    return run, n
+
+
+@case("pricing.price_and_greeks", [1_000, 1_000_000], "options")
+def batched_pricing(n):
+    book = option_book(n)
+    out = OptionGreeks.empty(n)
+    return (lambda: OptionUtils.price_and_greeks(out=out, **book)), n
+
+
+@case("pricing.implied_volatility", [1_000, 1_000_000], "options")
+def implied_volatility(n):
+    book = option_book(n)
+    price = OptionUtils.price_and_greeks(**book).price
+    return (lambda: OptionUtils.implied_volatility(price, book["S"], book["K"], book["T"], book["r"],
+                                                   book["is_call"])), n
+
+
+@case("pricing.surface", [1_000, 1_000_000], "options")
+def surface(n):
+    n_maturities = 10 if n < 100_000 else 100
+    pricer = SurfacePricer(np.linspace(50, 150, n // n_maturities), np.linspace(0.05, 3.0, n_maturities),
+                           r=0.03, sigma=0.25)
+    out = OptionGreeks.empty(pricer.shape)
+    return (lambda: pricer.price(101.0, out=out)), n
+
+
+@case("data.set_up_dataframe", history_sizes(("1y", 4), ("10y", 50), ("30y", 500)), "rows")
+def set_up_dataframe(size):
+    data = futures_frame(*parse_history(size))
+    strategy = SpreadStrategy(DataModule(data))
+    return strategy.set_up_dataframe, len(data)
+
+
+@case("data.compute_spread", history_sizes(("1y", 4), ("10y", 50), ("30y", 500)), "rows")
+def compute_spread(size):
+    data = futures_frame(*parse_history(size))
+    return (lambda: SpreadStrategy(DataModule(data)).compute_spread()), len(data)
+
+
+@case("data.futures_curves", history_sizes(("1y", 4), ("10y", 30)), "rows")
+def futures_curves(size):
+    """Build 12-tenor curves and take every calendar spread and butterfly off them."""
+    n_days, n_commo = parse_history(size)
+    data = curve_frame(n_days, n_commo, 12)
+
+    def run():
+        curves = FuturesCurves.from_frame(data)
+        for k in range(1, 12):
+            curves.calendar_spread(0, k)
+        for k in range(1, 11):
+            curves.butterfly(k - 1, k, k + 1)
+    return run, len(data)
+
+
+@case("data.aligned_legs", history_sizes(("1y", 4), ("10y", 50), ("30y", 500)), "rows")
+def aligned_legs(size):
+    n_days, n_commo = parse_history(size)
+    strategy = SpreadStrategy(DataModule(futures_frame(n_days, n_commo)))
+    strategy.curves()
+    calendar = pd.bdate_range("1990-01-02", periods=n_days)
+    names = commodities(n_commo)
+    return (lambda: strategy.aligned_legs(calendar, names)), 2 * n_days * n_commo
+
+
+@case("strategy.spread_weights", history_sizes(("10y", 8), ("30y", 20)), "portfolios")
+def spread_weights(size):
+    """Hedge ratios for three windows and a daily rebalanced minimum variance book of the spreads."""
+    n_days, n_commo = parse_history(size)
+    strategy = SpreadStrategy(DataModule(futures_frame(n_days, n_commo)))
+    strategy.curves()
+
+    def run():
+        strategy.hedge_ratios([20, 60, 120])
+        strategy.spread_weights(window=60, gross_limit=1.5)
+    return run, n_days - 61
+
+
+@case("simulation.update_pos", history_sizes(("1y", 4), ("10y", 50)), "updates")
+def update_pos(size):
+    n_days, n_commo = parse_history(size)
+    near, long = futures_prices(n_days, n_commo)
+    calendar = pd.bdate_range("1990-01-02", periods=n_days)
+    names = commodities(n_commo)
+
+    def run():
+        broker = CommoBroker(1e12, verbose=False)
+        for i, t in enumerate(calendar):
+            near_t, long_t = near[i], long[i]
+            for j, commodity in enumerate(names):
+                broker.update_pos(commodity, 1, 1, near_t[j], long_t[j], t)
+    return run, n_days * n_commo
+
+
+@case("simulation.spread_book", history_sizes(("1y", 4), ("10y", 50), ("30y", 500)), "updates")
+def spread_book(size):
+    n_days, n_commo = parse_history(size)
+    near, long = futures_prices(n_days, n_commo)
+    calendar = pd.bdate_range("1990-01-02", periods=n_days)
+    valid = np.ones(n_days, dtype=bool)
+    names = commodities(n_commo)
+
+    def run():
+        CommoBroker(1e12, verbose=False).execute_spread_book(calendar, names, near, long, valid)
+    return run, n_days * n_commo
+
+
+@case("simulation.log_transaction", [10_000, 1_000_000], "transactions")
+def log_transaction(n):
+    dates = pd.date_range("2000-01-03", periods=n // 4 + 1, freq="min")
+    actions = ["Long ST, Short LT", "Long LT, Short ST"]
+
+    def run():
+        broker = CommoBroker(1e6, verbose=False)
+        for i in range(n):
+            broker.log_transaction(dates[i // 4], actions[i % 2], NAMED_COMMODITIES[i % 4], i, -i, 1.5, 1)
+        broker.get_transaction_log()
+    return run, n
+
+
+def _payload(rows=500):
+    return pd.DataFrame(np.random.default_rng(0).normal(size=(rows, 6))).to_string()
+
+
+@case("persistence.blockstore_append", [100, 1_000], "blocks")
+def blockstore_append(n):
+    directory = tempfile.mkdtemp()
+    payload = _payload()
+    runs = iter(range(10 ** 6))
+
+    def run():
+        store = BlockStore(f"append{next(runs)}", directory=directory)
+        for i in range(n):
+            store.add_block(f"bt{i}", payload)
+        store.close()
+    return run, n
+
+
+@case("persistence.blockstore_validate", [100, 1_000], "blocks")
+def blockstore_validate(n):
+    directory = tempfile.mkdtemp()
+    store = BlockStore("validate", directory=directory)
+    payload = _payload()
+    for i in range(n):
+        store.add_block(f"bt{i}", payload)
+    store.close()
+
+    def run():
+        reopened = BlockStore("validate", directory=directory)
+        assert reopened.is_valid()
+        reopened.close()
+    return run, n
+
+#---------------------------------------------------------
+# Harness
+#---------------------------------------------------------
+
+_REFERENCE = np.random.default_rng(0).random(50_000)
+
+
+def reference_seconds():
+    """Best time of a fixed interpreter and NumPy workload, the machine speed a case is measured at."""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        total = 0.0
+        for x in _REFERENCE[:20_000].tolist():
+            total += x * x
+        np.sort(_REFERENCE)
+        np.exp(_REFERENCE).sum()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure(setup, size, repeat, min_time=0.0):
+    """Best time of a case, and its best relative throughput: units per reference workload
+    timed right before each round, which cancels out the machine slowing down or speeding up."""
+    run, units = setup(size)
+    run()  # warm up caches and lazy imports
+    start = time.perf_counter()
+    run()
+    loops = max(1, int(min_time / max(time.perf_counter() - start, 1e-9)))
+    best, relative = float("inf"), 0.0
+    for _ in range(repeat):
+        reference = reference_seconds()
+        start = time.perf_counter()
+        for _ in range(loops):
+            run()
+        seconds = (time.perf_counter() - start) / loops
+        best = min(best, seconds)
+        relative = max(relative, units * reference / seconds)
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": best, "throughput": units / best, "relative": relative, "peak_mb": peak / 2 ** 20}
+
+
+def speedup(result, baseline):
+    """Throughput against baseline, machine speed corrected when both were measured with it."""
+    if "relative" in result and "relative" in baseline:
+        return result["relative"] / baseline["relative"]
+    return result["throughput"] / baseline["throughput"]
+
+
+def compare(result, baseline, tolerance):
+    """Names of the metrics of result that regressed against baseline."""
+    regressions = []
+    if speedup(result, baseline) < 1 - tolerance:
+        regressions.append("throughput")
+    # ignore sub-megabyte noise
+    if result["peak_mb"] > baseline["peak_mb"] * (1 + tolerance) + 1:
+        regressions.append("memory")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="only the smallest size of every case")
+    parser.add_argument("--filter", default="", help="only the cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds each timing round loops a case for")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed relative regression")
+    parser.add_argument("--baseline", default=BASELINES)
+    parser.add_argument("--save", action="store_true", help="store the results as the new baselines")
+    args = parser.parse_args(argv)
+    logging.getLogger().setLevel(logging.ERROR)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)["results"]
+
+    results, failed = {}, []
+    print(f"{'case':<40} {'throughput (/s)':>28} {'peak (MB)':>10} {'vs baseline':>12}")
+    for name, sizes, unit, setup in CASES:
+        if args.filter not in name:
+            continue
+        for size in sizes[:1] if args.quick else sizes:
+            key = f"{name}[{size}]"
+            result = results[key] = measure(setup, size, args.repeat, args.min_time)
+            baseline = baselines.get(key)
+            status = ""
+            if baseline:
+                status = f"{speedup(result, baseline):>11.2f}x"
+                regressions = compare(result, baseline, args.tolerance)
+                if regressions:
+                    failed.append((key, regressions))
+                    status += " REGRESSION (" + ", ".join(regressions) + ")"
+            print(f"{key:<40} {result['throughput']:>14,.0f} {unit:<13} {result['peak_mb']:>10.1f} {status}")
+
+    if args.save:
+        merged = {**baselines, **results}
+        with open(args.baseline, "w") as f:
+            json.dump({"machine": platform.platform(), "python": platform.python_version(),
+                       "results": dict(sorted(merged.items()))}, f, indent=1)
+        print(f"baselines saved to {args.baseline}")
+    elif failed:
+        print(f"{len(failed)} regression(s) beyond {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,49 +1,203 @@
-from flask import Flask, request, jsonify
+import threading
 from datetime import datetime
-from universal_backtest import UniversalBackTest  
+from functools import partial
+import json
+import logging
+from jobs import JobQueue, QueueFull, DONE, FAILED
+from result_cache import ResultCache, canonical_hash, data_fingerprint
+from streaming import EventStream, run_streamed
+from instrumentation import Instrumentation
 
-app = Flask(__name__)
 
-@app.route('/run_backtest', methods=['POST'])
+def parse_backtest_request(data):
+    """Validate a /run_backtest payload. Returns the job payload, or raises ValueError."""
+    data = data or {}
+    commo_equity = data.get('commo_equity', 'COMMO')
+    if commo_equity not in ['COMMO', 'EQUITY']:
+        raise ValueError("Invalid value for commo_equity. Must be 'COMMO' or 'EQUITY'.")
 
-
-def run_backtest():
+    initial_date = data.get('initial_date')
+    final_date = data.get('final_date')
     try:
-        data = request.json
+        datetime.strptime(initial_date, '%Y-%m-%d')
+        datetime.strptime(final_date, '%Y-%m-%d')
+    except (ValueError, TypeError):
+        raise ValueError("Invalid date format. Use YYYY-MM-DD.")
+
+    cash = data.get('cash', 1000000)  # Valeur par défaut de 1 000 000
+    if isinstance(cash, bool) or not isinstance(cash, (int, float)) or cash <= 0:
+        raise ValueError("Cash must be a positive number.")
+
+    verbose = data.get('verbose', True)
+    payload = {'commo_equity': commo_equity, 'initial_date': initial_date, 'final_date': final_date,
+               'cash': cash, 'verbose': verbose}
+    # cProfile / tracemalloc captures, only kept in the payload when asked for
+    for flag in ('profile', 'trace_memory'):
+        if data.get(flag):
+            payload[flag] = True
+    return payload
+
+
+def run_universal_backtest(payload, listener=None, cache_dir=None):
+    """Default job runner: run the UniversalBackTest of a parsed payload and summarise it,
+    with the per-stage timings of the run. listener receives the events of a COMMO
+    backtest as it runs, cache_dir is its market data cache."""
+    # imported here, the API itself does not need the backtest stack (pandas, pybacktestchain)
+    from universal_backtest import UniversalBackTest
+
+    instrumentation = Instrumentation(profile=payload.get('profile', False),
+                                      trace_memory=payload.get('trace_memory', False))
+
+    backtest = UniversalBackTest(
+        initial_date=datetime.strptime(payload['initial_date'], '%Y-%m-%d'),
+        final_date=datetime.strptime(payload['final_date'], '%Y-%m-%d'),
+        commo_equity=payload['commo_equity'],
+        cash=payload['cash'],
+        verbose=payload['verbose'],
+        listener=listener,
+        instrumentation=instrumentation,
+        cache_dir=cache_dir,
+    )
+    backtest.run_backtest()
+    log = backtest.backtest.broker.get_transaction_log()
+    return {
+        "backtest_name": backtest.backtest_name,
+        "final_value": getattr(backtest.backtest, 'final_value', None),
+        "transactions": json.loads(log.to_json(orient='records', date_format='iso')),
+        "timings": instrumentation.report(),
+    }
+
+
+def backtest_fingerprint(payload, market_cache=None, today=None):
+    """Default data version of a parsed payload: its settled window, the provider of its
+    prices and, with a MarketDataCache, the fetch time and cached ranges of its tickers.
+    Changing the provider or refetching past bars changes it."""
+    if payload['commo_equity'] != 'COMMO':
+        return data_fingerprint(payload['final_date'], 'pybacktestchain', today=today)
+    from data_module import YFinanceProvider
+    from universal_backtest import DEFAULT_COMMODITY_PAIRS
+
+    versions = None
+    if market_cache is not None:
+        tickers = sorted({ticker for legs in DEFAULT_COMMODITY_PAIRS.values() for ticker in legs.values()})
+        versions = market_cache.versions(tickers, payload['initial_date'], payload['final_date'])
+    source = f"{YFinanceProvider.__module__}.{YFinanceProvider.__qualname__}"
+    return data_fingerprint(payload['final_date'], source, versions, today)
+
 
-        commo_equity = data.get('commo_equity', 'COMMO')
-        if commo_equity not in ['COMMO', 'EQUITY']:
-            return jsonify({"error": "Invalid value for commo_equity. Must be 'COMMO' or 'EQUITY'."}), 400
+def result_key(payload, fingerprint=backtest_fingerprint):
+    """Result cache key of a parsed payload. verbose only changes the logging, not the result."""
+    config = {name: value for name, value in payload.items() if name != 'verbose'}
+    return canonical_hash(config, fingerprint(payload))
+
+
+def create_app(runner=None, db_path='jobs.sqlite', max_workers=2, max_queue=16,
+               results_dir='results', max_results=1000, fingerprint=None,
+               max_streams=4, stream_buffer=1024, market_data_dir=None):
+    """Build the API. Backtests run as background jobs of a JobQueue stored in db_path.
+
+    POST /run_backtest answers 202 with a job id (429 when max_queue jobs are
+    already waiting), GET /jobs/<id> gives the status and timings of a job and
+    GET /jobs/<id>/result its result once done.
+
+    Results are kept in a ResultCache in results_dir (None disables it), keyed by
+    the request and fingerprint(payload), the version of the market data it
+    covers (backtest_fingerprint by default, which reads the MarketDataCache of
+    market_data_dir that the default runner fetches through). A request already
+    computed is answered at once with its result, identical requests in flight
+    share a single run.
+
+    POST /stream_backtest runs the backtest right away and streams its events
+    (transactions, daily portfolio values, then done or error) as
+    newline-delimited JSON. At most stream_buffer events wait for a slow client
+    before the backtest pauses, and at most max_streams streams run at once."""
+    from flask import Flask, Response, request, jsonify, stream_with_context
+
+    app = Flask(__name__)
+    runner = runner or partial(run_universal_backtest, cache_dir=market_data_dir)
+    cache = ResultCache(results_dir, max_entries=max_results) if results_dir else None
+    if fingerprint is None:
+        market_cache = None
+        if market_data_dir:
+            from market_cache import MarketDataCache
+            market_cache = MarketDataCache(market_data_dir, verbose=False)
+        fingerprint = partial(backtest_fingerprint, market_cache=market_cache)
+
+    def run_job(payload):
+        if cache is None:
+            return runner(payload)
+        key = result_key(payload, fingerprint)
+        result, hit = cache.get_or_compute(key, lambda: runner(payload))
+        # the run may have filled the market data cache, file the result under the data it used too
+        used = result_key(payload, fingerprint)
+        if not hit and used != key:
+            cache.put(used, result)
+        return result
+
+    jobs = JobQueue(run_job, db_path, max_workers, max_queue)
+    app.config['JOBS'] = jobs
+    app.config['RESULTS'] = cache
+    streams = threading.BoundedSemaphore(max_streams)
+
+    @app.route('/run_backtest', methods=['POST'])
+    def run_backtest():
+        try:
+            payload = parse_backtest_request(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if cache is not None:
+            result = cache.get(result_key(payload, fingerprint))
+            if result is not None:
+                return jsonify({"message": "Backtest already computed.", "status": DONE, "cached": True,
+                                "result": result})
+        try:
+            job_id = jobs.submit(payload)
+        except QueueFull as e:
+            return jsonify({"error": str(e)}), 429, {'Retry-After': '5'}
+        return jsonify({"message": "Backtest queued.", "job_id": job_id, "status": "queued",
+                        "status_url": f"/jobs/{job_id}", "result_url": f"/jobs/{job_id}/result"}), 202
 
-        initial_date = data.get('initial_date')
-        final_date = data.get('final_date')
+    @app.route('/stream_backtest', methods=['POST'])
+    def stream_backtest():
         try:
-            initial_date = datetime.strptime(initial_date, '%Y-%m-%d')
-            final_date = datetime.strptime(final_date, '%Y-%m-%d')
-        except (ValueError, TypeError):
-            return jsonify({"error": "Invalid date format. Use YYYY-MM-DD."}), 400
+            payload = parse_backtest_request(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if not streams.acquire(blocking=False):
+            return jsonify({"error": f"{max_streams} backtests are already streaming."}), 429, {'Retry-After': '5'}
 
-        cash = data.get('cash', 1000000)  # Valeur par défaut de 1 000 000
-        if not isinstance(cash, (int, float)) or cash <= 0:
-            return jsonify({"error": "Cash must be a positive number."}), 400
+        stream = EventStream(maxsize=stream_buffer)
+        run_streamed(lambda listener: runner(payload, listener=listener), stream)
 
-        verbose = data.get('verbose', True)
+        def cleanup():  # runs once when the response closes, even if it was never iterated
+            stream.cancel()
+            streams.release()
 
-        backtest = UniversalBackTest(
-            initial_date=initial_date,
-            final_date=final_date,
-            commo_equity=commo_equity,
-            cash=cash,
-            verbose=verbose
-        )
+        response = Response(stream_with_context(stream.ndjson()), mimetype='application/x-ndjson')
+        response.call_on_close(cleanup)
+        return response
 
-        backtest.run_backtest()
+    @app.route('/jobs/<job_id>', methods=['GET'])
+    def job_status(job_id):
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify({"error": f"Unknown job {job_id}."}), 404
+        return jsonify(job)
 
-        return jsonify({"message": "Backtest completed successfully!", "backtest_name": backtest.backtest_name})
+    @app.route('/jobs/<job_id>/result', methods=['GET'])
+    def job_result(job_id):
+        job = jobs.get(job_id, with_result=True)
+        if job is None:
+            return jsonify({"error": f"Unknown job {job_id}."}), 404
+        if job['status'] == FAILED:
+            return jsonify({"status": job['status'], "error": job['error']}), 500
+        if job['status'] != DONE:
+            return jsonify({"status": job['status'], "status_url": f"/jobs/{job_id}"}), 202
+        return jsonify({"status": job['status'], "result": job['result']})
 
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return app
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    create_app(market_data_dir='market_data').run()  # no reloader: it would build the app, and its job queue, twice
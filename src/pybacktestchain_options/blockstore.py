@@ -0,0 +1,244 @@
+import hashlib
+import logging
+import mmap
+import os
+import pickle
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialised within the process
+    fcntl = None
+
+from pybacktestchain.blockchain import Block
+
+# One record per block: header, UTF-8 backtest name, zlib-compressed data.
+# The header holds a magic, the timestamp, the name and payload lengths and
+# the previous and own hashes (hex, the genesis previous hash is '0').
+_HEADER = struct.Struct('<4sdHI64s64s')
+_MAGIC = b'BLK1'
+# The index is one little-endian uint64 offset per block into the data file
+_OFFSET = struct.Struct('<Q')
+
+# One lock per data file, shared by every BlockStore of the process opened on it
+_APPEND_LOCKS = {}
+_APPEND_LOCKS_GUARD = threading.Lock()
+
+
+def _block_hash(timestamp, name, data, previous_hash):
+    """Same hash as pybacktestchain.blockchain.Block."""
+    return hashlib.sha256((str(timestamp) + name + data + previous_hash).encode()).hexdigest()
+
+
+@contextmanager
+def _append_lock(data_path):
+    """Hold the append lock of a data file: a threading.Lock within the process and an
+    exclusive flock across processes."""
+    key = os.path.abspath(data_path)
+    with _APPEND_LOCKS_GUARD:
+        lock = _APPEND_LOCKS.setdefault(key, threading.Lock())
+    with lock, open(data_path, 'ab') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+#---------------------------------------------------------
+# Classes
+#---------------------------------------------------------
+
+@dataclass
+class BlockStore:
+    """Append-only, log-structured replacement for the pickled Blockchain.
+
+    Blocks are appended to {name}.blocks as fixed-header records with
+    length-prefixed compressed payloads, and their offsets to {name}.idx.
+    Opening reads no block, appending writes only the new record and offset,
+    and any block is read back through a memory map of the two files. Blocks
+    and hashes are those of pybacktestchain's Block, so the chain of an
+    existing pickle migrates unchanged (see from_pickle).
+
+    Appends hold a lock on the data file from reading the last hash to
+    writing the offset, so threads and processes sharing a chain keep it
+    valid.
+    """
+    name: str
+    directory: str = 'blockchain'
+    level: int = 1  # zlib compression level of the payloads
+    sync: bool = False  # fsync every append
+    _maps: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        os.makedirs(self.directory, exist_ok=True)
+        data_path, index_path = self.paths
+        for path in (data_path, index_path):
+            if not os.path.exists(path):
+                open(path, 'ab').close()
+        with _append_lock(data_path):
+            # drop a partially written offset left by an interrupted append
+            size = os.path.getsize(index_path)
+            if size % _OFFSET.size:
+                os.truncate(index_path, size - size % _OFFSET.size)
+            if len(self) == 0:
+                _write_record(data_path, index_path, Block('Genesis Block', '', '0'), self.level, self.sync)
+
+    @property
+    def paths(self):
+        base = os.path.join(self.directory, self.name)
+        return base + '.blocks', base + '.idx'
+
+    @classmethod
+    def exists(cls, name, directory='blockchain'):
+        return os.path.exists(os.path.join(directory, name + '.idx'))
+
+    def __len__(self):
+        return os.path.getsize(self.paths[1]) // _OFFSET.size
+
+    def _map(self, path):
+        """Memory map of path, remapped once the file has grown past it."""
+        size = os.path.getsize(path)
+        mapped = self._maps.get(path)
+        if mapped is None or len(mapped) < size:
+            if mapped is not None:
+                mapped.close()
+            with open(path, 'rb') as f:
+                mapped = self._maps[path] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return mapped
+
+    def _offset(self, i):
+        return _OFFSET.unpack_from(self._map(self.paths[1]), i * _OFFSET.size)[0]
+
+    def _header(self, i):
+        data = self._map(self.paths[0])
+        offset = self._offset(i)
+        magic, timestamp, name_len, payload_len, previous_hash, hash_ = _HEADER.unpack_from(data, offset)
+        if magic != _MAGIC:
+            raise ValueError(f"Corrupt block {i} in {self.paths[0]}")
+        return data, offset, timestamp, name_len, payload_len, previous_hash.rstrip(b'\0').decode(), hash_.rstrip(b'\0').decode()
+
+    def hash(self, i):
+        """Hash of block i, read from its header only."""
+        return self._header(i)[-1]
+
+    @property
+    def last_hash(self):
+        return self.hash(len(self) - 1)
+
+    def __getitem__(self, i):
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(i)
+        data, offset, timestamp, name_len, payload_len, previous_hash, hash_ = self._header(i)
+        start = offset + _HEADER.size
+        name = data[start:start + name_len].decode()
+        payload = zlib.decompress(data[start + name_len:start + name_len + payload_len]).decode()
+        block = Block(name, payload, previous_hash, timestamp)
+        block.hash = hash_  # as stored, is_valid checks it against the content
+        return block
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def chain(self):
+        """All blocks as a list, for code written against Blockchain.chain."""
+        return list(self)
+
+    def add_block(self, name: str, data: str):
+        """Append a block chained to the last one and return it."""
+        with _append_lock(self.paths[0]):
+            block = Block(name, data, self.last_hash)
+            _write_record(*self.paths, block, self.level, self.sync)
+        return block
+
+    def store(self):
+        """Blocks are persisted as they are added, kept for Blockchain compatibility."""
+
+    def is_valid(self):
+        previous_hash = None
+        for block in self:
+            if block.hash != _block_hash(block.timestamp, block.name_backtest, block.data, block.previous_hash):
+                return False
+            if previous_hash is not None and block.previous_hash != previous_hash:
+                return False
+            previous_hash = block.hash
+        return True
+
+    def close(self):
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps.clear()
+
+    def remove_blockchain(self):
+        self.close()
+        for path in self.paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def __str__(self):
+        to_return = ''
+        for i, block in enumerate(self):
+            to_return += "-" * 80 + '\n'
+            to_return += f"Block {i}\n"
+            to_return += "-" * 80 + '\n'
+            to_return += f"Backtest: {block.name_backtest}\n"
+            to_return += f"Timestamp: {block.timestamp}\n"
+            to_return += f"Hash: {block.hash}\n"
+            to_return += f"Previous Hash: {block.previous_hash}\n"
+            to_return += "-" * 80 + '\n'
+        return to_return
+
+    @classmethod
+    def from_pickle(cls, name, directory='blockchain', **kwargs):
+        """Migrate blockchain/{name}.pkl to a block store, keeping every block and hash.
+        The pickle is left in place."""
+        with open(os.path.join(directory, f'{name}.pkl'), 'rb') as f:
+            blockchain = pickle.load(f)
+        base = os.path.join(directory, name)
+        data_path, index_path = base + '.blocks', base + '.idx'
+        # write the index last, an interrupted migration is then redone on the next open
+        for path in (data_path, index_path + '.tmp'):
+            open(path, 'wb').close()
+        for block in blockchain.chain:
+            _write_record(data_path, index_path + '.tmp', block, kwargs.get('level', 1), False)
+        os.replace(index_path + '.tmp', index_path)
+        logging.info(f"Migrated {len(blockchain.chain)} blocks of {name}.pkl to {data_path}.")
+        return cls(name, directory, **kwargs)
+
+
+def _write_record(data_path, index_path, block, level, sync):
+    """Append one block record and then its offset, under the _append_lock of data_path
+    when others may append too."""
+    name = block.name_backtest.encode()
+    payload = zlib.compress(block.data.encode(), level)
+    header = _HEADER.pack(_MAGIC, block.timestamp, len(name), len(payload),
+                          block.previous_hash.encode(), block.hash.encode())
+    # the record goes first, so an offset never points to a partial block
+    with open(data_path, 'ab') as f:
+        offset = f.seek(0, os.SEEK_END)
+        f.write(header + name + payload)
+        f.flush()
+        if sync:
+            os.fsync(f.fileno())
+    with open(index_path, 'ab') as f:
+        f.write(_OFFSET.pack(offset))
+        f.flush()
+        if sync:
+            os.fsync(f.fileno())
+
+
+def open_blockchain(name, directory='blockchain', **kwargs):
+    """Open the block store of name, migrating blockchain/{name}.pkl on first use."""
+    if not BlockStore.exists(name, directory) and os.path.exists(os.path.join(directory, f'{name}.pkl')):
+        return BlockStore.from_pickle(name, directory, **kwargs)
+    return BlockStore(name, directory, **kwargs)
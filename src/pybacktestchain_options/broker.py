@@ -1,59 +1,71 @@
 import pandas as pd
+import numpy as np
 import logging
-from dataclasses import dataclass
+from dataclasses import InitVar, dataclass, field
 from datetime import datetime, timedelta
 
 import os 
-import pickle
-from data_module import get_commodities_data, SpreadStrategy, DataModule
+from data_module import get_commodities_data, SpreadStrategy, DataModule, YFinanceProvider
+from market_cache import MarketDataCache
+from transaction_log import TransactionLog
+from engine import simulate_spread_book
+from performance import evaluate
 from pybacktestchain.utils import generate_random_name
-from pybacktestchain.blockchain import Block, Blockchain
+from blockstore import BlockStore, open_blockchain
+from positions import PositionBook, SpreadPosition
+from instrumentation import NO_INSTRUMENTATION
+from checkpoint import Checkpoint, checkpoint_fingerprint, price_digest
 
-# Setup logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 #---------------------------------------------------------
 # Classes
 #---------------------------------------------------------
 
-@dataclass
-class SpreadPosition:
-    commodity: str
-    near_term_quantity: int
-    long_term_quantity: int
-    entry_spread: float
-
 @dataclass
 class CommoBroker:
     cash: float
-    positions: dict = None
-    transaction_log: pd.DataFrame = None
+    positions: PositionBook = None  # a {commodity: SpreadPosition} dict is converted
+    initial_log: InitVar[pd.DataFrame] = None  # transactions already logged, read back through transaction_log
     verbose: bool = True
-
-    def __post_init__(self):
-        if self.positions is None:
-            self.positions = {}
-
-        if self.transaction_log is None: #no transactions already logged, we set up an empty dataframe with all the columns we want
-            self.transaction_log = pd.DataFrame(columns=['Date', 'Action', 'Commodity', 'Near Term Qty', 'Long Term Qty', 'Spread', 'Cash', 'Portfolio Value'])
+    instrumentation: object = None  # Instrumentation timing log_transaction, None to skip
+    # columnar log behind get_transaction_log, so that logging a trade does not copy the whole history
+    _log: TransactionLog = field(default=None, init=False, repr=False, compare=False)
+    _positions: PositionBook = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self, initial_log):
+        if initial_log is None: #no transactions already logged, we set up an empty log with all the columns we want
+            self._log = TransactionLog()
+        else:
+            self._log = TransactionLog.from_frame(initial_log)
+
+    @property
+    def positions(self):
+        return self._positions
+
+    @positions.setter
+    def positions(self, positions):
+        # the property is also the class level default of the positions field, read as empty
+        if positions is None or isinstance(positions, property):
+            positions = PositionBook()
+        elif not isinstance(positions, PositionBook):
+            positions = PositionBook.from_positions(positions)
+        self._positions = positions
+
+    @property
+    def transaction_log(self):
+        """DataFrame of the logged transactions, a copy: log trades through the broker."""
+        return self._log.to_frame()
     
     def initialize_blockchain(self, name: str):
-        # Check if the blockchain is already initialized and stored in the blockchain folder
-        # if folder blockchain does not exist, create it
-        if not os.path.exists('blockchain'):
-            os.makedirs('blockchain')
-        chains = os.listdir('blockchain')
-        ending = f'{name}.pkl'
-        if ending in chains:
+        # Open the append-only block store of this name in the blockchain folder, creating it
+        # (or migrating blockchain/{name}.pkl) if needed. Opening does not read the blocks.
+        if BlockStore.exists(name):
             if self.verbose:
                 logging.warning(f"Blockchain with name {name} already exists. Please use a different name.")
-            with open(f'blockchain/{name}.pkl', 'rb') as f:
-                self.blockchain = pickle.load(f)
+            self.blockchain = BlockStore(name)
             return
 
-        self.blockchain = Blockchain(name)
-        # Store the blockchain
-        self.blockchain.store()
+        self.blockchain = open_blockchain(name)
 
         if self.verbose:
             logging.info(f"Blockchain with name {name} initialized and stored in the blockchain folder.")
@@ -65,108 +77,134 @@ class CommoBroker:
 
         spread = lt_spread - st_spread
         type_of_transac = "None"
-        if commodity in self.positions: #we look if we already have positionsi n this commodity because we don't want to get too much exposure
+        row = self.positions.row(commodity)
+        if row is not None: #we look if we already have positionsi n this commodity because we don't want to get too much exposure
 
-            position = self.positions[commodity]
+            # work on plain floats and write the row back once
+            near_term_quantity, long_term_quantity = self.positions.quantities(row)
             if spread > 0: #we buy short term and sell long term
                 type_of_transac = "Long ST, Short LT"
-                if position.long_term_quantity > spread:
+                if long_term_quantity > spread:
                     total_cost = spread*(-lt_spread + st_spread) #we can sell enough LT, this is good because it reduces the transavtion cost for the strategy
                     if total_cost < self.cash: #else we can't play and we loose this part
-                        position.near_term_quantity += spread
-                        position.long_term_quantity -= spread
+                        near_term_quantity += spread
+                        long_term_quantity -= spread
                         self.cash -= total_cost
-                elif position.long_term_quantity > 0:
-                    total_cost = - position.long_term_quantity*lt_spread + spread*st_spread #we hedge the maximum we can
+                elif long_term_quantity > 0:
+                    total_cost = - long_term_quantity*lt_spread + spread*st_spread #we hedge the maximum we can
                     if total_cost <= self.cash:
                         self.cash -= total_cost
-                        position.near_term_quantity += spread
-                        position.long_term_quantity = 0
+                        near_term_quantity += spread
+                        long_term_quantity = 0
                     else:
-                        max_total_cost = - position.long_term_quantity*lt_spread + self.cash
+                        max_total_cost = - long_term_quantity*lt_spread + self.cash
                         max_position = max_total_cost / st_spread
-                        position.near_term_quantity += max_position
+                        near_term_quantity += max_position
                         self.cash = 0
-                        position.long_term_quantity = 0
+                        long_term_quantity = 0
 
                 else:
                     total_cost = spread*st_spread
                     if total_cost <= self.cash:
                         self.cash -= total_cost
-                        position.near_term_quantity += spread
+                        near_term_quantity += spread
                     else:
                         max_position = self.cash / st_spread
-                        position.near_term_quantity += max_position
+                        near_term_quantity += max_position
                         self.cash = 0
 
             else: #we sell short term and buy long term
                 type_of_transac = "Long LT, Short ST"
                 spread = -spread
-                if position.near_term_quantity > spread:
+                if near_term_quantity > spread:
                     total_cost = spread*(lt_spread - st_spread)
                     if total_cost <= self.cash:
-                        position.near_term_quantity -= spread
-                        position.long_term_quantity += spread
+                        near_term_quantity -= spread
+                        long_term_quantity += spread
                         self.cash -= total_cost
-                elif position.near_term_quantity > 0:
-                    total_cost = + position.long_term_quantity*lt_spread - spread*st_spread #we hedge the maximum we can
+                elif near_term_quantity > 0:
+                    total_cost = + long_term_quantity*lt_spread - spread*st_spread #we hedge the maximum we can
                     if total_cost <= self.cash:
                         self.cash -= total_cost
-                        position.near_term_quantity = 0
-                        position.long_term_quantity += spread
+                        near_term_quantity = 0
+                        long_term_quantity += spread
                     else:
-                        max_total_cost = - position.near_term_quantity*st_spread + self.cash
+                        max_total_cost = - near_term_quantity*st_spread + self.cash
                         max_position = max_total_cost / lt_spread
-                        position.long_term_quantity += max_position
+                        long_term_quantity += max_position
                         self.cash = 0
-                        position.near_term_quantity = 0
+                        near_term_quantity = 0
                 else:
                     total_cost = spread*lt_spread
                     if total_cost <= self.cash:
                         self.cash -= total_cost
-                        position.long_term_quantity += spread
+                        long_term_quantity += spread
                     else:
                         max_position = self.cash / lt_spread
-                        position.long_term_quantity += max_position
+                        long_term_quantity += max_position
                         self.cash = 0
-            self.positions[commodity] = position
-            self.log_transaction(date, type_of_transac, commodity, position.near_term_quantity, position.long_term_quantity, st_spread, 1)
+            self.positions.set_quantities(row, near_term_quantity, long_term_quantity)
+            self.log_transaction(date, type_of_transac, commodity, near_term_quantity, long_term_quantity, st_spread, 1)
 
         else:
-            self.positions[commodity] = SpreadPosition(commodity, near_qty, long_qty, st_spread)
+            self.positions.add(commodity, near_qty, long_qty, st_spread)
 
 
 
     def log_transaction(self, date, action, commodity, near_qty, long_qty, spread, portfolio_value):
         """Logs the transaction."""
-        transaction = pd.DataFrame([{
-            'Date': date,
-            'Action': action,
-            'Commodity': commodity,
-            'Near Term Qty': near_qty,
-            'Long Term Qty': long_qty,
-            'Spread': spread,
-            'Cash': self.cash,
-            "Portfolio Value": portfolio_value
-        }])
-
-        self.transaction_log = pd.concat([self.transaction_log, transaction], ignore_index=True)
+        if self.instrumentation is None:
+            self._log.append(date, action, commodity, near_qty, long_qty, spread, self.cash, portfolio_value)
+            return
+        with self.instrumentation.stage('log_transaction', rows=1):
+            self._log.append(date, action, commodity, near_qty, long_qty, spread, self.cash, portfolio_value)
+
+    def value_transactions(self, equity: pd.Series):
+        """Fill the Portfolio Value of the logged transactions with the end-of-day value of their date."""
+        self._log.set_portfolio_values(equity.index, equity.to_numpy())
 
     def get_cash_balance(self):
         return self.cash
 
     def get_transaction_log(self):
-        return self.transaction_log
+        return self._log.to_frame()
 
     def get_portfolio_value(self, market_spreads: dict):
-        """Calculates the total portfolio value based on the current market spreads."""
-        portfolio_value = self.cash
-        for commodity, position in self.positions.items():
-            current_spread = market_spreads.get(commodity)
-            print(current_spread)
-            if current_spread is not None:
-                portfolio_value += (current_spread[0]*position.near_term_quantity + current_spread[1]*position.long_term_quantity)
-        return portfolio_value
+        """Calculates the total portfolio value based on the current market spreads,
+        given as {commodity: [near term price, long term price]}."""
+        commodities = [c for c, prices in market_spreads.items() if prices is not None and c in self.positions]
+        prices = np.array([market_spreads[c] for c in commodities], dtype=float).reshape(-1, 2)
+        return self.cash + self.positions.value(commodities, prices[:, 0], prices[:, 1])
+
+    def mark_to_market(self, commodities, near_prices, long_prices):
+        """Cash plus both legs of every position valued at the given near and long term prices."""
+        return self.cash + self.positions.value(commodities, near_prices, long_prices)
+
+    def execute_spread_book(self, calendar, commodities, near, long, valid):
+        """Vectorised equivalent of calling update_pos for every commodity on every valid day.
+
+        near and long are (days x commodities) prices aligned to calendar. Cash,
+        positions and the transaction log end up exactly as with the day by day
+        loop. Returns the engine.SpreadBookResult."""
+        rows = self.positions.rows(commodities)
+        held = rows >= 0
+        state = np.zeros((3, len(commodities)))
+        state[2] = np.nan
+        state[:, held] = [column[rows[held]] for column in
+                          (self.positions.near_qty, self.positions.long_qty, self.positions.entry_spread)]
+        result = simulate_spread_book(
+            near, long, valid, self.cash,
+            near_qty=state[0], long_qty=state[1], held=held, entry_spread=state[2],
+            calendar=calendar, commodities=commodities,
+        )
+        if len(calendar):
+            self.cash = result.cash[-1]
+            opened = result.held[-1]
+            self.positions.set_many([c for c, h in zip(commodities, opened) if h], result.near_qty[-1, opened],
+                                    result.long_qty[-1, opened], result.entry_spread[opened])
+        with (self.instrumentation or NO_INSTRUMENTATION).stage('log_transaction', rows=len(result.log['Date'])):
+            self._log.extend(result.log)
+        return result
 
     def execute_spread_strategy(self, spread_items, short_term, date):
         """Executes the trades for the spread strategy.
@@ -187,7 +225,6 @@ class CommoBroker:
                 continue
 
             self.update_pos(commodity, 1, 1, spreads[1], spreads[0], date)
-            
 
 
 @dataclass
@@ -200,51 +237,213 @@ class CommoBackTest:
     backtest_name: str = ""
     broker = CommoBroker(cash)
     name_blockchain: str = 'backtest'
-    
+    cache_dir: str = None  # folder of the local market data cache, None to always download
+    offline: bool = False  # serve market data from the cache only
+    max_workers: int = None  # fetch all tickers concurrently with this many threads
+    provider: object = None  # market data provider, yfinance when None
+    engine: str = 'loop'  # 'loop' (CommoBroker.update_pos day by day) or 'vectorized' (engine.simulate_spread_book)
+    data: pd.DataFrame = None  # preloaded get_commodities_data frame of the backtest window, skips fetching
+    listener: object = None  # called with every event dict (transaction, equity, done) as the backtest advances
+    instrumentation: object = None  # Instrumentation recording per-stage timings, written to backtests/{name}.timings.json
+    checkpoint_dir: str = None  # folder of the {backtest_name}.ckpt.npz snapshot to resume from and update, None to disable
+    checkpoint_every: int = 250  # trading days between snapshots of the loop engine
 
 
 
     def __post_init__(self):
         self.broker = CommoBroker(cash=self.cash, verbose=self.verbose)
+        self.cache = MarketDataCache(self.cache_dir, offline=self.offline, verbose=self.verbose) if self.cache_dir else None
         if self.backtest_name is None:
             self.backtest_name = generate_random_name()
         
         self.broker.initialize_blockchain(self.name_blockchain)
 
+    @property
+    def checkpoint_path(self):
+        return os.path.join(self.checkpoint_dir, f"{self.backtest_name}.ckpt.npz") if self.checkpoint_dir else None
+
+    @property
+    def data_source(self):
+        """Where the prices come from, part of the checkpoint fingerprint."""
+        if self.data is not None:
+            return 'data'
+        provider = type(self.provider) if self.provider is not None else YFinanceProvider
+        return f"{provider.__module__}.{provider.__qualname__}"
+
+    def _load_checkpoint(self, calendar, fingerprint, near, long):
+        """The snapshot of this run if it lies within calendar and was simulated on the same
+        prices, with the broker restored from it."""
+        checkpoint = Checkpoint.load(self.checkpoint_path, fingerprint)
+        if checkpoint is None:
+            return None
+        if checkpoint.position > len(calendar) or calendar[checkpoint.position - 1] != checkpoint.date:
+            logging.warning(f"Checkpoint of {self.backtest_name} at {checkpoint.date} is outside the calendar, starting over.")
+            return None
+        if checkpoint.prices != price_digest(near, long, checkpoint.position):
+            logging.warning(f"Prices up to {checkpoint.date} changed since the checkpoint of {self.backtest_name}, starting over.")
+            return None
+        self.broker.cash = checkpoint.cash
+        self.broker.positions = checkpoint.positions
+        self.broker._log = checkpoint.log
+        logging.info(f"Resuming {self.backtest_name} after {checkpoint.date}.")
+        return checkpoint
+
+    def _save_checkpoint(self, calendar, fingerprint, near, long, last, near_qty, long_qty, cash):
+        """Snapshot the run as of the end of day last (a day with prices), to resume at last + 1."""
+        position = last + 1
+        with (self.instrumentation or NO_INSTRUMENTATION).stage('checkpoint'):
+            Checkpoint(fingerprint, position, calendar[last], last, float(self.broker.cash), self.broker.positions,
+                       self.broker._log, near_qty[:position], long_qty[:position], cash[:position],
+                       price_digest(near, long, position)).save(self.checkpoint_path)
+
+    def _simulate(self, calendar, commodities, near, long, valid, start=None, fingerprint=None):
+        """Run the broker over the calendar from aligned (days x commodities) leg prices.
+        Returns the position of the last day with prices (or None) and the end-of-day
+        near quantities, long quantities and cash.
+
+        start is a Checkpoint to resume from. With a checkpoint_dir the run is
+        snapshotted every checkpoint_every days with prices."""
+        last = None
+        near_qty = np.zeros((len(calendar), len(commodities)))
+        long_qty = np.zeros((len(calendar), len(commodities)))
+        cash = np.full(len(calendar), float(self.broker.cash))
+        first = 0
+        if start is not None:
+            first = start.position
+            near_qty[:first], long_qty[:first], cash[:first] = start.near_qty, start.long_qty, start.cash_history
+            last = start.last
+        since_checkpoint = 0
+        for i in range(first, len(calendar)):
+            t = calendar[i]
+            if not valid[i]:
+                if self.verbose:
+                    for commodity in commodities:
+                        logging.warning(f"Spread for {commodity} not available on {t}")
+                if i:
+                    near_qty[i], long_qty[i], cash[i] = near_qty[i - 1], long_qty[i - 1], cash[i - 1]
+                continue
+            last = i
+            near_t, long_t = near[i], long[i]
+            logged = len(self.broker._log)
+            for j, commodity in enumerate(commodities):
+                self.broker.update_pos(commodity, 1, 1, near_t[j], long_t[j], t)
+            rows = self.broker.positions.rows(commodities)
+            held = rows >= 0
+            near_qty[i, held] = self.broker.positions.near_qty[rows[held]]
+            long_qty[i, held] = self.broker.positions.long_qty[rows[held]]
+            cash[i] = self.broker.cash
+            if self.listener is not None:
+                self._emit_day(t, self.broker._log.records(logged), self.broker.cash,
+                               self.broker.mark_to_market(commodities, near_t, long_t))
+            since_checkpoint += 1
+            if self.checkpoint_dir and since_checkpoint >= self.checkpoint_every:
+                self._save_checkpoint(calendar, fingerprint, near, long, i, near_qty, long_qty, cash)
+                since_checkpoint = 0
+        return last, near_qty, long_qty, cash
+
+    def _emit_day(self, date, transactions, cash, value):
+        for row in transactions:
+            self.listener({'type': 'transaction', **row, 'Date': row['Date'].strftime('%Y-%m-%d')})
+        self.listener({'type': 'equity', 'Date': date.strftime('%Y-%m-%d'), 'Cash': float(cash), 'Portfolio Value': float(value)})
+
+    def _emit_book(self, calendar, near, long, valid, result):
+        """Send the events of a vectorized run, day by day once the engine is done."""
+        log = result.log_frame()
+        log_days = np.searchsorted(np.asarray(calendar), log['Date'].to_numpy()) if len(log) else np.array([], dtype=int)
+        bounds = np.searchsorted(log_days, np.arange(len(calendar) + 1))
+        with np.errstate(invalid='ignore'):
+            values = result.cash + (result.near_qty * near + result.long_qty * long).sum(axis=1)
+        for i in np.flatnonzero(valid):
+            rows = log.iloc[bounds[i]:bounds[i + 1]].to_dict('records')
+            self._emit_day(calendar[i], rows, result.cash[i], values[i])
+
     def run_backtest(self):
+        instrumentation = self.instrumentation or NO_INSTRUMENTATION
+        self.broker.instrumentation = self.instrumentation
+        with instrumentation:
+            df = self._run(instrumentation)
+        if self.instrumentation is not None:
+            # written next to the csv of the run
+            self.instrumentation.write(f"backtests/{self.backtest_name}.timings.json")
+        return df
+
+    def _run(self, instrumentation):
         logging.info(f"Running backtest from {self.initial_date} to {self.final_date}.")
-        data = get_commodities_data(self.commodity_pairs, self.initial_date.strftime('%Y-%m-%d'), self.final_date.strftime('%Y-%m-%d'))
+        with instrumentation.stage('fetch') as stage:
+            if self.data is not None:
+                data = self.data
+            else:
+                data = get_commodities_data(self.commodity_pairs, self.initial_date.strftime('%Y-%m-%d'), self.final_date.strftime('%Y-%m-%d'), self.cache,
+                                            self.provider, max_workers=self.max_workers)
+            stage.rows = len(data)
     
-        data_module = DataModule(data)
-        strategy = SpreadStrategy(data_module=data_module)
-        spread_data = strategy.compute_spread()
-        data = strategy.set_up_dataframe()
-        commo = ["CORN", "GAS", "OIL", "WHEAT"]
-        last_date = None
+        # one (dates x commodities x tenors) array of the curves, traded commodities read from the data
+        with instrumentation.stage('spreads') as stage:
+            data_module = DataModule(data)
+            strategy = SpreadStrategy(data_module=data_module)
+            stage.rows = len(strategy.curves().dates)
+            commo = strategy.commodities()
+
+        # align the business day calendar to the prices once, then walk integer positions
+        with instrumentation.stage('align') as stage:
+            calendar = pd.date_range(start=self.initial_date, end=self.final_date, freq='B')
+            near, long, valid = strategy.aligned_legs(calendar, commo)
+            stage.rows = len(calendar)
+        fingerprint = start = None
+        if self.checkpoint_dir:
+            fingerprint = checkpoint_fingerprint(self.initial_date, self.commodity_pairs, self.cash, commo, self.data_source)
+            start = self._load_checkpoint(calendar, fingerprint, near, long)
+        first = start.position if start is not None else 0
+
+        with instrumentation.stage('simulate', rows=(len(calendar) - first) * len(commo)):
+            if self.engine == 'vectorized':
+                if self.verbose and not valid.all():
+                    logging.warning(f"Spreads not available on {int((~valid).sum())} of {len(calendar)} days")
+                result = self.broker.execute_spread_book(calendar[first:], commo, near[first:], long[first:], valid[first:])
+                last, near_qty, long_qty, cash = result.last, result.near_qty, result.long_qty, result.cash
+                if self.listener is not None:
+                    self._emit_book(calendar[first:], near[first:], long[first:], valid[first:], result)
+                if start is not None:
+                    last = start.last if last is None else first + last
+                    near_qty = np.concatenate([start.near_qty, near_qty])
+                    long_qty = np.concatenate([start.long_qty, long_qty])
+                    cash = np.concatenate([start.cash_history, cash])
+            elif self.engine == 'loop':
+                last, near_qty, long_qty, cash = self._simulate(calendar, commo, near, long, valid, start, fingerprint)
+            else:
+                raise ValueError("engine must be 'loop' or 'vectorized'")
+        if self.checkpoint_dir and last is not None:
+            self._save_checkpoint(calendar, fingerprint, near, long, last, near_qty, long_qty, cash)
+
+        # mark the book to market every day and value the logged transactions with it
+        with instrumentation.stage('evaluate', rows=len(calendar)):
+            self.performance = evaluate(calendar, commo, near, long, near_qty, long_qty, cash)
+            self.broker.value_transactions(self.performance.equity)
+
         dico = {}
-        for t in pd.date_range(start=self.initial_date, end=self.final_date, freq='B'):
-            long_term_spreads = {commodity : [spread_data.loc[t.strftime('%Y-%m-%d')][commodity+ " - Long Term"] if t.strftime('%Y-%m-%d') in spread_data.index else {},
-                                              spread_data.loc[t.strftime('%Y-%m-%d')][commodity+ " - Near Term"] if t.strftime('%Y-%m-%d') in spread_data.index else {}] for commodity in commo}
-            if long_term_spreads != {'CORN': [{}, {}], 'GAS': [{}, {}], 'OIL': [{}, {}], 'WHEAT': [{}, {}]}:
-                dico = long_term_spreads
-            
-            short_term_spreads = 1
-            # short_term_spreads = {commodity : data.loc[t.strftime('%Y-%m-%d')][commodity+ " - Long Term"] if t.strftime('%Y-%m-%d') in spread_data.index else {} for commodity in commo}
-            self.broker.execute_spread_strategy(long_term_spreads, short_term_spreads, t)
-
-        logging.info(f"Backtest completed. Final portfolio value: {self.broker.get_portfolio_value(dico)}")
+        if last is not None:
+            dico = {commodity: [near[last, j], long[last, j]] for j, commodity in enumerate(commo)}
+
+        self.final_value = self.broker.get_portfolio_value(dico)
+        logging.info(f"Backtest completed. Final portfolio value: {self.final_value}")
+        logging.info(f"Performance: {self.performance.summary()}")
         logging.info("Transaction Log:")
         logging.info(self.broker.get_transaction_log())
 
         df = self.broker.get_transaction_log()
 
         # create backtests folder if it does not exist
-        if not os.path.exists('backtests'):
-            os.makedirs('backtests')
+        os.makedirs('backtests', exist_ok=True)
 
 
         # save to csv, use the backtest name 
-        df.to_csv(f"backtests/{self.backtest_name}.csv")
+        with instrumentation.stage('csv', rows=len(df)):
+            df.to_csv(f"backtests/{self.backtest_name}.csv")
         # store the backtest in the blockchain
-        self.broker.blockchain.add_block(self.backtest_name, df.to_string())
+        with instrumentation.stage('blockchain', rows=len(df)):
+            self.broker.blockchain.add_block(self.backtest_name, df.to_string())
+        if self.listener is not None:
+            self.listener({'type': 'done', 'backtest_name': self.backtest_name,
+                           'final_value': float(self.final_value), 'transactions': len(df)})
+        return df
     
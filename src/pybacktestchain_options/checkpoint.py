@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from positions import PositionBook
+from result_cache import canonical_hash
+from transaction_log import TransactionLog
+
+# Bump when the snapshot layout changes, older snapshots are then ignored
+CHECKPOINT_VERSION = 2
+
+#---------------------------------------------------------
+# Helpers
+#---------------------------------------------------------
+
+def checkpoint_fingerprint(initial_date, commodity_pairs, cash, commodities, source=''):
+    """Hash of everything that makes two runs share their history, the final date excluded.
+    source names where the prices come from (a provider class, or preloaded data)."""
+    return canonical_hash({'initial_date': str(initial_date)[:10], 'commodity_pairs': commodity_pairs,
+                           'cash': float(cash), 'commodities': list(commodities), 'source': source})
+
+
+def price_digest(near, long, position):
+    """sha256 of the aligned leg prices of the first position calendar days."""
+    digest = hashlib.sha256()
+    for prices in (near, long):
+        digest.update(np.ascontiguousarray(prices[:position], dtype=float).tobytes())
+    return digest.hexdigest()
+
+#---------------------------------------------------------
+# Classes
+#---------------------------------------------------------
+
+@dataclass
+class Checkpoint:
+    """Simulation state of a CommoBackTest after its first position calendar days.
+
+    Holds the broker (cash, positions, transaction log) and the end-of-day
+    quantity and cash histories of those days that the performance report
+    is computed from. Runs resume at calendar[position]: with the same
+    initial date the business day calendar of a later final date starts
+    with the same days, so a finished run can be extended as well. The
+    commodity simulation draws no random numbers, there is no RNG state to
+    keep. A snapshot is only resumed when the prices of its days, summarized
+    by the prices digest, are still the same.
+
+    Snapshots are single .npz files (NumPy arrays plus a JSON header, no
+    pickle) replaced atomically, so a run killed while saving keeps the
+    previous one.
+    """
+    fingerprint: str
+    position: int  # calendar days simulated
+    date: pd.Timestamp  # calendar[position - 1]
+    last: int  # last of those days with prices, position - 1 for snapshots taken by CommoBackTest
+    cash: float
+    positions: PositionBook
+    log: TransactionLog
+    near_qty: np.ndarray  # (position x commodities) end-of-day histories
+    long_qty: np.ndarray
+    cash_history: np.ndarray
+    prices: str = ''  # price_digest of the simulated days, checked on resume
+
+    def save(self, path):
+        commodities, book = self.positions.to_arrays()
+        header = {'version': CHECKPOINT_VERSION, 'fingerprint': self.fingerprint, 'position': self.position,
+                  'date': self.date.isoformat(), 'last': self.last, 'cash': self.cash,
+                  'prices': self.prices}
+        arrays = {'header': np.array(json.dumps(header)), 'commodities': np.array(commodities, dtype=str),
+                  'book': book, 'near_qty': self.near_qty, 'long_qty': self.long_qty,
+                  'cash_history': self.cash_history}
+        arrays.update({f'log {name}': values for name, values in self.log.to_arrays().items()})
+
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path, fingerprint=None):
+        """Read a snapshot, or return None when there is none at path, it is from another version of
+        the layout, or its fingerprint differs from the given one."""
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as arrays:
+            header = json.loads(str(arrays['header']))
+            if header['version'] != CHECKPOINT_VERSION:
+                return None
+            if fingerprint is not None and header['fingerprint'] != fingerprint:
+                return None
+            log = TransactionLog.from_arrays({name[len('log '):]: arrays[name] for name in arrays.files
+                                              if name.startswith('log ')})
+            return cls(
+                fingerprint=header['fingerprint'],
+                position=header['position'],
+                date=pd.Timestamp(header['date']),
+                last=header['last'],
+                cash=header['cash'],
+                positions=PositionBook.from_arrays([str(c) for c in arrays['commodities']], arrays['book']),
+                log=log,
+                near_qty=arrays['near_qty'],
+                long_qty=arrays['long_qty'],
+                cash_history=arrays['cash_history'],
+                prices=header['prices'],
+            )
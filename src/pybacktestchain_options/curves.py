@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+
+NEAR_TERM = "Near Term"
+LONG_TERM = "Long Term"
+SPOT = "Spot"  # tenor of the single ticker commodities of commodity_legs
+SEPARATOR = " - "
+
+#---------------------------------------------------------
+# Classes
+#---------------------------------------------------------
+
+@dataclass
+class FuturesCurves:
+    """Futures curves of many commodities on a common date index.
+
+    prices is a dense (dates x commodities x tenors) float array, NaN where a
+    contract has no price that day, so a leg is prices[:, c, k] and a calendar
+    spread, butterfly or any fixed combination of tenors is a slice and a few
+    vectorized operations for all commodities at once. Build it once from the
+    long get_commodities_data frame with from_frame, then refer to
+    commodities and tenors by name or by integer position.
+
+    Contract labels are "{commodity} - {tenor}" as produced by
+    commodity_legs ("OIL - Near Term"), a label without the separator is the
+    SPOT tenor of that commodity. Commodities are sorted by name, tenors kept
+    in order of first appearance (definition order of the ticker pairs).
+    """
+    dates: pd.DatetimeIndex
+    commodities: list
+    tenors: list
+    prices: np.ndarray
+
+    def __post_init__(self):
+        self.commodities = list(self.commodities)
+        self.tenors = list(self.tenors)
+        self._commodity_index = {name: j for j, name in enumerate(self.commodities)}
+        self._tenor_index = {tenor: k for k, tenor in enumerate(self.tenors)}
+        if self.prices.shape != (len(self.dates), len(self.commodities), len(self.tenors)):
+            raise ValueError("prices must be (dates x commodities x tenors)")
+        # (commodities x tenors) mask of the contracts that exist, e.g. SPOT only commodities have no other tenor
+        self.listed = ~np.isnan(self.prices).all(axis=0)
+
+    @classmethod
+    def from_frame(cls, data, time_column='Date', price_column='Close', contract_column='Contract'):
+        """Build the curves from a long frame with one row per date and contract."""
+        if data.empty:
+            return cls(pd.DatetimeIndex([]), [], [], np.empty((0, 0, 0)))
+        date_codes, dates = pd.factorize(data[time_column], sort=True)
+        contract_codes, contracts = pd.factorize(data[contract_column])
+
+        # split the few distinct labels, never the rows
+        names, tenors = [], []
+        for label in contracts:
+            name, _, tenor = str(label).rpartition(SEPARATOR)
+            names.append(name or tenor)
+            tenors.append(tenor if name else SPOT)
+        commodities = sorted(set(names))
+        tenor_order = list(dict.fromkeys(tenors))
+        commodity_of = np.array([commodities.index(name) for name in names], dtype=np.intp)
+        tenor_of = np.array([tenor_order.index(tenor) for tenor in tenors], dtype=np.intp)
+
+        prices = np.full((len(dates), len(commodities), len(tenor_order)), np.nan)
+        prices[date_codes, commodity_of[contract_codes], tenor_of[contract_codes]] = data[price_column].to_numpy(dtype=float)
+        return cls(pd.DatetimeIndex(dates), commodities, tenor_order, prices)
+
+    @property
+    def shape(self):
+        return self.prices.shape
+
+    def commodity_index(self, commodities=None):
+        """Integer positions of commodities (names or positions), all of them when None."""
+        if commodities is None:
+            return np.arange(len(self.commodities))
+        return np.array([c if isinstance(c, (int, np.integer)) else self._commodity_index[c]
+                         for c in commodities], dtype=np.intp)
+
+    def tenor_index(self, tenor):
+        """Integer position of a tenor given by name or position."""
+        return tenor if isinstance(tenor, (int, np.integer)) else self._tenor_index[tenor]
+
+    def with_tenors(self, *tenors):
+        """Names of the commodities listing every one of tenors."""
+        if any(t not in self._tenor_index for t in tenors):
+            return []
+        listed = self.listed[:, [self._tenor_index[t] for t in tenors]].all(axis=1)
+        return [name for name, ok in zip(self.commodities, listed) if ok]
+
+    def leg(self, tenor, commodities=None):
+        """(dates x commodities) prices of one tenor."""
+        return self.prices[:, self.commodity_index(commodities), self.tenor_index(tenor)]
+
+    def combination(self, weights, commodities=None):
+        """(dates x commodities) value of sum(weight * leg) over {tenor: weight}.
+
+        Only the tenors with a non zero weight are read, a missing price in
+        any of them gives NaN."""
+        ks = [self.tenor_index(t) for t, w in weights.items() if w]
+        w = np.array([w for w in weights.values() if w], dtype=float)
+        return self.prices[:, self.commodity_index(commodities)][:, :, ks] @ w
+
+    def calendar_spread(self, front=NEAR_TERM, back=LONG_TERM, commodities=None):
+        """front - back, for every date and commodity."""
+        return self.leg(front, commodities) - self.leg(back, commodities)
+
+    def butterfly(self, front, body, back, commodities=None):
+        """front - 2 body + back, for every date and commodity."""
+        return self.combination({front: 1.0, body: -2.0, back: 1.0}, commodities)
+
+    def complete(self, commodities=None, tenors=None):
+        """Boolean mask of the dates where every selected contract has a price.
+
+        With tenors None the selection is every listed contract of the
+        commodities, which for all commodities are the dates kept by a
+        dropna() of the pivoted long frame."""
+        prices, listed = self.prices, self.listed
+        if commodities is not None:
+            cs = self.commodity_index(commodities)
+            prices, listed = prices[:, cs], listed[cs]
+        if tenors is None:
+            missing = np.isnan(prices[:, listed])
+        else:
+            missing = np.isnan(prices[:, :, [self.tenor_index(t) for t in tenors]])
+        return ~missing.any(axis=tuple(range(1, missing.ndim)))  # no reshape, curves may be empty
+
+    def aligned(self, calendar, tenors, commodities=None, valid=None):
+        """Align legs to a calendar in one gather.
+
+        Returns one (days x commodities) array per tenor, NaN on the calendar
+        days not in dates or not in valid (a mask over dates, by default the
+        complete() dates of the selection), and the boolean mask of the
+        calendar days that were filled. Dates are compared at midnight, time
+        zone dropped, keeping the first of duplicates."""
+        if valid is None:
+            valid = self.complete(commodities, tenors)
+        dates = self.dates
+        if dates.tz is not None:
+            dates = dates.tz_localize(None)
+        dates = dates.normalize()
+        keep = np.flatnonzero(valid)
+        keep = keep[~dates[keep].duplicated()]
+        positions = dates[keep].get_indexer(pd.DatetimeIndex(calendar).normalize())
+        filled = positions >= 0
+        rows = keep[positions[filled]]
+        cs = self.commodity_index(commodities)
+
+        legs = []
+        for tenor in tenors:
+            prices = self.prices[:, cs, self.tenor_index(tenor)][rows]
+            if filled.all():
+                legs.append(prices)
+                continue
+            aligned = np.full((len(positions), len(cs)), np.nan)
+            aligned[filled] = prices
+            legs.append(aligned)
+        return (*legs, filled)
+
+    def to_frame(self, commodities=None, tenors=None):
+        """Wide (dates x contract label) frame of the selected contracts, like a pivot of the long
+        frame. With tenors None every listed contract is included."""
+        cs = self.commodity_index(commodities)
+        columns, values = [], []
+        for c in cs:
+            listed = [t for t, ok in zip(self.tenors, self.listed[c]) if ok]
+            for tenor in (listed if tenors is None else tenors):
+                name = self.commodities[c]
+                columns.append(name if tenor == SPOT else f"{name}{SEPARATOR}{tenor}")
+                values.append(self.prices[:, c, self.tenor_index(tenor)])
+        return pd.DataFrame(np.column_stack(values) if values else np.empty((len(self.dates), 0)),
+                            index=self.dates, columns=columns)
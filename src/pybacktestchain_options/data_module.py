@@ -1,13 +1,16 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from scipy.optimize import minimize
 import logging
-from dataclasses import dataclass
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+from curves import LONG_TERM, NEAR_TERM, FuturesCurves
+from optimizer import min_variance_weights, rolling_hedge_ratios, window_covariances
+from signals import SpreadSignals, ewma_zscore, mean_reversion_positions, rolling_zscore
 
 ###########################
 ####### FIXED DATA #######
@@ -26,57 +29,195 @@ COMMODITY_TICKER_PAIRS = {
 ####### FUNCTIONS #######
 #########################
 
-def get_commodity_data(ticker, start_date, end_date):
-    """Retrieve historical data for a given commodity ticker."""
-    try:
-        data = yf.Ticker(ticker).history(start=start_date, end=end_date, auto_adjust=False, actions=False)
-        if data.empty:
-            logging.warning(f"No data found for ticker {ticker} from {start_date} to {end_date}.")
-            return pd.DataFrame()
-        df = pd.DataFrame(data)
-        df['ticker'] = ticker
-        df.reset_index(inplace=True)
-        return df
-    except Exception as e:
-        logging.warning(f"Error retrieving data for {ticker}: {e}")
+class YFinanceProvider:
+    """Default market data provider, backed by yfinance (imported on first use).
+
+    timeout (seconds) bounds every HTTP request of a history call."""
+
+    def __init__(self, timeout=30):
+        self.timeout = timeout
+
+    def history(self, ticker, start_date, end_date):
+        import yfinance as yf
+        return yf.Ticker(ticker).history(start=start_date, end=end_date, auto_adjust=False, actions=False,
+                                         timeout=self.timeout)
+
+
+class SyntheticProvider:
+    """Offline provider generating deterministic daily futures bars.
+
+    Every ticker gets its own seeded random walk anchored on a fixed origin,
+    so overlapping requests return the same prices. latency (in seconds) is
+    slept on every call to mimic a remote provider in benchmarks and tests."""
+
+    ORIGIN = '1990-01-01'
+    HORIZON = '2040-01-01'
+
+    def __init__(self, latency=0.0, seed=0, volatility=0.02):
+        self.latency = latency
+        self.seed = seed
+        self.volatility = volatility
+        self._series = {}
+
+    def _full_history(self, ticker):
+        if ticker not in self._series:
+            days = np.arange(self.ORIGIN, self.HORIZON, dtype='datetime64[D]')
+            dates = pd.DatetimeIndex(days[np.is_busday(days)], name='Date').tz_localize('America/New_York')
+            rng = np.random.default_rng([zlib.crc32(ticker.encode()), self.seed])
+            close = 50 + 50 * rng.random() * np.exp(np.cumsum(rng.normal(0, self.volatility, len(dates))))
+            self._series[ticker] = pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close,
+                                                 'Adj Close': close, 'Volume': 1000}, index=dates)
+        return self._series[ticker]
+
+    def history(self, ticker, start_date, end_date):
+        if self.latency:
+            time.sleep(self.latency)
+        data = self._full_history(ticker)
+        local = data.index.tz_localize(None)
+        return data[(local >= pd.Timestamp(start_date)) & (local < pd.Timestamp(end_date))].copy()
+
+
+# Threads running timed fetches, abandoned ones included: bounds the calls in flight whatever the retries
+FETCH_THREADS = 32
+_FETCH_SLOTS = threading.BoundedSemaphore(FETCH_THREADS)
+
+
+def _call_with_timeout(fn, timeout):
+    """Run fn() and raise TimeoutError if it does not return within timeout seconds.
+
+    A call that times out cannot be interrupted: it finishes in its daemon
+    thread, which keeps one of the FETCH_THREADS slots until then, so
+    abandoned calls and their retries never exceed that many threads. Waiting
+    for a free slot counts towards the timeout."""
+    if timeout is None:
+        return fn()
+    deadline = time.monotonic() + timeout
+    if not _FETCH_SLOTS.acquire(timeout=timeout):
+        raise TimeoutError(f"no free fetch thread after {timeout}s")
+    result = {}
+
+    def target():
+        try:
+            result['value'] = fn()
+        except BaseException as e:
+            result['error'] = e
+        finally:
+            _FETCH_SLOTS.release()
+
+    worker = threading.Thread(target=target, daemon=True)
+    worker.start()
+    worker.join(max(deadline - time.monotonic(), 0.0))
+    if worker.is_alive():
+        raise TimeoutError(f"no response after {timeout}s")
+    if 'error' in result:
+        raise result['error']
+    return result['value']
+
+
+def get_commodity_data(ticker, start_date, end_date, cache=None, provider=None, timeout=None, retries=0, backoff=0.5):
+    """Retrieve historical data for a given commodity ticker.
+
+    provider is any object with a history(ticker, start_date, end_date) method
+    (yfinance by default). When a MarketDataCache is given, only the date
+    ranges not already on disk are requested from the provider. A failed or
+    timed out attempt is retried up to retries times, waiting backoff,
+    2 * backoff, 4 * backoff... seconds in between."""
+    if provider is None:
+        provider = YFinanceProvider() if timeout is None else YFinanceProvider(timeout=timeout)
+    if cache is not None:
+        fetch = lambda: cache.get(ticker, start_date, end_date, provider)
+    else:
+        fetch = lambda: provider.history(ticker, start_date, end_date)
+
+    for attempt in range(retries + 1):
+        try:
+            data = _call_with_timeout(fetch, timeout)
+            break
+        except Exception as e:
+            if attempt < retries:
+                logging.info(f"Retrying {ticker} after error: {e}")
+                time.sleep(backoff * 2 ** attempt)
+            else:
+                logging.warning(f"Error retrieving data for {ticker}: {e}")
+                return pd.DataFrame()
+
+    if data.empty:
+        logging.warning(f"No data found for ticker {ticker} from {start_date} to {end_date}.")
         return pd.DataFrame()
+    df = pd.DataFrame(data)
+    df['ticker'] = ticker
+    df.reset_index(inplace=True)
+    return df
 
-def get_commodities_data(tickers, start_date, end_date):
-    """Retrieve historical data for a list of commodity tickers."""
-    dfs = []
+def commodity_legs(tickers):
+    """List (contract label, ticker) for every leg, in definition order.
+
+    A commodity maps either to a single ticker or to {tenor: ticker} for any
+    number of tenors ("Near Term" and "Long Term" for the spread strategy)."""
+    legs = []
     for name, ticker_info in tickers.items():
         # Case 1: Single ticker
         if isinstance(ticker_info, str):
-            df = get_commodity_data(ticker_info, start_date, end_date)
-            if not df.empty:
-                df["Contract"] = name  # Add the commodity name as the contract
-                dfs.append(df)
-            else:
-                logging.warning(f"No data retrieved for ticker {ticker_info} ({name}).")
-        
-        # Case 2: Ticker pairs (Near Term / Long Term)
+            legs.append((name, ticker_info))
+        # Case 2: One ticker per tenor of the curve
         elif isinstance(ticker_info, dict):
-            # Retrieve Near Term data
-            near_term_ticker = ticker_info.get("Near Term")
-            if near_term_ticker:
-                near_term_df = get_commodity_data(near_term_ticker, start_date, end_date)
-                if not near_term_df.empty:
-                    near_term_df["Contract"] = f"{name} - Near Term"
-                    dfs.append(near_term_df)
-                else:
-                    logging.warning(f"No data retrieved for Near Term ticker {near_term_ticker} ({name}).")
-            
-            # Retrieve Long Term data
-            long_term_ticker = ticker_info.get("Long Term")
-            if long_term_ticker:
-                long_term_df = get_commodity_data(long_term_ticker, start_date, end_date)
-                if not long_term_df.empty:
-                    long_term_df["Contract"] = f"{name} - Long Term"
-                    dfs.append(long_term_df)
-                else:
-                    logging.warning(f"No data retrieved for Long Term ticker {long_term_ticker} ({name}).")
+            for term, ticker in ticker_info.items():
+                if ticker:
+                    legs.append((f"{name} - {term}", ticker))
         else:
             logging.warning(f"Invalid ticker format for {name}: {ticker_info}. Expected a string or a dictionary.")
+    return legs
+
+def get_commodities_data(tickers, start_date, end_date, cache=None, provider=None,
+                         max_workers=None, timeout=None, retries=0, backoff=0.5):
+    """Retrieve historical data for a list of commodity tickers.
+
+    With max_workers > 1 all legs are fetched concurrently in a bounded thread
+    pool. timeout, retries and backoff apply to each ticker (see
+    get_commodity_data). Rows are always concatenated in definition order."""
+    legs = commodity_legs(tickers)
+
+    def fetch(leg):
+        contract, ticker = leg
+        return get_commodity_data(ticker, start_date, end_date, cache, provider, timeout, retries, backoff)
+
+    if max_workers and max_workers > 1 and len(legs) > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(legs))) as pool:
+            results = list(pool.map(fetch, legs))
+    else:
+        results = [fetch(leg) for leg in legs]
+    return _concat_legs(legs, results)
+
+def slice_commodities_data(histories, tickers, start_date, end_date):
+    """Build the get_commodities_data frame of tickers over [start_date, end_date)
+    from per-ticker histories already in memory, without calling the provider.
+
+    histories maps each ticker to its get_commodity_data frame over a window
+    covering [start_date, end_date). Used to load market data once and run many
+    backtests on sub-windows or subsets of it."""
+    legs = commodity_legs(tickers)
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    results = []
+    for contract, ticker in legs:
+        df = histories.get(ticker)
+        if df is None or df.empty:
+            results.append(pd.DataFrame())
+            continue
+        dates = df['Date']
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_localize(None)
+        results.append(df[(dates >= start) & (dates < end)].reset_index(drop=True))
+    return _concat_legs(legs, results)
+
+def _concat_legs(legs, results):
+    """Label each leg's frame with its contract and stack them in definition order."""
+    dfs = []
+    for (contract, ticker), df in zip(legs, results):
+        if not df.empty:
+            df["Contract"] = contract
+            dfs.append(df)
+        else:
+            logging.warning(f"No data retrieved for ticker {ticker} ({contract}).")
 
     # Handle case where no data is retrieved
     if not dfs:
@@ -100,15 +241,55 @@ class SpreadStrategy:
     time_column: str = 'Date'
     price_column: str = 'Close'
     contract_column: str = 'Contract'
+    _curves: FuturesCurves = field(default=None, init=False, repr=False)
+
+    def curves(self):
+        """FuturesCurves of the data, built on first use."""
+        if self._curves is None:
+            self._curves = FuturesCurves.from_frame(self.data_module.data, self.time_column, self.price_column,
+                                                    self.contract_column)
+        return self._curves
+
+    def commodities(self):
+        """Commodities of the data with both a near and a long term contract, sorted by name."""
+        return self.curves().with_tenors(NEAR_TERM, LONG_TERM)
 
     def compute_spread(self):
         """Calculate the spread (near term - long term) over time."""
-        data = self.data_module.data
-        pivot_data = data.pivot(index=self.time_column, columns=self.contract_column, values=self.price_column)
-        commo = ["CORN", "GAS", "OIL", "WHEAT"]
-        for name in commo:
-            pivot_data[name+ ' - Spread'] = pivot_data[name+ " - Near Term"] - pivot_data[name+" - Long Term"]
-        return pivot_data.dropna()
+        curves = self.curves()
+        commodities = self.commodities()
+        prices = curves.to_frame()
+        prices = prices[sorted(prices.columns)]
+        spreads = pd.DataFrame(curves.calendar_spread(commodities=commodities), index=curves.dates,
+                               columns=[f"{name} - Spread" for name in commodities])
+        spread_data = pd.concat([prices, spreads], axis=1)[curves.complete()]
+        spread_data.index.name, spread_data.columns.name = self.time_column, self.contract_column
+        return spread_data
+
+    def aligned_legs(self, calendar, commodities, spread_data=None):
+        """Align the near and long term prices to a calendar in one pass.
+
+        Returns (near, long, valid): two (days x commodities) float arrays and a
+        boolean mask of the calendar days with every contract quoted (or found
+        in spread_data, when given). Rows of the arrays are NaN elsewhere."""
+        if spread_data is None:
+            curves = self.curves()
+            return curves.aligned(calendar, [NEAR_TERM, LONG_TERM], commodities, valid=curves.complete())
+        dates = pd.DatetimeIndex(spread_data.index)
+        if dates.tz is not None:
+            dates = dates.tz_localize(None)
+        dates = dates.normalize()
+        keep = ~dates.duplicated()
+        positions = dates[keep].get_indexer(pd.DatetimeIndex(calendar).normalize())
+        valid = positions >= 0
+
+        def leg(term):
+            prices = spread_data.loc[keep, [f"{name} - {term}" for name in commodities]].to_numpy(dtype=float)
+            aligned = np.full((len(positions), len(commodities)), np.nan)
+            aligned[valid] = prices[positions[valid]]
+            return aligned
+
+        return leg("Near Term"), leg("Long Term"), valid
 
     def set_up_dataframe(self):
         """Calculate the spread (near term - long term) over time."""
@@ -117,39 +298,100 @@ class SpreadStrategy:
         return pivot_data.dropna()
 
     def compute_statistics(self, spread_data):
-        """Calculate required statistics for the strategy."""
-        # Spread returns
-        spread_data['Spread Return'] = spread_data['Spread'].pct_change()
-        # Mean and standard deviation of spread returns
-        mean_return = spread_data['Spread Return'].mean()
-        std_dev = spread_data['Spread Return'].std()
-        return mean_return, std_dev
-
-    def optimize_spread(self, mean_return, std_dev, correlation, margin_limit=1_000_000):
-        """Optimize weights for the spread strategy.
-        NOT USED"""
-        sigma_near = std_dev  # Proxy for near-term volatility
-        sigma_long = std_dev * correlation  # Adjusted long-term volatility
-
-        # Covariance matrix
-        cov_matrix = np.array([
-            [sigma_near**2, correlation * sigma_near * sigma_long],
-            [correlation * sigma_near * sigma_long, sigma_long**2]
-        ])
-
-        # Objective function (minimize spread variance)
-        def spread_variance(weights):
-            return weights.T @ cov_matrix @ weights
-
-        # Constraints
-        constraints = [
-            {'type': 'eq', 'fun': lambda w: w[0] + w[1]},  # Hedging: weights sum to 0
-            {'type': 'ineq', 'fun': lambda w: margin_limit - abs(w[0]) - abs(w[1])}  # Margin limit
-        ]
-
-        # Initial guess (equal weights)
-        x0 = np.array([0.5, -0.5])
-
-        # Optimize
-        result = minimize(spread_variance, x0, constraints=constraints)
-        return result.x if result.success else None
\ No newline at end of file
+        """Mean and standard deviation of the spread returns, without modifying spread_data.
+
+        Scalars for a frame with a 'Spread' column, otherwise Series indexed by
+        the "{commodity} - Spread" columns of compute_spread."""
+        if 'Spread' in spread_data.columns:
+            returns = spread_data['Spread'].pct_change()
+        else:
+            returns = spread_data[[c for c in spread_data.columns if c.endswith(' - Spread')]].pct_change()
+        return returns.mean(), returns.std()
+
+    def signals(self, windows=(20,), entry=2.0, exit=0.5, ewma=False, commodities=None):
+        """
+        Z-scores of the near - long term spread of every commodity and the positions of a
+        mean-reversion rule on them, for every window in one pass.
+
+        :param windows: Rolling window lengths in trading days, or half-lives with ewma=True
+        :param entry: Enter when |z| > entry, long the spread when it is cheap (z < -entry)
+        :param exit: Flatten when |z| < exit
+        :param commodities: Commodities to use, all of commodities() by default
+        :return: SpreadSignals over the days where every selected near and long term contract is quoted
+        """
+        curves = self.curves()
+        commodities = self.commodities() if commodities is None else list(commodities)
+        days = curves.complete(commodities, [NEAR_TERM, LONG_TERM])
+        spreads = curves.calendar_spread(commodities=commodities)[days]
+        zscore = (ewma_zscore if ewma else rolling_zscore)(spreads, windows)
+        return SpreadSignals(curves.dates[days], commodities, list(windows), zscore,
+                             mean_reversion_positions(zscore, entry, exit))
+
+    def hedge_ratios(self, windows=(60,), commodities=None):
+        """
+        Rolling minimum variance hedge ratios of every commodity for every window, in one pass.
+
+        :param windows: Window lengths in daily price changes
+        :param commodities: Commodities to use, all of commodities() by default
+        :return: (dates, commodities, ratio, residual_variance) with (windows x dates x commodities)
+                 arrays over the days where every selected contract is quoted, see rolling_hedge_ratios
+        """
+        curves = self.curves()
+        commodities = self.commodities() if commodities is None else list(commodities)
+        days = curves.complete(commodities, [NEAR_TERM, LONG_TERM])
+        ratio, residual = rolling_hedge_ratios(curves.leg(NEAR_TERM, commodities)[days],
+                                               curves.leg(LONG_TERM, commodities)[days], windows)
+        return curves.dates[days], commodities, ratio, residual
+
+    def spread_weights(self, window=60, gross_limit=2.0, step=1, commodities=None):
+        """
+        Minimum variance weights of a portfolio of the commodity spreads, re-estimated every step days.
+
+        The covariances of the daily spread changes over the trailing window of
+        every rebalancing day are estimated at once, and all the portfolios are
+        solved in one batch under sum(w) = 1 and sum(|w|) <= gross_limit.
+
+        :param window: Window length in daily spread changes
+        :param gross_limit: Gross exposure limit in units of the book, at least 1
+        :param step: Days between two rebalancings
+        :param commodities: Commodities to use, all of commodities() by default
+        :return: (rebalancing days x commodities) DataFrame of weights, NaN on days whose window
+                 covariance is singular (e.g. a spread that did not move)
+        """
+        curves = self.curves()
+        commodities = self.commodities() if commodities is None else list(commodities)
+        days = curves.complete(commodities, [NEAR_TERM, LONG_TERM])
+        changes = np.diff(curves.calendar_spread(commodities=commodities)[days], axis=0)
+        ends = np.arange(window - 1, len(changes), step)
+        result = min_variance_weights(window_covariances(changes, window, ends), gross_limit)
+        return pd.DataFrame(result.weights, index=curves.dates[days][ends + 1], columns=commodities)
+
+    def optimize_spread(self, mean_return, std_dev, correlation, margin_limit=1_000_000, long_std_dev=None):
+        """
+        Minimum variance hedge of the spread, in closed form.
+
+        The near leg is hedged with h = cov(near, long) / var(long)
+        = correlation * std_dev / long_std_dev long legs, the weights (1, -h)
+        minimizing the variance of the position per unit of near leg. They are
+        scaled down when their gross exposure exceeds margin_limit. Array
+        inputs are solved as a batch; rolling_hedge_ratios estimates h from
+        leg prices instead.
+
+        :param mean_return: Not used, kept for compatibility
+        :param std_dev: Volatility of the near leg
+        :param correlation: Correlation between the legs
+        :param margin_limit: Upper bound on |w_near| + |w_long|
+        :param long_std_dev: Volatility of the long leg, std_dev (legs of equal volatility) by default
+        :return: (near weight, long weight), or an (n x 2) array for array inputs
+        """
+        sigma_near = np.asarray(std_dev, dtype=float)
+        sigma_long = sigma_near if long_std_dev is None else np.asarray(long_std_dev, dtype=float)
+        correlation = np.asarray(correlation, dtype=float)
+
+        covariance = correlation * sigma_near * sigma_long
+        variance_long = sigma_long ** 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            hedge = np.where(variance_long > 0, covariance / variance_long, 0.0)
+        weights = np.stack(np.broadcast_arrays(np.ones_like(hedge), -hedge), axis=-1)
+        gross = np.abs(weights).sum(axis=-1, keepdims=True)
+        return weights * np.minimum(1.0, margin_limit / gross)
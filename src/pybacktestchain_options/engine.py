@@ -0,0 +1,181 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from transaction_log import TRANSACTION_COLUMNS
+
+# Action codes used by the engine, with the labels CommoBroker.update_pos logs
+LONG_ST_SHORT_LT = 0
+LONG_LT_SHORT_ST = 1
+ACTIONS = ["Long ST, Short LT", "Long LT, Short ST"]
+
+#---------------------------------------------------------
+# Classes
+#---------------------------------------------------------
+
+@dataclass
+class SpreadBookResult:
+    """Output of simulate_spread_book.
+
+    near_qty, long_qty and held are (days x commodities) end-of-day states,
+    cash is the (days,) end-of-day cash and log holds the columns of the
+    transactions, in the order CommoBroker.update_pos would have logged them."""
+    near_qty: np.ndarray
+    long_qty: np.ndarray
+    held: np.ndarray
+    entry_spread: np.ndarray
+    cash: np.ndarray
+    log: dict
+    last: int = None  # position of the last day with prices
+
+    def log_frame(self):
+        return pd.DataFrame(self.log, columns=TRANSACTION_COLUMNS).astype({'Action': object, 'Commodity': object})
+
+#---------------------------------------------------------
+# Functions
+#---------------------------------------------------------
+
+def simulate_spread_book(near, long, valid, cash, near_qty=None, long_qty=None, held=None,
+                         entry_spread=None, initial_qty=(1, 1), calendar=None, commodities=None):
+    """Run CommoBroker.update_pos's spread rules for every commodity at once.
+
+    Everything that does not depend on the book (spread direction, traded
+    quantity, price-only trade costs) is computed for the whole history up
+    front. The remaining scan is sequential over days and vectorised across
+    commodities. Cash is shared and spent in commodity order within a day,
+    as in the broker, so each day is settled in one vectorised step until a
+    commodity cannot afford its trade. That commodity is then capped on its
+    own and the rest of the day is settled again with the remaining cash.
+    Results match the per-commodity loop exactly.
+
+    :param near: (days x commodities) near term prices
+    :param long: (days x commodities) long term prices
+    :param valid: (days,) or (days x commodities) mask of prices to trade on
+    :param cash: Starting cash
+    :param near_qty, long_qty, held, entry_spread: Optional starting book (per commodity)
+    :param initial_qty: (near, long) quantities of a newly opened position
+    :param calendar: Dates of the rows, used to label the log (day positions otherwise)
+    :param commodities: Names of the columns, used to label the log (column positions otherwise)
+    :return: SpreadBookResult
+
+    Each day costs a fixed number of NumPy calls, so the engine pays off from
+    a few dozen curves; for a handful of commodities the update_pos loop is
+    as fast.
+    """
+    near = np.asarray(near, dtype=float)
+    long = np.asarray(long, dtype=float)
+    n_days, n_commo = near.shape
+    valid = np.asarray(valid, dtype=bool)
+    if valid.ndim == 1:
+        valid = np.repeat(valid[:, None], n_commo, axis=1)
+
+    N = np.zeros(n_commo) if near_qty is None else np.array(near_qty, dtype=float)
+    L = np.zeros(n_commo) if long_qty is None else np.array(long_qty, dtype=float)
+    is_held = np.zeros(n_commo, dtype=bool) if held is None else np.array(held, dtype=bool)
+    entry = np.full(n_commo, np.nan) if entry_spread is None else np.array(entry_spread, dtype=float)
+    cash = float(cash)
+
+    # Price-only terms of update_pos, for every day at once. A trade is "A"
+    # when the opposite leg covers the whole quantity, "B" when it covers
+    # part of it and "C" otherwise. B's cost is sign * (q * near - L * long).
+    with np.errstate(invalid='ignore'):
+        spread = long - near
+        pos_all = spread > 0
+        q_all = np.where(pos_all, spread, -spread)
+        sign_all = np.where(pos_all, 1.0, -1.0)
+        cost_a_all = np.where(pos_all, q_all * (near - long), q_all * (long - near))
+        cost_c_all = np.where(pos_all, q_all * near, q_all * long)
+        q_near_all = q_all * near
+    any_valid = valid.any(axis=1)
+
+    near_path = np.empty((n_days, n_commo))
+    long_path = np.empty((n_days, n_commo))
+    held_path = np.empty((n_days, n_commo), dtype=bool)
+    cash_path = np.empty(n_days)
+    logged = np.zeros((n_days, n_commo), dtype=bool)
+    log_cash = np.empty((n_days, n_commo))
+    order = np.arange(n_commo)
+    ledger = np.empty(n_commo + 1)
+    last = None
+
+    for t in range(n_days):
+        if any_valid[t]:
+            last = t
+            v = valid[t]
+            active = v & is_held
+            opening = v & ~is_held
+            if opening.any():
+                N[opening], L[opening] = initial_qty
+                entry[opening] = near[t, opening]
+                is_held |= opening
+            logged[t] = active
+            st, lt, pos, q = near[t], long[t], pos_all[t], q_all[t]
+
+            while active.any():
+                opposite = np.where(pos, L, N)
+                A = opposite > q
+                B = opposite > 0
+                B &= ~A
+                cost = L * lt
+                np.subtract(q_near_all[t], cost, out=cost)
+                cost *= sign_all[t]
+                cost = np.where(A, cost_a_all[t], np.where(B, cost, cost_c_all[t]))
+                cost[~active] = 0.0
+                ledger[0] = cash
+                ledger[1:] = cost
+                np.subtract.accumulate(ledger, out=ledger)  # cash after each commodity, in order
+                before = ledger[:-1]
+                if (cost < before).all():
+                    k = n_commo
+                else:
+                    # update_pos uses a strict comparison only when reducing the long term leg
+                    ok = np.where(pos & A, cost < before, cost <= before) | ~active
+                    k = n_commo if ok.all() else int(np.argmin(ok))
+
+                # settle every commodity before the first one that cannot afford its trade
+                done = active if k == n_commo else active & (order < k)
+                N_new = np.where(pos, N + q, np.where(A, N - q, np.where(B, 0.0, N)))
+                L_new = np.where(pos, np.where(A, L - q, np.where(B, 0.0, L)), L + q)
+                np.copyto(N, N_new, where=done)
+                np.copyto(L, L_new, where=done)
+                np.copyto(log_cash[t], ledger[1:], where=done)
+                cash = ledger[k]
+                if k == n_commo:
+                    break
+
+                # the k-th commodity is capped by the cash left, exactly as in update_pos
+                if A[k]:
+                    pass
+                elif pos[k]:
+                    N[k] += (-L[k] * lt[k] + cash) / st[k] if B[k] else cash / st[k]
+                    if B[k]:
+                        L[k] = 0
+                    cash = 0
+                else:
+                    L[k] += (-N[k] * st[k] + cash) / lt[k] if B[k] else cash / lt[k]
+                    if B[k]:
+                        N[k] = 0
+                    cash = 0
+                log_cash[t, k] = cash
+                active = active & (order > k)
+
+        near_path[t] = N
+        long_path[t] = L
+        held_path[t] = is_held
+        cash_path[t] = cash
+
+    # each (day, commodity) trades at most once and update_pos walks commodities in
+    # order, so the row-major order of the logged cells is the order of the log
+    days, commo = np.nonzero(logged)
+    log = {
+        'Date': days if calendar is None else pd.DatetimeIndex(calendar)[days],
+        'Action': pd.Categorical.from_codes(np.where(pos_all[days, commo], LONG_ST_SHORT_LT, LONG_LT_SHORT_ST), ACTIONS),
+        'Commodity': commo if commodities is None else pd.Categorical.from_codes(commo, list(commodities)),
+        'Near Term Qty': near_path[days, commo],
+        'Long Term Qty': long_path[days, commo],
+        'Spread': near[days, commo],
+        'Cash': log_cash[days, commo],
+        'Portfolio Value': np.ones(len(days)),
+    }
+    return SpreadBookResult(near_path, long_path, held_path, entry, cash_path, log, last)
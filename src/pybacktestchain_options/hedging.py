@@ -0,0 +1,140 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+#---------------------------------------------------------
+# Functions
+#---------------------------------------------------------
+
+def rehedge_index(n_times, every):
+    """Index of the last rehedge at or before each of n_times steps, rehedging every `every` steps."""
+    steps = np.arange(n_times)
+    return steps - steps % every
+
+
+def _as_paths(prices, times, periods_per_year):
+    """(paths x times) price array, times in years and the index of the series."""
+    index = None
+    if isinstance(prices, (pd.Series, pd.DataFrame)):
+        index = prices.index
+        if times is None and isinstance(index, pd.DatetimeIndex):
+            times = (index - index[0]).days.to_numpy() / 365.0
+        prices = prices.to_numpy(dtype=float).T
+    prices = np.atleast_2d(np.asarray(prices, dtype=float))
+    n_times = prices.shape[1]
+    if times is None:
+        times = np.arange(n_times) / periods_per_year
+    times = np.asarray(times, dtype=float)
+    if times.shape != (n_times,):
+        raise ValueError(f"times must have one entry per price ({n_times})")
+    if index is None:
+        index = pd.Index(times, name='t')
+    return prices, times, index
+
+
+def simulate_hedge(book, prices, r=0.0, sigma=0.2, rehedge_every=(1,), cost=0.0, times=None,
+                   periods_per_year=252):
+    """
+    Delta hedge an option book with the underlying along price paths and return the P&L.
+
+    The book is marked, and its delta computed, on the whole (paths x times)
+    grid at once. For each rehedge frequency the hedge held at every step is
+    minus the book delta at the last rehedge step, so all frequencies are
+    gathered from the same deltas without looping over time. The position is
+    started with zero capital: the premium and the hedge are financed on a
+    cash account that accrues at r (continuously compounded), and every
+    hedge trade pays cost times its notional.
+
+    :param book: monte_carlo.OptionBook to hedge (its underlying quantity is hedged too)
+    :param prices: Price path(s): a 1-D array, a (paths x times) array, a Series (e.g. the
+                   Close of the data module) or a DataFrame with one path per column
+    :param r: Risk-free rate used for pricing and financing
+    :param sigma: Volatility used to mark the book, scalar or broadcast to (paths x times),
+                  e.g. a path of implied volatilities
+    :param rehedge_every: Rehedge frequencies, in steps
+    :param cost: Transaction cost as a fraction of the traded notional
+    :param times: Times of the prices in years, from the dates of a Series index or
+                  1 / periods_per_year apart when None
+    :return: HedgeResult
+    """
+    S, times, index = _as_paths(prices, times, periods_per_year)
+    rehedge_every = tuple(int(k) for k in np.atleast_1d(rehedge_every))
+    if min(rehedge_every) < 1:
+        raise ValueError("rehedge_every must be at least 1 step")
+    n_times = S.shape[1]
+
+    value, delta = book.mark(S, times, r, sigma)
+    option_pnl = value - value[:, :1]
+
+    # hedge held from each step to the next, one row per frequency: (freqs, paths, times)
+    idx = np.stack([rehedge_index(n_times, k) for k in rehedge_every])
+    hedge = -delta[:, idx].transpose(1, 0, 2)
+    trades = np.diff(hedge, axis=2, prepend=0.0)
+    traded = np.abs(trades) * S
+    n_trades = np.count_nonzero(trades, axis=2)
+
+    hedge_pnl = np.zeros_like(hedge)
+    np.cumsum(hedge[..., :-1] * np.diff(S, axis=1), axis=2, out=hedge_pnl[..., 1:])
+    costs = np.cumsum(traded * cost, axis=2)
+
+    # cash flows without interest, and the same flows on an account growing like e^{r t}
+    flows = -(trades * S) - traded * cost
+    flows[..., 0] -= value[:, 0]
+    growth = np.exp(r * times)
+    financing = np.cumsum(flows / growth, axis=2) * growth - np.cumsum(flows, axis=2)
+
+    pnl = option_pnl + hedge_pnl + financing - costs
+    return HedgeResult(
+        index=index,
+        rehedge_every=rehedge_every,
+        pnl=pnl,
+        option_pnl=option_pnl[:, -1],
+        hedge_pnl=hedge_pnl[..., -1],
+        financing=financing[..., -1],
+        costs=costs[..., -1],
+        n_trades=n_trades,
+    )
+
+#---------------------------------------------------------
+# Classes
+#---------------------------------------------------------
+
+@dataclass
+class HedgeResult:
+    """P&L of a delta hedged book, per rehedge frequency and price path.
+
+    pnl is (frequencies x paths x times) and cumulative; the final P&L splits
+    into option_pnl (per path, the same for every frequency) + hedge_pnl +
+    financing - costs, all (frequencies x paths).
+    """
+    index: pd.Index
+    rehedge_every: tuple
+    pnl: np.ndarray
+    option_pnl: np.ndarray
+    hedge_pnl: np.ndarray
+    financing: np.ndarray
+    costs: np.ndarray
+    n_trades: np.ndarray
+
+    @property
+    def final_pnl(self):
+        return self.pnl[..., -1]
+
+    def series(self, rehedge_every=None, path=0):
+        """Cumulative P&L of one path as a Series, for the first frequency when None."""
+        i = 0 if rehedge_every is None else self.rehedge_every.index(rehedge_every)
+        return pd.Series(self.pnl[i, path], index=self.index, name='P&L')
+
+    def summary(self):
+        """Distribution of the final P&L and its breakdown, one row per rehedge frequency."""
+        final = self.final_pnl
+        return pd.DataFrame({
+            'mean_pnl': final.mean(axis=1),
+            'std_pnl': final.std(axis=1),
+            'option_pnl': np.broadcast_to(self.option_pnl.mean(), len(self.rehedge_every)),
+            'hedge_pnl': self.hedge_pnl.mean(axis=1),
+            'financing': self.financing.mean(axis=1),
+            'costs': self.costs.mean(axis=1),
+            'trades': self.n_trades.mean(axis=1),
+        }, index=pd.Index(self.rehedge_every, name='rehedge_every'))
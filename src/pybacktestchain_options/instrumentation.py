@@ -0,0 +1,161 @@
+import cProfile
+import json
+import pstats
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+#---------------------------------------------------------
+# Classes
+#---------------------------------------------------------
+
+@dataclass
+class StageStats:
+    seconds: float = 0.0
+    calls: int = 0
+    rows: int = 0
+
+
+class _Stage:
+    """Context manager timing one pass through a stage. Set .rows inside the block."""
+    __slots__ = ('_stats', '_start', 'rows')
+
+    def __init__(self, stats, rows):
+        self._stats = stats
+        self.rows = rows
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        stats = self._stats
+        stats.seconds += time.perf_counter() - self._start
+        stats.calls += 1
+        stats.rows += self.rows
+        return False
+
+
+class _NullStage:
+    """Shared do-nothing stage of a disabled Instrumentation."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Instrumentation:
+    """Wall time, call counts and row counts of the stages of a backtest run.
+
+    Code wraps each stage in ``with instrumentation.stage(name) as s:`` and
+    may set ``s.rows``. Stages may nest (log_transaction runs inside
+    simulate), so their times need not add up to the total. With
+    profile=True the run is also profiled with cProfile, and with
+    trace_memory=True its allocations are traced with tracemalloc, between
+    start() and stop(). A disabled Instrumentation (see
+    NO_INSTRUMENTATION) hands out a shared no-op stage, so instrumented code
+    costs next to nothing when nobody is measuring.
+
+    tracemalloc is process wide: concurrent runs tracing memory see each
+    other's allocations.
+    """
+
+    def __init__(self, enabled=True, profile=False, trace_memory=False, top=20):
+        self.enabled = enabled
+        self.profile = profile and enabled
+        self.trace_memory = trace_memory and enabled
+        self.top = top
+        self.stages = {}
+        self.seconds = 0.0
+        self._start = None
+        self._profiler = None
+        self._memory = None
+        self._traced = False
+
+    def stage(self, name, rows=0):
+        if not self.enabled:
+            return _NULL_STAGE
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = StageStats()
+        return _Stage(stats, rows)
+
+    def start(self):
+        if not self.enabled:
+            return self
+        self._start = time.perf_counter()
+        if self.trace_memory:
+            self._traced = not tracemalloc.is_tracing()
+            if self._traced:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        if self.profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def stop(self):
+        if not self.enabled or self._start is None:
+            return self
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self.trace_memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            self._memory = {
+                'peak_mb': tracemalloc.get_traced_memory()[1] / 2 ** 20,
+                'top': [{'line': str(stat.traceback[0]), 'size_mb': stat.size / 2 ** 20, 'count': stat.count}
+                        for stat in snapshot.statistics('lineno')[:self.top]],
+            }
+            if self._traced:
+                tracemalloc.stop()
+        self.seconds += time.perf_counter() - self._start
+        self._start = None
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _profile_rows(self):
+        stats = pstats.Stats(self._profiler).sort_stats('cumulative')
+        rows = []
+        for func in stats.fcn_list[:self.top]:
+            calls, primitive, tottime, cumtime, _ = stats.stats[func]
+            rows.append({'function': pstats.func_std_string(func), 'calls': calls,
+                         'tottime': tottime, 'cumtime': cumtime})
+        return rows
+
+    def report(self):
+        """JSON ready summary: per-stage seconds, calls and rows, plus the profile and memory captures."""
+        report = {
+            'seconds': self.seconds,
+            'stages': {name: {'seconds': s.seconds, 'calls': s.calls, 'rows': s.rows}
+                       for name, s in self.stages.items()},
+        }
+        if self._profiler is not None:
+            report['profile'] = self._profile_rows()
+        if self._memory is not None:
+            report['memory'] = self._memory
+        return report
+
+    def write(self, path):
+        """Write the report as JSON to path, and the raw cProfile stats to path.prof when profiling."""
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=1)
+        if self._profiler is not None:
+            self._profiler.dump_stats(path + '.prof')
+
+
+NO_INSTRUMENTATION = Instrumentation(enabled=False)
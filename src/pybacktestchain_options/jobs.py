@@ -0,0 +1,190 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass, field
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    submitted_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    owner TEXT,
+    lease_until REAL
+)
+"""
+_LEASE_COLUMNS = {'owner': 'TEXT', 'lease_until': 'REAL'}  # added to tables created before leases
+
+#---------------------------------------------------------
+# Classes
+#---------------------------------------------------------
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when max_queue jobs are already waiting."""
+
+
+@dataclass
+class JobQueue:
+    """Bounded background queue of backtest jobs, persisted in a SQLite table.
+
+    runner(payload) is called in one of max_workers threads and must return a
+    JSON serialisable result. At most max_queue jobs wait for a worker, past
+    that submit raises QueueFull. Every state change is written to db_path,
+    so jobs that were queued or running when the process stopped are queued
+    again the next time a JobQueue opens the same file.
+
+    Several processes can share db_path: a worker claims a queued job with a
+    single conditional UPDATE and only runs it when the claim succeeded, and
+    holds it under a lease of lease_seconds that its queue renews. Running
+    jobs whose lease expired (their process died) are queued again by the
+    other queues, which check every lease_seconds / 3. A worker that lost
+    its lease does not overwrite the job's outcome.
+    """
+    runner: object
+    db_path: str = 'jobs.sqlite'
+    max_workers: int = 2
+    max_queue: int = 16
+    lease_seconds: float = 30.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        with closing(self._connect()) as db, db:
+            db.execute(_SCHEMA)
+            columns = {row[1] for row in db.execute("PRAGMA table_info(jobs)")}
+            for name, kind in _LEASE_COLUMNS.items():
+                if name not in columns:
+                    db.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+        self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='backtest-job')
+        self._pending = 0  # jobs queued or running in this process
+        self._local = set()  # ids of those jobs
+        self._stop = threading.Event()
+        self._recover()
+        self._heartbeat = threading.Thread(target=self._renew_leases, name='backtest-job-lease', daemon=True)
+        self._heartbeat.start()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _update(self, job_id, **columns):
+        """Write the outcome of a job this queue holds, False when its lease was lost meanwhile."""
+        assignments = ', '.join(f"{name} = ?" for name in columns)
+        with self._lock, closing(self._connect()) as db, db:
+            cursor = db.execute(f"UPDATE jobs SET {assignments} WHERE id = ? AND owner = ?",
+                                (*columns.values(), job_id, self._owner))
+        return cursor.rowcount == 1
+
+    def _claim(self, job_id):
+        """Atomically take a queued job, False when another worker or process took it first."""
+        now = time.time()
+        with self._lock, closing(self._connect()) as db, db:
+            cursor = db.execute("UPDATE jobs SET status = ?, owner = ?, started_at = ?, lease_until = ? "
+                                "WHERE id = ? AND status = ?",
+                                (RUNNING, self._owner, now, now + self.lease_seconds, job_id, QUEUED))
+        return cursor.rowcount == 1
+
+    def _recover(self):
+        """Queue again the running jobs whose lease expired and start the queued jobs not held here."""
+        with self._lock, closing(self._connect()) as db, db:
+            db.execute("UPDATE jobs SET status = ?, owner = NULL, started_at = NULL, lease_until = NULL "
+                       "WHERE status = ? AND (lease_until IS NULL OR lease_until < ?)",
+                       (QUEUED, RUNNING, time.time()))
+            rows = db.execute("SELECT id FROM jobs WHERE status = ? ORDER BY submitted_at", (QUEUED,)).fetchall()
+            rows = [job_id for (job_id,) in rows if job_id not in self._local]
+        if rows:
+            logging.info(f"Requeueing {len(rows)} unfinished backtest job(s).")
+        for job_id in rows:
+            self._start(job_id)
+
+    def _renew_leases(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                with self._lock, closing(self._connect()) as db, db:
+                    db.execute("UPDATE jobs SET lease_until = ? WHERE owner = ? AND status = ?",
+                               (time.time() + self.lease_seconds, self._owner, RUNNING))
+                if not self._stop.is_set():
+                    self._recover()
+            except sqlite3.Error as e:
+                logging.warning(f"Could not renew the backtest job leases: {e}")
+
+    def _start(self, job_id):
+        with self._lock:
+            self._pending += 1
+            self._local.add(job_id)
+        self._pool.submit(self._run, job_id)
+
+    @property
+    def depth(self):
+        """Number of jobs waiting for a worker."""
+        return max(0, self._pending - self.max_workers)
+
+    def submit(self, payload):
+        """Store and queue a job, returning its id. Raises QueueFull when the queue is full."""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                raise QueueFull(f"{self.max_queue} backtest jobs are already waiting.")
+            self._pending += 1
+            self._local.add(job_id)
+            with closing(self._connect()) as db, db:
+                db.execute("INSERT INTO jobs (id, status, payload, submitted_at) VALUES (?, ?, ?, ?)",
+                           (job_id, QUEUED, json.dumps(payload), time.time()))
+        self._pool.submit(self._run, job_id)
+        return job_id
+
+    def _run(self, job_id):
+        try:
+            if not self._claim(job_id):
+                return
+            with closing(self._connect()) as db:
+                (payload,) = db.execute("SELECT payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            try:
+                result = self.runner(json.loads(payload))
+            except Exception as e:
+                logging.warning(f"Backtest job {job_id} failed: {e}")
+                written = self._update(job_id, status=FAILED, error=str(e), finished_at=time.time())
+            else:
+                written = self._update(job_id, status=DONE, result=json.dumps(result), finished_at=time.time())
+            if not written:
+                logging.warning(f"Backtest job {job_id} was taken over by another worker, its outcome is dropped.")
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._local.discard(job_id)
+
+    def get(self, job_id, with_result=False):
+        """Return the job as a dict (status, payload, timings and, if asked, result), or None."""
+        with closing(self._connect()) as db:
+            row = db.execute("SELECT id, status, payload, error, submitted_at, started_at, finished_at"
+                             + (", result" if with_result else "") + " FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(['id', 'status', 'payload', 'error', 'submitted_at', 'started_at', 'finished_at'], row))
+        job['payload'] = json.loads(job['payload'])
+        if with_result:
+            job['result'] = json.loads(row[-1]) if row[-1] is not None else None
+        if job['started_at'] is not None:
+            job['queue_seconds'] = job['started_at'] - job['submitted_at']
+            if job['finished_at'] is not None:
+                job['run_seconds'] = job['finished_at'] - job['started_at']
+        return job
+
+    def shutdown(self, wait=True):
+        self._stop.set()
+        self._pool.shutdown(wait=wait)
@@ -1,9 +1,10 @@
 from datetime import datetime
+import logging
 import pandas as pd
-from pybacktestchain.data_module import get_stocks_data 
 from universal_backtest import UniversalBackTest
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     # Parameters
     commo_equity = "COMMO"
     backtest = UniversalBackTest(initial_date=datetime(2023, 4, 1),
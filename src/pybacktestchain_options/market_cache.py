@@ -0,0 +1,269 @@
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+#---------------------------------------------------------
+# Helpers
+#---------------------------------------------------------
+
+def _to_date(value):
+    """Normalise a 'YYYY-MM-DD' string, datetime or date to a date."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def _merge_ranges(ranges):
+    """Merge overlapping or touching [start, end) date ranges."""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _missing_ranges(ranges, start, end):
+    """Return the parts of [start, end) not covered by the (merged) ranges."""
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in ranges:
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def _atomic_write(path, write):
+    """Call write(tmp_path) and move the result over path in one step."""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+#---------------------------------------------------------
+# Classes
+#---------------------------------------------------------
+
+@dataclass
+class MarketDataCache:
+    """On-disk cache of provider histories, one Parquet file per ticker.
+
+    Each ticker has a data file and a JSON sidecar listing the [start, end)
+    date ranges already fetched, and the past ones the provider had no rows
+    for, so a request only downloads the gaps it does not cover. Files are replaced atomically. Entries older than max_age are
+    refetched, and the least recently used tickers are evicted once the cache
+    grows past max_bytes. In offline mode the provider is never called and
+    requests are served from whatever is on disk. Concurrent requests for
+    the same ticker (e.g. a retry while a timed out attempt is still running)
+    are serialised, so they never write its files at the same time.
+    """
+    directory: str = 'market_data'
+    max_bytes: int = None
+    max_age: timedelta = None  # timedelta or seconds
+    offline: bool = False
+    verbose: bool = True
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+    _ticker_locks: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def _key(ticker):
+        return re.sub(r'[^A-Za-z0-9_.-]', '_', ticker)
+
+    def _paths(self, ticker):
+        base = os.path.join(self.directory, self._key(ticker))
+        return base + '.parquet', base + '.json'
+
+    def _read_meta(self, ticker):
+        _, meta_path = self._paths(ticker)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        meta['ranges'] = [[_to_date(s), _to_date(e)] for s, e in meta['ranges']]
+        meta['empty'] = [[_to_date(s), _to_date(e)] for s, e in meta.get('empty', [])]
+        return meta
+
+    def _write_meta(self, ticker, meta):
+        _, meta_path = self._paths(ticker)
+        payload = dict(meta, ranges=[[s.isoformat(), e.isoformat()] for s, e in meta['ranges']],
+                       empty=[[s.isoformat(), e.isoformat()] for s, e in meta['empty']])
+
+        def write(tmp_path):
+            with open(tmp_path, 'w') as f:
+                json.dump(payload, f)
+        _atomic_write(meta_path, write)
+
+    def _read_data(self, ticker):
+        data_path, _ = self._paths(ticker)
+        if not os.path.exists(data_path):
+            return pd.DataFrame()
+        return pd.read_parquet(data_path)
+
+    @property
+    def _max_age_seconds(self):
+        if isinstance(self.max_age, timedelta):
+            return self.max_age.total_seconds()
+        return self.max_age
+
+    def _is_expired(self, meta):
+        return self.max_age is not None and time.time() - meta['fetched_at'] > self._max_age_seconds
+
+    def _ticker_lock(self, ticker):
+        with self._lock:
+            return self._ticker_locks.setdefault(self._key(ticker), threading.Lock())
+
+    def get(self, ticker, start_date, end_date, provider):
+        """Return the provider history of ticker over [start_date, end_date), fetching only missing gaps."""
+        with self._ticker_lock(ticker):
+            return self._get(ticker, start_date, end_date, provider)
+
+    def _get(self, ticker, start_date, end_date, provider):
+        start, end = _to_date(start_date), _to_date(end_date)
+        meta = self._read_meta(ticker)
+        if meta is not None and self._is_expired(meta) and not self.offline:
+            self._remove(self._key(ticker))
+            meta = None
+        if meta is None:
+            meta = {'ranges': [], 'empty': [], 'fetched_at': time.time()}
+            data = pd.DataFrame()
+        else:
+            data = self._read_data(ticker)
+
+        gaps = _missing_ranges(_merge_ranges(meta['ranges'] + meta['empty']), start, end)
+        if gaps and self.offline:
+            if self.verbose:
+                logging.warning(f"Offline mode: {ticker} is missing {len(gaps)} range(s) between {start} and {end}.")
+        elif gaps:
+            results = [(gap, provider.history(ticker, gap[0].isoformat(), gap[1].isoformat())) for gap in gaps]
+            filled = [gap for gap, df in results if not df.empty]
+            fetched = [df for _, df in results if not df.empty]
+            if fetched:
+                data = pd.concat([data] + fetched) if not data.empty else pd.concat(fetched)
+                data = data[~data.index.duplicated(keep='last')].sort_index()
+            # Do not mark today or the future as fetched, those bars may still change. Past
+            # gaps without rows (holidays, before listing) are kept apart as empty until the
+            # entry expires, so they are not requested again on every call
+            today = date.today()
+            empty = [gap for gap, df in results if df.empty]
+            meta['ranges'] = _merge_ranges(meta['ranges'] + [[s, min(e, today)] for s, e in filled if s < today])
+            meta['empty'] = _merge_ranges(meta['empty'] + [[s, min(e, today)] for s, e in empty if s < today])
+            meta['fetched_at'] = time.time()
+            if not data.empty:
+                data_path, _ = self._paths(ticker)
+                _atomic_write(data_path, lambda tmp_path: data.to_parquet(tmp_path))
+
+        if meta['ranges'] or meta['empty']:
+            meta['last_access'] = time.time()
+            self._write_meta(ticker, meta)
+        if gaps and not self.offline:
+            self.evict(keep=ticker)
+        return self._slice(data, start, end)
+
+    def versions(self, tickers, start_date, end_date):
+        """{ticker: [fetched_at, cached ranges, empty ranges]} of the parts of [start_date, end_date)
+        on disk, None for the tickers not cached: what a result computed from the cache depends on."""
+        start, end = _to_date(start_date), _to_date(end_date)
+        versions = {}
+
+        def clip(ranges):
+            return [[max(s, start).isoformat(), min(e, end).isoformat()] for s, e in ranges if s < end and e > start]
+        for ticker in tickers:
+            with self._ticker_lock(ticker):
+                meta = self._read_meta(ticker)
+            if meta is None:
+                versions[ticker] = None
+                continue
+            versions[ticker] = [meta['fetched_at'], clip(meta['ranges']), clip(meta['empty'])]
+        return versions
+
+    @staticmethod
+    def _slice(data, start, end):
+        if data.empty:
+            return data
+        index = data.index
+        if getattr(index, 'tz', None) is not None:
+            index = index.tz_localize(None)
+        mask = (index >= pd.Timestamp(start)) & (index < pd.Timestamp(end))
+        return data[mask]
+
+    def entries(self):
+        """Return a DataFrame describing the cached tickers (size, fetch time, last access)."""
+        rows = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            base = os.path.join(self.directory, name[:-len('.json')])
+            try:
+                with open(base + '.json') as f:
+                    meta = json.load(f)
+                size = sum(os.path.getsize(p) for p in (base + '.json', base + '.parquet') if os.path.exists(p))
+            except FileNotFoundError:  # removed by a concurrent eviction
+                continue
+            rows.append({'key': name[:-len('.json')], 'bytes': size,
+                         'fetched_at': meta['fetched_at'], 'last_access': meta.get('last_access', meta['fetched_at'])})
+        return pd.DataFrame(rows, columns=['key', 'bytes', 'fetched_at', 'last_access'])
+
+    def _remove(self, key):
+        base = os.path.join(self.directory, key)
+        for path in (base + '.json', base + '.parquet'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def evict(self, keep=None):
+        """Drop expired tickers, then least recently used ones until the cache fits in max_bytes."""
+        with self._lock:
+            self._evict(keep)
+
+    def _evict(self, keep):
+        entries = self.entries()
+        if entries.empty:
+            return
+        keep_key = self._key(keep) if keep else None
+        if self.max_age is not None:
+            expired = entries['fetched_at'] < time.time() - self._max_age_seconds
+            for key in entries.loc[expired & (entries['key'] != keep_key), 'key']:
+                self._remove(key)
+            entries = entries[~expired | (entries['key'] == keep_key)]
+        if self.max_bytes is not None:
+            total = entries['bytes'].sum()
+            for _, entry in entries.sort_values('last_access').iterrows():
+                if total <= self.max_bytes:
+                    break
+                if entry['key'] == keep_key:
+                    continue
+                self._remove(entry['key'])
+                total -= entry['bytes']
+                if self.verbose:
+                    logging.info(f"Evicted {entry['key']} from the market data cache.")
+
+    def clear(self):
+        """Remove every cached ticker."""
+        for key in self.entries()['key']:
+            self._remove(key)
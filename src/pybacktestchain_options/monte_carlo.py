@@ -0,0 +1,222 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from utils import OptionGreeks, OptionUtils
+
+#---------------------------------------------------------
+# Classes
+#---------------------------------------------------------
+
+@dataclass
+class PathModel:
+    """Geometric Brownian motion for the underlying, with optional Merton jumps.
+
+    Jumps arrive at rate jump_intensity per year and multiply the spot by
+    exp(J), J ~ N(jump_mean, jump_std^2). The drift is compensated so that
+    E[S_t] = S0 exp(mu t) with or without jumps.
+    """
+    S0: float
+    mu: float
+    sigma: float
+    jump_intensity: float = 0.0
+    jump_mean: float = 0.0
+    jump_std: float = 0.0
+
+    def step(self, S, dt, rng, normals):
+        """Advance the spots S (a 1-D array) by dt in place, using normals as scratch."""
+        kappa = math.exp(self.jump_mean + 0.5 * self.jump_std ** 2) - 1.0
+        drift = (self.mu - 0.5 * self.sigma ** 2 - self.jump_intensity * kappa) * dt
+        rng.standard_normal(out=normals)
+        normals *= self.sigma * math.sqrt(dt)
+        normals += drift
+        if self.jump_intensity > 0:
+            jumps = rng.poisson(self.jump_intensity * dt, size=len(S))
+            hit = np.flatnonzero(jumps)
+            if len(hit):
+                # the sum of n normal jump sizes is N(n mean, n std^2)
+                n = jumps[hit]
+                normals[hit] += n * self.jump_mean + np.sqrt(n) * self.jump_std * rng.standard_normal(len(hit))
+        np.exp(normals, out=normals)
+        S *= normals
+        return S
+
+    def sample(self, n_paths, n_steps, horizon, seed=None):
+        """Whole paths as an (n_paths, n_steps + 1) array starting at S0."""
+        rng = np.random.default_rng(seed)
+        dt = horizon / n_steps
+        paths = np.empty((n_paths, n_steps + 1))
+        paths[:, 0] = self.S0
+        S = paths[:, 0].copy()
+        normals = np.empty(n_paths)
+        for k in range(1, n_steps + 1):
+            paths[:, k] = self.step(S, dt, rng, normals)
+        return paths
+
+
+@dataclass
+class OptionLeg:
+    quantity: float
+    strike: float
+    maturity: float  # in years from the start of the simulation
+    is_call: bool = True
+
+
+@dataclass
+class OptionBook:
+    """Static option position, plus a quantity of the underlying."""
+    legs: list = field(default_factory=list)
+    underlying: float = 0.0
+
+    @classmethod
+    def straddle(cls, strike, maturity, quantity=1.0):
+        return cls([OptionLeg(quantity, strike, maturity, True), OptionLeg(quantity, strike, maturity, False)])
+
+    def value(self, S, t, r, sigma, buffers=None):
+        """Mark-to-market value of the book at time t for an array of spots.
+
+        Legs still alive are priced with OptionUtils.price_and_greeks, expired
+        ones at their payoff. buffers (one OptionGreeks per leg, shaped like S)
+        are reused when given."""
+        S = np.asarray(S, dtype=float)
+        total = self.underlying * S
+        for i, leg in enumerate(self.legs):
+            remaining = leg.maturity - t
+            if remaining > 1e-12:
+                out = buffers[i] if buffers is not None else None
+                total += leg.quantity * OptionUtils.price_and_greeks(S, leg.strike, remaining, r, sigma,
+                                                                     leg.is_call, out=out).price
+            else:
+                payoff = S - leg.strike if leg.is_call else leg.strike - S
+                total += leg.quantity * np.maximum(payoff, 0.0)
+        return total
+
+    def mark(self, S, t, r, sigma):
+        """Value and delta of the book for spots S at times t (broadcast against S).
+
+        Unlike value(), t may vary along S, e.g. S of shape (paths, times) with
+        t of shape (times,), so a whole path grid is marked in one pass per leg.
+        """
+        S = np.asarray(S, dtype=float)
+        t = np.asarray(t, dtype=float)
+        value = self.underlying * S
+        delta = np.full(S.shape, float(self.underlying))
+        for leg in self.legs:
+            remaining = leg.maturity - t
+            alive = remaining > 1e-12
+            greeks = OptionUtils.price_and_greeks(S, leg.strike, np.where(alive, remaining, 1.0), r, sigma,
+                                                  leg.is_call)
+            if leg.is_call:
+                payoff, payoff_delta = np.maximum(S - leg.strike, 0.0), (S > leg.strike).astype(float)
+            else:
+                payoff, payoff_delta = np.maximum(leg.strike - S, 0.0), -(S < leg.strike).astype(float)
+            value += leg.quantity * np.where(alive, greeks.price, payoff)
+            delta += leg.quantity * np.where(alive, greeks.delta, payoff_delta)
+        return value, delta
+
+
+@dataclass
+class PnLDistribution:
+    """P&L of a book over simulated paths.
+
+    pnl holds one value per path (in path order) and worst the lowest P&L seen
+    along each path at the marking dates."""
+    pnl: np.ndarray
+    worst: np.ndarray
+    initial_value: float
+
+    @property
+    def mean(self):
+        return float(self.pnl.mean())
+
+    @property
+    def std(self):
+        return float(self.pnl.std(ddof=1))
+
+    def quantile(self, q):
+        return np.quantile(self.pnl, q)
+
+    def value_at_risk(self, level=0.99):
+        """Loss not exceeded with probability level, as a positive number."""
+        return float(-np.quantile(self.pnl, 1 - level))
+
+    def expected_shortfall(self, level=0.99):
+        threshold = np.quantile(self.pnl, 1 - level)
+        return float(-self.pnl[self.pnl <= threshold].mean())
+
+    def histogram(self, bins=50):
+        return np.histogram(self.pnl, bins=bins)
+
+
+@dataclass
+class MonteCarloEngine:
+    """Simulate the P&L of an OptionBook over paths of a PathModel, chunk by chunk.
+
+    Paths are generated chunk_size at a time and only the current spot of a
+    chunk is kept, so the working memory depends on chunk_size, not on
+    n_paths or n_steps. The book is marked every mark_every steps and at the
+    horizon. Each chunk draws from its own child of SeedSequence(seed), so
+    results are the same whatever max_workers is; with max_workers > 1 the
+    chunks run in a process pool.
+    """
+    model: PathModel
+    n_paths: int = 100_000
+    n_steps: int = 252
+    horizon: float = 1.0  # in years
+    chunk_size: int = 10_000
+    seed: int = 0
+    max_workers: int = None  # 1 (or None) runs in this process
+    mark_every: int = None  # mark the book along the path, only at the horizon when None
+
+    def __post_init__(self):
+        # the book is marked at the last step, there must be one
+        if self.n_steps < 1 or self.n_paths < 1 or self.chunk_size < 1:
+            raise ValueError("n_steps, n_paths and chunk_size must be at least 1")
+
+    def chunks(self):
+        """(number of paths, SeedSequence) of every chunk."""
+        n_chunks = -(-self.n_paths // self.chunk_size)
+        seeds = np.random.SeedSequence(self.seed).spawn(n_chunks)
+        sizes = [min(self.chunk_size, self.n_paths - i * self.chunk_size) for i in range(n_chunks)]
+        return list(zip(sizes, seeds))
+
+    def run(self, book, r=0.0, sigma=None):
+        """Simulate the book and return its PnLDistribution.
+
+        :param book: OptionBook
+        :param r: Risk-free rate used to price the options
+        :param sigma: Volatility used to price the options, the model's when None
+        """
+        sigma = self.model.sigma if sigma is None else sigma
+        initial_value = float(book.value(np.array([self.model.S0]), 0.0, r, sigma)[0])
+        tasks = [(self, book, r, sigma, initial_value, size, seed) for size, seed in self.chunks()]
+        if self.max_workers and self.max_workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as pool:
+                results = list(pool.map(_run_chunk, tasks))
+        else:
+            results = [_run_chunk(task) for task in tasks]
+        pnl = np.concatenate([p for p, _ in results])
+        worst = np.concatenate([w for _, w in results])
+        return PnLDistribution(pnl, worst, initial_value)
+
+    def _simulate_chunk(self, book, r, sigma, initial_value, size, seed):
+        rng = np.random.default_rng(seed)
+        dt = self.horizon / self.n_steps
+        S = np.full(size, float(self.model.S0))
+        normals = np.empty(size)
+        buffers = [OptionGreeks.empty(size) for _ in book.legs]
+        worst = np.full(size, np.inf)
+        for k in range(1, self.n_steps + 1):
+            self.model.step(S, dt, rng, normals)
+            if k == self.n_steps or (self.mark_every and k % self.mark_every == 0):
+                pnl = book.value(S, k * dt, r, sigma, buffers)
+                pnl -= initial_value
+                np.minimum(worst, pnl, out=worst)
+        return pnl, worst
+
+
+def _run_chunk(task):
+    engine, book, r, sigma, initial_value, size, seed = task
+    return engine._simulate_chunk(book, r, sigma, initial_value, size, seed)
@@ -0,0 +1,247 @@
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from signals import rolling_covariance
+
+#---------------------------------------------------------
+# Hedge ratios and covariances
+#---------------------------------------------------------
+
+def rolling_hedge_ratios(near, long, windows):
+    """
+    Minimum variance hedge ratios of every pair for every window, in one pass.
+
+    For each pair the near leg is hedged with h long legs, h = cov(dn, dl) / var(dl)
+    over the daily price changes of the window, the closed form of
+    minimizing var(dn - h dl). The window moments come from
+    rolling_covariance, so all pairs and windows cost a few array passes.
+
+    :param near, long: (T x P) leg prices of P pairs
+    :param windows: Window lengths, in price changes
+    :return: (ratio, residual_variance), (windows x T x P) arrays aligned to the price rows,
+             NaN until a window is full. residual_variance is the daily variance of dn - h dl.
+    """
+    dn = np.diff(np.asarray(near, dtype=float), axis=0)
+    dl = np.diff(np.asarray(long, dtype=float), axis=0)
+    windows = np.asarray(windows, dtype=np.intp)
+    if (windows < 2).any():
+        raise ValueError("windows must be at least 2 observations long")
+    ratio = np.full((len(windows), len(dn) + 1, dn.shape[1]), np.nan)
+    residual = np.full_like(ratio, np.nan)
+    for k, w in enumerate(windows):
+        if w > len(dn):
+            continue
+        var_n = rolling_covariance(dn, dn, w)[2]
+        var_l = rolling_covariance(dl, dl, w)[2]
+        cov = rolling_covariance(dn, dl, w)[2]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            h = cov / var_l
+        ratio[k, w:] = h
+        residual[k, w:] = np.maximum(var_n - h * cov, 0.0)
+    return ratio, residual
+
+
+def window_covariances(values, window, ends):
+    """
+    Sample covariance matrices of the columns of values over trailing windows.
+
+    :param values: (T x K) array, e.g. daily spread changes
+    :param window: Number of rows in each window
+    :param ends: Rows ending the windows (included), all >= window - 1
+    :return: (len(ends) x K x K) covariances (ddof=1)
+    """
+    blocks = sliding_window_view(np.asarray(values, dtype=float), window, axis=0)[np.asarray(ends) - window + 1]
+    centred = blocks - blocks.mean(axis=2, keepdims=True)
+    return centred @ centred.transpose(0, 2, 1) / (window - 1)
+
+#---------------------------------------------------------
+# Minimum variance portfolios
+#---------------------------------------------------------
+
+def _project_l1_ball(v, radius):
+    """Euclidean projection of every row of v onto {x : sum(|x|) <= radius} (Duchi et al., 2008)."""
+    a = np.abs(v)
+    inside = a.sum(axis=1) <= radius
+    if inside.all():
+        return v.copy()
+    mu = -np.sort(-a, axis=1)
+    excess = (np.cumsum(mu, axis=1) - radius) / np.arange(1, v.shape[1] + 1)
+    count = (mu > excess).sum(axis=1)
+    theta = np.maximum(excess[np.arange(len(v)), count - 1], 0.0)
+    theta[inside] = 0.0
+    return np.sign(v) * np.maximum(a - theta[:, None], 0.0)
+
+
+def _solve_signs(cov, signs, gross_limit, tol):
+    """
+    Exact solutions of the gross limited problems for given signs of the weights.
+
+    With the signs s of the optimum known, the limit binds as s'w = gross_limit
+    and the problem is an equality constrained QP on the nonzero weights,
+    solved with one batched linear system. The candidate is the optimum when
+    it satisfies the KKT conditions: signs kept, a nonnegative multiplier mu
+    of the limit and |2 (C w)_i + nu| <= mu on the zero weights (for long
+    only portfolios nu and mu are not separable, 2 (C w)_i + nu >= 0 there).
+    Otherwise the signs are corrected, primal-dual active set style: weights
+    that changed sign are zeroed and zero weights violating their condition
+    enter with the sign that lowers the variance.
+
+    :param signs: (B x K) -1, 0 or 1
+    :return: (weights, optimal, signs), optimal is False where the signs were wrong, signs the corrected ones
+    """
+    n_problems, k = signs.shape
+    support = signs != 0
+    both = support[:, :, None] & support[:, None, :]
+    system = np.where(both, cov, 0.0) + np.where(support, 0.0, 1.0)[:, :, None] * np.eye(k)
+    rhs = np.stack([support.astype(float), signs], axis=2)
+    try:
+        x = np.linalg.solve(system, rhs)  # C_S^-1 [1, s] on the support, 0 elsewhere
+    except np.linalg.LinAlgError:
+        return np.full(signs.shape, np.nan), np.zeros(n_problems, dtype=bool), signs
+    # w = alpha x1 + beta x2 with 1'w = 1 and s'w = gross_limit
+    gram = np.einsum('bki,bkj->bij', rhs, x)
+    det = gram[:, 0, 0] * gram[:, 1, 1] - gram[:, 0, 1] * gram[:, 1, 0]
+    # weights of one sign: s'w = 1'w, the limit can only bind at gross_limit = 1 (no short weights)
+    long_only = (signs >= 0).all(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        alpha = np.where(long_only, 1 / gram[:, 0, 0], (gram[:, 1, 1] - gram[:, 0, 1] * gross_limit) / det)
+        beta = np.where(long_only, 0.0, (gram[:, 0, 0] * gross_limit - gram[:, 1, 0]) / det)
+        weights = alpha[:, None] * x[:, :, 0] + beta[:, None] * x[:, :, 1]
+        nu, mu = -2 * alpha, -2 * beta
+        gradient = 2 * np.einsum('bij,bj->bi', cov, weights) + nu[:, None]
+    scale = tol * np.maximum(np.abs(mu), np.abs(nu))[:, None]
+    limit = np.where(long_only[:, None], np.where(gradient < 0, 0.0, np.inf), mu[:, None]) + scale
+    entering = ~support & (np.abs(gradient) > limit)
+    leaving = support & (weights * signs < 0)
+    finite = np.isfinite(weights).all(axis=1)
+    optimal = (finite & (mu >= 0) & (~long_only | (gross_limit <= 1 + tol))
+               & ~(entering | leaving).any(axis=1))
+    corrected = np.where(leaving, 0.0, np.where(entering, -np.sign(gradient), signs))
+    return weights, optimal, np.where(finite[:, None], corrected, signs)
+
+
+def _active_set(cov, guess, gross_limit, tol, rounds):
+    """Up to rounds sign corrections of _solve_signs from the signs of guess, on the problems not solved yet.
+
+    :return: (weights, optimal)
+    """
+    signs = np.sign(np.where(np.abs(guess) > tol * gross_limit, guess, 0.0))
+    weights = np.full(guess.shape, np.nan)
+    optimal = np.zeros(len(guess), dtype=bool)
+    todo = np.arange(len(guess))
+    for _ in range(rounds):
+        w, done, corrected = _solve_signs(cov[todo], signs[todo], gross_limit, tol)
+        weights[todo[done]] = w[done]
+        optimal[todo[done]] = True
+        signs[todo] = corrected
+        todo = todo[~done]
+        if not todo.size:
+            break
+    return weights, optimal
+
+
+@dataclass
+class QPResult:
+    """Weights of a batch of minimum variance problems."""
+    weights: np.ndarray  # (B x K), summing to 1
+    converged: np.ndarray  # (B,) False where max_iter was reached first or the covariance is singular
+    iterations: int  # ADMM iterations of the slowest problem, 0 when none was needed
+
+
+def min_variance_weights(cov, gross_limit=np.inf, warm_start=None, tol=1e-9, max_iter=2000, polish_every=10,
+                         rcond=1e-12):
+    """
+    Minimum variance portfolios of a batch of covariance matrices, under a gross exposure limit.
+
+    Minimizes w' C w subject to sum(w) = 1 and sum(|w|) <= gross_limit for
+    every C of the batch. Where the unconstrained optimum C^-1 1 / 1' C^-1 1
+    respects the limit it is the answer. Otherwise the optimum is found
+    exactly once the signs of its weights are known, so active set rounds
+    start from the signs of the warm start (or of the unconstrained optimum
+    projected on the limit). The problems where they cycle are solved
+    together by ADMM (w = z, z in the gross limit ball), every iteration one
+    batched matrix-vector product with the (C + rho I)^-1 factored once and
+    an L1 ball projection, with a few active set rounds from the signs of
+    the iterates every polish_every iterations. Problems are dropped from
+    later iterations once solved.
+
+    Singular or ill-conditioned matrices (a flat spread, a window shorter
+    than K) have no well defined optimum: their weights are NaN and they
+    are reported as not converged, without affecting the rest of the batch.
+
+    :param cov: (B x K x K) or (K x K) covariance matrices
+    :param gross_limit: Upper bound on sum(|w|), at least 1 (the margin limit in units of the book)
+    :param warm_start: Optional (B x K) or (K,) weights to start from, e.g. the solution of the
+                       previous window
+    :param tol: Tolerance on the KKT conditions and the ADMM residuals
+    :param max_iter: Maximum number of ADMM iterations
+    :param polish_every: ADMM iterations between two active set polishes
+    :param rcond: Matrices with lambda_min <= rcond * lambda_max are treated as singular
+    :return: QPResult
+    """
+    cov = np.asarray(cov, dtype=float)
+    single = cov.ndim == 2
+    cov = cov[None] if single else cov
+    n_problems, k = cov.shape[:2]
+    if gross_limit < 1:
+        raise ValueError("gross_limit must be at least 1, the weights sum to 1")
+
+    eigenvalues = np.full((n_problems, k), np.nan)
+    finite = np.isfinite(cov).all(axis=(1, 2))
+    eigenvalues[finite] = np.linalg.eigvalsh(cov[finite])
+    regular = eigenvalues[:, 0] > rcond * eigenvalues[:, -1]  # False for NaN too
+    weights = np.full((n_problems, k), np.nan)
+    converged = regular.copy()
+    if not regular.all():
+        logging.warning(f"{n_problems - regular.sum()} singular covariance matrices, their weights are NaN.")
+
+    inv_ones = np.linalg.solve(cov[regular], np.ones((regular.sum(), k, 1)))[..., 0]
+    weights[regular] = inv_ones / inv_ones.sum(axis=1, keepdims=True)
+    idx = np.flatnonzero(regular)[np.abs(weights[regular]).sum(axis=1) > gross_limit * (1 + tol)]
+    iterations = 0
+    if not idx.size:
+        return QPResult(weights[0] if single else weights, converged[0] if single else converged, iterations)
+
+    if warm_start is None:
+        z = _project_l1_ball(weights[idx], gross_limit)
+    else:
+        z = np.broadcast_to(np.asarray(warm_start, dtype=float), (n_problems, k))[idx].copy()
+    polished, optimal = _active_set(cov[idx], z, gross_limit, tol, rounds=10)
+    weights[idx[optimal]] = polished[optimal]
+    idx, z = idx[~optimal], z[~optimal]
+
+    low, high = eigenvalues[idx, :1], eigenvalues[idx, -1:]
+    # sqrt(lambda_min lambda_max) balances the ADMM steps, floored for ill-conditioned matrices
+    rho = np.sqrt(np.maximum(low, 1e-6 * high) * high)
+    inverse = np.linalg.inv(cov[idx] + rho[:, :, None] * np.eye(k))
+    b = inverse.sum(axis=2)  # (C + rho I)^-1 1
+    b_sum = b.sum(axis=1)
+    u = np.zeros_like(z)
+    w = z
+    while idx.size and iterations < max_iter:
+        iterations += 1
+        # w step: minimize w'Cw + rho |w - z + u|^2 on sum(w) = 1
+        a = np.einsum('bij,bj->bi', inverse, rho * (z - u))
+        w = a - ((a.sum(axis=1) - 1) / b_sum)[:, None] * b
+        z_prev = z
+        z = _project_l1_ball(w + u, gross_limit)
+        u += w - z
+        done = (np.abs(w - z).max(axis=1) <= tol) & (np.abs(z - z_prev).max(axis=1) <= tol)
+        if iterations % polish_every == 0:
+            polished, optimal = _active_set(cov[idx], z, gross_limit, tol, rounds=10)
+            w = np.where(optimal[:, None], polished, w)
+            done |= optimal
+        if done.any():
+            weights[idx[done]] = w[done]
+            keep = ~done
+            idx, inverse, b, b_sum, rho, z, u, w = (x[keep] for x in (idx, inverse, b, b_sum, rho, z, u, w))
+    if idx.size:
+        weights[idx] = w
+        converged[idx] = False
+        logging.warning(f"{idx.size} minimum variance problems did not converge in {max_iter} iterations.")
+    if single:
+        return QPResult(weights[0], converged[0], iterations)
+    return QPResult(weights, converged, iterations)
@@ -0,0 +1,221 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Rows valued per block: the block's (rows x commodities) temporaries stay in
+# the CPU cache, the valuation makes many passes over them
+BLOCK_ROWS = 64
+
+#---------------------------------------------------------
+# Functions
+#---------------------------------------------------------
+
+def forward_fill(prices):
+    """Carry the last finite price of every column over the following missing rows."""
+    prices = np.asarray(prices, dtype=float)
+    finite = np.isfinite(prices)
+    if finite.all():
+        return prices
+    rows = np.where(finite, np.arange(len(prices))[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = prices[rows, np.arange(prices.shape[1])]
+    filled[~np.maximum.accumulate(finite, axis=0)] = np.nan  # nothing to carry yet
+    return filled
+
+
+def _known_prices(prices):
+    """Forward filled prices, 0 before a commodity's first price."""
+    prices = np.asarray(prices, dtype=float)
+    if np.isfinite(prices).all():
+        return prices
+    return np.nan_to_num(forward_fill(prices))
+
+
+def _overnight_pnl(quantity, prices, start, stop, out, scratch=None):
+    """P&L of the quantities held into rows start:stop on those rows' price changes, written
+    to out, the (stop - start) rows of the block, or added to it through scratch."""
+    first = max(start, 1)  # nothing is held into the first row
+    out = out[first - start:]
+    move = out if scratch is None else scratch[:len(out)]
+    np.subtract(prices[first:stop], prices[first - 1:stop - 1], out=move)
+    move *= quantity[first - 1:stop - 1]
+    if scratch is not None:
+        out += move
+
+
+def _traded(quantity, prices, start, stop, scratch):
+    """Notional of the quantity changes of rows start:stop at those rows' prices, summed per row."""
+    change = scratch[:stop - start]
+    if start == 0:
+        change[0] = quantity[0]
+        np.subtract(quantity[1:stop], quantity[:stop - 1], out=change[1:])
+    else:
+        np.subtract(quantity[start:stop], quantity[start - 1:stop - 1], out=change)
+    np.abs(change, out=change)
+    return np.einsum('ij,ij->i', change, prices[start:stop])
+
+
+def evaluate(calendar, commodities, near, long, near_qty, long_qty, cash, periods_per_year=252):
+    """Mark the book to market every day and compute its performance in one vectorised pass.
+
+    Missing prices are carried forward from the last known ones; positions
+    cannot be held before a commodity's first price.
+
+    :param calendar: Dates of the rows
+    :param commodities: Names of the columns
+    :param near, long: (days x commodities) leg prices, NaN when missing
+    :param near_qty, long_qty: (days x commodities) end-of-day quantities
+    :param cash: (days,) end-of-day cash
+    :return: PerformanceReport
+    """
+    near, long = _known_prices(near), _known_prices(long)
+    near_qty = np.asarray(near_qty, dtype=float)
+    long_qty = np.asarray(long_qty, dtype=float)
+    cash = np.asarray(cash, dtype=float)
+    n_days, n_commodities = near.shape
+    equity = np.empty(n_days)
+    turnover = np.empty(n_days)
+    pnl = np.zeros((n_days, n_commodities + 1))
+    price_pnl = pnl[:, :-1]
+    scratch = np.empty((min(BLOCK_ROWS, n_days), n_commodities))  # reused by every block
+
+    # memory bound with hundreds of curves: value BLOCK_ROWS days at a time
+    for start in range(0, n_days, BLOCK_ROWS):
+        stop = min(start + BLOCK_ROWS, n_days)
+        rows = slice(start, stop)
+        equity[rows] = cash[rows]
+        turnover[rows] = 0.0
+        # one leg at a time, while its rows are in the cache
+        for quantity, prices, add in ((near_qty, near, None), (long_qty, long, scratch)):
+            equity[rows] += np.einsum('ij,ij->i', quantity[rows], prices[rows])
+            # P&L of the quantities held overnight on the commodities' price moves
+            _overnight_pnl(quantity, prices, start, stop, price_pnl[rows], add)
+            # traded notional, valued at the prices of the trade day
+            turnover[rows] += _traded(quantity, prices, start, stop, scratch)
+
+    # what is left of the equity change comes from trading and newly opened positions
+    pnl[:, -1] = np.diff(equity, prepend=equity[:1]) - price_pnl.sum(axis=1)
+    attribution = pd.DataFrame(pnl, index=calendar, columns=list(commodities) + ['Trading'], copy=False)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.diff(equity) / equity[:-1]
+        peak = np.maximum.accumulate(equity)
+        drawdown = equity / peak - 1
+    returns = returns[np.isfinite(returns)]
+
+    return PerformanceReport(
+        equity=pd.Series(equity, index=calendar, name='Portfolio Value'),
+        drawdown=pd.Series(drawdown, index=calendar, name='Drawdown'),
+        turnover=pd.Series(turnover, index=calendar, name='Turnover'),
+        attribution=attribution,
+        returns=returns,
+        periods_per_year=periods_per_year,
+    )
+
+#---------------------------------------------------------
+# Classes
+#---------------------------------------------------------
+
+@dataclass
+class PerformanceReport:
+    """Daily equity curve of a backtest with its drawdown, turnover and P&L attribution."""
+    equity: pd.Series
+    drawdown: pd.Series
+    turnover: pd.Series
+    attribution: pd.DataFrame  # daily P&L per commodity, plus the Trading residual
+    returns: np.ndarray  # daily simple returns
+    periods_per_year: int = 252
+
+    @property
+    def total_return(self):
+        if len(self.equity) == 0 or self.equity.iloc[0] == 0:
+            return np.nan
+        return self.equity.iloc[-1] / self.equity.iloc[0] - 1
+
+    @property
+    def sharpe(self):
+        if len(self.returns) < 2 or self.returns.std(ddof=1) == 0:
+            return np.nan
+        return self.returns.mean() / self.returns.std(ddof=1) * np.sqrt(self.periods_per_year)
+
+    @property
+    def max_drawdown(self):
+        return float(self.drawdown.min()) if len(self.drawdown) else np.nan
+
+    @property
+    def annual_turnover(self):
+        """Traded notional per year over the average portfolio value."""
+        if len(self.equity) == 0:
+            return np.nan
+        return self.turnover.sum() / self.equity.mean() * self.periods_per_year / len(self.equity)
+
+    def pnl_by_commodity(self):
+        return self.attribution.sum()
+
+    def summary(self):
+        return {
+            'final_value': float(self.equity.iloc[-1]) if len(self.equity) else np.nan,
+            'total_return': float(self.total_return),
+            'sharpe': float(self.sharpe),
+            'max_drawdown': self.max_drawdown,
+            'annual_turnover': float(self.annual_turnover),
+        }
+
+
+class RunningPerformance:
+    """PerformanceReport statistics updated one portfolio value at a time.
+
+    Keeps O(1) state (first and last value, running peak and drawdown,
+    Welford mean and variance of the simple returns), for replays that never
+    hold the whole equity curve. Turnover and attribution need the full
+    history and are not tracked.
+    """
+
+    def __init__(self, periods_per_year=252):
+        self.periods_per_year = periods_per_year
+        self.count = 0
+        self.first = self.last = self.peak = np.nan
+        self.max_drawdown = np.nan
+        self._n_returns = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, value):
+        value = float(value)
+        if self.count == 0:
+            self.first = self.peak = value
+            self.max_drawdown = 0.0
+        else:
+            if self.last != 0:
+                r = value / self.last - 1
+                if np.isfinite(r):
+                    self._n_returns += 1
+                    delta = r - self._mean
+                    self._mean += delta / self._n_returns
+                    self._m2 += delta * (r - self._mean)
+            self.peak = max(self.peak, value)
+        if self.peak:
+            self.max_drawdown = min(self.max_drawdown, value / self.peak - 1)
+        self.last = value
+        self.count += 1
+
+    @property
+    def total_return(self):
+        if self.count == 0 or self.first == 0:
+            return np.nan
+        return self.last / self.first - 1
+
+    @property
+    def sharpe(self):
+        if self._n_returns < 2 or self._m2 == 0:
+            return np.nan
+        return self._mean / np.sqrt(self._m2 / (self._n_returns - 1)) * np.sqrt(self.periods_per_year)
+
+    def summary(self):
+        return {
+            'final_value': self.last,
+            'total_return': float(self.total_return),
+            'sharpe': float(self.sharpe),
+            'max_drawdown': float(self.max_drawdown),
+        }
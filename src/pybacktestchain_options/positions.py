@@ -0,0 +1,215 @@
+from collections.abc import MutableMapping
+from dataclasses import dataclass
+
+import numpy as np
+
+_FIELDS = ('near_term_quantity', 'long_term_quantity', 'entry_spread')
+
+#---------------------------------------------------------
+# Classes
+#---------------------------------------------------------
+
+@dataclass
+class SpreadPosition:
+    commodity: str
+    near_term_quantity: int
+    long_term_quantity: int
+    entry_spread: float
+
+
+class PositionView:
+    """Live view of one row of a PositionBook, with the attributes of a SpreadPosition.
+
+    Reads and writes go straight to the book's arrays. The row is looked up
+    by commodity on each access, so a view stays valid when other rows move.
+    """
+    __slots__ = ('_book', 'commodity')
+
+    def __init__(self, book, commodity):
+        self._book = book
+        self.commodity = commodity
+
+    def _row(self):
+        return self._book._index[self.commodity]
+
+    def to_position(self):
+        """Detached SpreadPosition copy of the row."""
+        return SpreadPosition(self.commodity, *(getattr(self, name) for name in _FIELDS))
+
+    def __eq__(self, other):
+        if isinstance(other, (PositionView, SpreadPosition)):
+            return all(getattr(self, name) == getattr(other, name) for name in ('commodity',) + _FIELDS)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(self.to_position()).replace('SpreadPosition', 'PositionView', 1)
+
+
+def _column(j):
+    def get(self):
+        return float(self._book._data[j, self._row()])
+
+    def set(self, value):
+        self._book._data[j, self._row()] = value
+
+    return property(get, set)
+
+
+for _j, _name in enumerate(_FIELDS):
+    setattr(PositionView, _name, _column(_j))
+
+
+class PositionBook(MutableMapping):
+    """Spread positions stored as a struct of arrays, one row per commodity.
+
+    Near term quantities, long term quantities and entry spreads live in one
+    (3 x capacity) float array and a dict maps each commodity to its row, so
+    lookups are O(1) and whole columns can be read as zero-copy NumPy views
+    (near_qty, long_qty, entry_spread) for valuation and risk. The book
+    behaves like the former {commodity: SpreadPosition} dict: book[commodity]
+    returns a PositionView whose attributes write through to the arrays, and
+    assigning a SpreadPosition copies it in.
+
+    The column views are only valid until the book grows or loses a row.
+    """
+
+    def __init__(self, capacity=16):
+        self._data = np.empty((len(_FIELDS), capacity))
+        self._names = []
+        self._index = {}
+
+    @classmethod
+    def from_positions(cls, positions):
+        """Book holding the positions of a {commodity: SpreadPosition} mapping."""
+        book = cls(capacity=max(16, len(positions)))
+        for commodity, position in positions.items():
+            book[commodity] = position
+        return book
+
+    @classmethod
+    def from_arrays(cls, commodities, data):
+        """Book of the commodities with the (3 x commodities) near qty / long qty / entry spread rows of to_arrays."""
+        book = cls(capacity=max(16, len(commodities)))
+        book.set_many(commodities, *data)
+        return book
+
+    def to_arrays(self):
+        """(commodities, (3 x commodities) copy of the arrays), for snapshots."""
+        return list(self._names), self._data[:, :len(self._names)].copy()
+
+    @property
+    def capacity(self):
+        return self._data.shape[1]
+
+    @property
+    def commodities(self):
+        return list(self._names)
+
+    @property
+    def near_qty(self):
+        return self._data[0, :len(self._names)]
+
+    @property
+    def long_qty(self):
+        return self._data[1, :len(self._names)]
+
+    @property
+    def entry_spread(self):
+        return self._data[2, :len(self._names)]
+
+    def _reserve(self, n):
+        needed = len(self._names) + n
+        if needed > self.capacity:
+            data = np.empty((len(_FIELDS), max(needed, 2 * self.capacity)))
+            data[:, :len(self._names)] = self._data[:, :len(self._names)]
+            self._data = data
+
+    def add(self, commodity, near_qty, long_qty, entry_spread):
+        """Open (or overwrite) the position of a commodity and return its row."""
+        row = self._index.get(commodity)
+        if row is None:
+            self._reserve(1)
+            row = self._index[commodity] = len(self._names)
+            self._names.append(commodity)
+        data = self._data
+        data[0, row] = near_qty
+        data[1, row] = long_qty
+        data[2, row] = entry_spread
+        return row
+
+    def row(self, commodity):
+        """Row of a commodity, or None if it has no position."""
+        return self._index.get(commodity)
+
+    def quantities(self, row):
+        """(near term, long term) quantities of a row as Python floats."""
+        data = self._data
+        return data.item(0, row), data.item(1, row)
+
+    def set_quantities(self, row, near_qty, long_qty):
+        data = self._data
+        data[0, row] = near_qty
+        data[1, row] = long_qty
+
+    def rows(self, commodities):
+        """Rows of the commodities as an integer array, -1 where there is no position."""
+        index = self._index
+        return np.fromiter((index.get(c, -1) for c in commodities), dtype=np.intp, count=len(commodities))
+
+    def set_many(self, commodities, near_qty=None, long_qty=None, entry_spread=None):
+        """Bulk set the positions of the commodities from aligned arrays.
+
+        Positions are opened where missing. A column left as None keeps its
+        current values (or NaN for new rows).
+        """
+        commodities = list(commodities)
+        missing = [c for c in dict.fromkeys(commodities) if c not in self._index]
+        if missing:
+            self._reserve(len(missing))
+            start = len(self._names)
+            self._names.extend(missing)
+            self._index.update((c, start + k) for k, c in enumerate(missing))
+            self._data[:, start:len(self._names)] = np.nan
+        rows = self.rows(commodities)
+        for j, values in enumerate((near_qty, long_qty, entry_spread)):
+            if values is not None:
+                self._data[j, rows] = values
+
+    def value(self, commodities, near_prices, long_prices):
+        """Value of both legs of the positions of the commodities at the given prices."""
+        rows = self.rows(commodities)
+        held = rows >= 0
+        rows = rows[held]
+        return float(self._data[0, rows] @ np.asarray(near_prices, dtype=float)[held]
+                     + self._data[1, rows] @ np.asarray(long_prices, dtype=float)[held])
+
+    def __getitem__(self, commodity):
+        if commodity not in self._index:
+            raise KeyError(commodity)
+        return PositionView(self, commodity)
+
+    def __setitem__(self, commodity, position):
+        self.add(commodity, *(getattr(position, name) for name in _FIELDS))
+
+    def __delitem__(self, commodity):
+        # move the last row into the hole so rows stay contiguous
+        row = self._index.pop(commodity)
+        last = len(self._names) - 1
+        if row != last:
+            moved = self._names[last]
+            self._data[:, row] = self._data[:, last]
+            self._names[row] = moved
+            self._index[moved] = row
+        self._names.pop()
+
+    def __contains__(self, commodity):
+        return commodity in self._index
+
+    def __iter__(self):
+        return iter(list(self._names))
+
+    def __len__(self):
+        return len(self._names)
+
+    def __repr__(self):
+        return f"PositionBook({dict((c, self[c].to_position()) for c in self._names)})"
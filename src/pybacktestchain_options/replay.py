@@ -0,0 +1,218 @@
+import csv
+import logging
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from broker import CommoBroker
+from curves import LONG_TERM, NEAR_TERM
+from data_module import commodity_legs
+from performance import RunningPerformance
+from transaction_log import TRANSACTION_COLUMNS
+
+BAR_COLUMNS = ['Date', 'Contract', 'Close']
+
+#---------------------------------------------------------
+# Bar sources
+#---------------------------------------------------------
+
+def write_bars(data, path, row_group_size=65_536):
+    """
+    Write a get_commodities_data frame as a time sorted bar file for read_bars.
+
+    Timestamps are stored as local wall time (time zone dropped), so daily
+    and minute bars round-trip through CSV as well as Parquet.
+
+    :param data: Long frame with the Date, Contract and Close columns
+    :param path: Destination, .parquet (written in row groups of row_group_size rows) or .csv
+    """
+    bars = data[BAR_COLUMNS].sort_values('Date', kind='stable')
+    if bars['Date'].dt.tz is not None:
+        bars = bars.assign(Date=bars['Date'].dt.tz_localize(None))
+    if path.endswith('.parquet'):
+        bars.to_parquet(path, row_group_size=row_group_size, index=False)
+    elif path.endswith('.csv'):
+        bars.to_csv(path, index=False)
+    else:
+        raise ValueError("bar files must be .parquet or .csv")
+
+
+def read_bars(path, chunksize=65_536):
+    """Yield a bar file as frames of at most chunksize rows, never loading it whole.
+
+    Parquet is read one record batch at a time with pyarrow (imported on
+    first use), CSV with pandas' chunked reader."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=BAR_COLUMNS):
+            yield batch.to_pandas()
+    elif path.endswith('.csv'):
+        with pd.read_csv(path, usecols=BAR_COLUMNS, chunksize=chunksize) as reader:
+            yield from reader
+    else:
+        raise ValueError("bar files must be .parquet or .csv")
+
+
+def iter_bars(chunks):
+    """
+    Group a time sorted stream of long rows into bars.
+
+    The rows of the last timestamp of a chunk are carried over to the next
+    one, so bars may span chunk boundaries. Works for any bar frequency.
+
+    :param chunks: Iterable of frames with the BAR_COLUMNS, e.g. read_bars(path) or a live feed
+    :return: Generator of (timestamp, contracts, prices), the contract labels and close prices of each bar
+    """
+    pending = None
+    last = None
+    for chunk in chunks:
+        if pending is not None:
+            chunk = pd.concat([pending, chunk], ignore_index=True)
+        if chunk.empty:
+            continue
+        times = pd.DatetimeIndex(pd.to_datetime(chunk['Date'])).asi8
+        if (last is not None and times[0] < last) or (times[1:] < times[:-1]).any():
+            raise ValueError("bars must be sorted by time")
+        starts = np.flatnonzero(np.diff(times)) + 1
+        contracts = chunk['Contract'].to_numpy()
+        prices = chunk['Close'].to_numpy(dtype=float)
+        bounds = [0, *starts]
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            yield pd.Timestamp(times[start]), contracts[start:stop], prices[start:stop]
+        pending = chunk.iloc[bounds[-1]:]
+        last = times[-1]
+    if pending is not None and len(pending):
+        yield pd.Timestamp(pd.to_datetime(pending['Date'].iloc[0])), pending['Contract'].to_numpy(), \
+            pending['Close'].to_numpy(dtype=float)
+
+#---------------------------------------------------------
+# Replay
+#---------------------------------------------------------
+
+_DAY_NS = 86_400 * 10**9
+
+
+def _date_label(t):
+    """'YYYY-MM-DD' for daily bars, the ISO timestamp for intraday ones."""
+    return t.strftime('%Y-%m-%d') if t.value % _DAY_NS == 0 else t.isoformat()
+
+
+def replay_events(bars, broker, commodity_pairs, verbose=True, keep_log=False, performance=None, signals=None):
+    """
+    Run the spread strategy bar by bar and yield its events as they happen.
+
+    The traded commodities are the ones of commodity_pairs with a near and a
+    long term ticker, in name order as in CommoBackTest. A bar where one of
+    the contracts of commodity_pairs has no price is skipped, otherwise every
+    commodity goes through broker.update_pos at the bar's prices, exactly
+    like a day of the loop engine. Each bar costs O(commodities): the
+    transactions are taken off the broker's log (cleared after every bar
+    unless keep_log) and valued at the end-of-bar mark to market.
+
+    :param bars: Iterable of (timestamp, contracts, prices), see iter_bars
+    :param broker: CommoBroker to trade with
+    :param commodity_pairs: {commodity: {tenor: ticker}} as for CommoBackTest
+    :param performance: Optional RunningPerformance updated with the end-of-bar values
+    :param signals: Optional signals.RollingZScore or EwmaZScore over the traded commodities, updated
+                    with the bar's near - long term spreads. Equity events then carry their
+                    'Z-Scores', {window: {commodity: z}}
+    :return: Generator of transaction and equity event dicts, as sent to CommoBackTest listeners
+    """
+    legs = [contract for contract, _ in commodity_legs(commodity_pairs)]
+    commodities = sorted(name for name, info in commodity_pairs.items()
+                         if isinstance(info, dict) and info.get(NEAR_TERM) and info.get(LONG_TERM))
+    slots = {f"{name} - {term}": (j, k) for j, name in enumerate(commodities)
+             for k, term in enumerate((NEAR_TERM, LONG_TERM))}
+    quotes = np.empty((2, len(commodities)))
+    for t, contracts, prices in bars:
+        seen = set(contracts)
+        if any(contract not in seen for contract in legs):
+            if verbose:
+                logging.warning(f"Spreads not available on {t}")
+            continue
+        quotes[:] = np.nan
+        for contract, price in zip(contracts, prices):
+            slot = slots.get(contract)
+            if slot is not None:
+                quotes[slot[1], slot[0]] = price
+        near, long = quotes
+
+        logged = len(broker._log)
+        for j, commodity in enumerate(commodities):
+            broker.update_pos(commodity, 1, 1, near[j], long[j], t)
+        value = broker.mark_to_market(commodities, near, long)
+        if performance is not None:
+            performance.update(value)
+
+        broker._log.fill_portfolio_value(value, logged)
+        date = _date_label(t)
+        for row in broker._log.records(logged):
+            yield {'type': 'transaction', **row, 'Date': date}
+        if not keep_log:
+            broker._log.clear()
+        event = {'type': 'equity', 'Date': date, 'Cash': float(broker.cash), 'Portfolio Value': value}
+        if signals is not None:
+            z = signals.update(near - long)
+            event['Z-Scores'] = {w: dict(zip(commodities, z[k].tolist())) for k, w in enumerate(signals.windows.tolist())}
+        yield event
+
+#---------------------------------------------------------
+# Classes
+#---------------------------------------------------------
+
+@dataclass
+class ReplayBackTest:
+    """Event-driven CommoBackTest replaying a chunked local bar file.
+
+    Bars are read chunk by chunk from source (a .parquet or .csv written by
+    write_bars, or any iterable of BAR_COLUMNS frames such as a minute bar
+    feed) and pushed through the broker as they arrive, so memory stays
+    constant whatever the length of the history: transactions are appended
+    to backtests/{backtest_name}.csv and sent to listener, not kept, and
+    the performance is tracked with a RunningPerformance. Nothing is written
+    to the blockchain, which stores whole transaction logs.
+    """
+    source: object
+    commodity_pairs: dict
+    cash: float = 1000000
+    verbose: bool = True
+    backtest_name: str = "replay"
+    chunksize: int = 65_536
+    listener: object = None  # called with every event dict (transaction, equity, done)
+    signals: object = None  # RollingZScore / EwmaZScore of the spreads, reported in the equity events
+
+    def __post_init__(self):
+        self.broker = CommoBroker(cash=self.cash, verbose=self.verbose)
+        self.performance = RunningPerformance()
+
+    def _chunks(self):
+        if isinstance(self.source, (str, os.PathLike)):
+            return read_bars(os.fspath(self.source), self.chunksize)
+        return self.source
+
+    def events(self):
+        """Generator of the replay events, ending with the done event."""
+        os.makedirs('backtests', exist_ok=True)
+        transactions = 0
+        with open(f"backtests/{self.backtest_name}.csv", 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow([''] + TRANSACTION_COLUMNS)
+            for event in replay_events(iter_bars(self._chunks()), self.broker, self.commodity_pairs,
+                                       self.verbose, performance=self.performance, signals=self.signals):
+                if event['type'] == 'transaction':
+                    writer.writerow([transactions] + [event[name] for name in TRANSACTION_COLUMNS])
+                    transactions += 1
+                yield event
+        self.final_value = self.performance.last
+        logging.info(f"Replay completed. Performance: {self.performance.summary()}")
+        yield {'type': 'done', 'backtest_name': self.backtest_name, 'final_value': self.final_value,
+               'transactions': transactions}
+
+    def run(self):
+        """Replay the whole source, sending the events to listener. Returns the performance summary."""
+        for event in self.events():
+            if self.listener is not None:
+                self.listener(event)
+        return self.performance.summary()
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+# Bump when a change to the backtest logic invalidates stored results
+RESULT_VERSION = 1
+
+#---------------------------------------------------------
+# Helpers
+#---------------------------------------------------------
+
+def canonical_hash(config, fingerprint=''):
+    """sha256 of a configuration, independent of key order, combined with a data fingerprint."""
+    blob = json.dumps(config, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(f"{RESULT_VERSION}\0{blob}\0{fingerprint}".encode()).hexdigest()
+
+
+def window_fingerprint(final_date, today=None):
+    """Settled part of a [initial, final) window: bars up to final_date are settled once it
+    is in the past, otherwise the window still grows every day. Only the dates, see
+    data_fingerprint for the data itself."""
+    today = today or date.today()
+    final = datetime.strptime(str(final_date)[:10], '%Y-%m-%d').date()
+    return min(final, today).isoformat()
+
+
+def data_fingerprint(final_date, source='', versions=None, today=None):
+    """Data version of the inputs of a backtest: the settled window, the source of the
+    prices (e.g. a provider class) and the versions of the fetched data, such as
+    MarketDataCache.versions of its tickers."""
+    return canonical_hash({'window': window_fingerprint(final_date, today), 'source': source,
+                           'versions': versions or {}})
+
+#---------------------------------------------------------
+# Classes
+#---------------------------------------------------------
+
+@dataclass
+class ResultCache:
+    """Content-addressed store of backtest results, one JSON file per key.
+
+    Keys come from canonical_hash. Reading a result refreshes its modification
+    time, and once the cache holds more than max_entries results or max_bytes
+    the least recently used ones are evicted. get_or_compute coalesces
+    concurrent calls for the same key into a single computation.
+    """
+    directory: str = 'results'
+    max_bytes: int = None
+    max_entries: int = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+    _inflight: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        """Return the stored result of key, or None."""
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                result = json.load(f)
+            os.utime(path)
+        except FileNotFoundError:  # never stored, or evicted concurrently
+            return None
+        return result
+
+    def put(self, key, result):
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(result, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def get_or_compute(self, key, compute):
+        """Return (result, hit). On a miss compute() runs once however many threads ask for key."""
+        result = self.get(key)
+        if result is not None:
+            return result, True
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result(), True
+        try:
+            result = self.get(key)  # stored by an owner that finished after our first get
+            if result is not None:
+                future.set_result(result)
+                return result, True
+            result = compute()
+            self.put(key, result)
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def entries(self):
+        """List (key, bytes, last access) of the stored results, least recently used first."""
+        rows = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            rows.append((name[:-len('.json')], stat.st_size, stat.st_mtime))
+        return sorted(rows, key=lambda row: row[2])
+
+    def evict(self):
+        """Remove least recently used results until the cache fits max_entries and max_bytes."""
+        if self.max_entries is None and self.max_bytes is None:
+            return
+        entries = self.entries()
+        count, total = len(entries), sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if (self.max_entries is None or count <= self.max_entries) and (self.max_bytes is None or total <= self.max_bytes):
+                break
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            count -= 1
+            total -= size
+            logging.info(f"Evicted backtest result {key} from the result cache.")
+
+    def clear(self):
+        for key, _, _ in self.entries():
+            os.remove(self._path(key))
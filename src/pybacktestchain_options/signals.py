@@ -0,0 +1,205 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from performance import forward_fill
+
+#---------------------------------------------------------
+# Streaming
+#---------------------------------------------------------
+
+class RollingZScore:
+    """Rolling window z-scores of n series for several windows, one observation at a time.
+
+    Each window keeps a Welford mean and sum of squared deviations that the
+    new observation is added to and the one leaving the window removed from,
+    over a shared ring buffer of the last max(windows) observations, so an
+    update costs O(windows x series) whatever the window lengths. The
+    z-score of a window is NaN until it is full, and uses the sample
+    standard deviation (ddof=1) like pandas' rolling std.
+    """
+
+    def __init__(self, windows, n_series=1):
+        self.windows = np.asarray(windows, dtype=np.intp)
+        if (self.windows < 2).any():
+            raise ValueError("windows must be at least 2 observations long")
+        self._buffer = np.full((self.windows.max(), n_series), np.nan)
+        self._count = 0
+        self._mean = np.zeros((len(self.windows), n_series))
+        self._m2 = np.zeros((len(self.windows), n_series))
+
+    def update(self, x):
+        """Add the next observation of every series and return the (windows x series) z-scores."""
+        x = np.asarray(x, dtype=float)
+        size = len(self._buffer)
+        self._count += 1
+        n = np.minimum(self._count, self.windows)[:, None].astype(float)
+        full = self._count > self.windows
+        if full.any():
+            # drop the observation leaving each full window: count stays at the window length
+            leaving = self._buffer[(self._count - 1 - self.windows[full]) % size]
+            mean, m2 = self._mean[full], self._m2[full]
+            delta = x - leaving
+            new_mean = mean + delta / n[full]
+            m2 += delta * (x - new_mean + leaving - mean)
+            self._mean[full], self._m2[full] = new_mean, m2
+        growing = ~full
+        if growing.any():
+            delta = x - self._mean[growing]
+            self._mean[growing] += delta / n[growing]
+            self._m2[growing] += delta * (x - self._mean[growing])
+        self._buffer[(self._count - 1) % size] = x
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = (x - self._mean) / np.sqrt(self._m2 / (n - 1))
+        z[self._count < self.windows] = np.nan
+        return z
+
+
+class EwmaZScore:
+    """Exponentially weighted z-scores of n series for several half-lives, one observation at a time.
+
+    mean <- mean + a (x - mean) and var <- (1 - a) (var + a (x - mean_prev)^2)
+    with a = 1 - 2^(-1 / halflife), both O(1) per update. The z-score is
+    NaN while the variance is still zero (the first observation).
+    """
+
+    def __init__(self, halflives, n_series=1):
+        self.windows = np.asarray(halflives, dtype=float)  # the half-lives, named as in RollingZScore
+        self._alpha = (1 - 0.5 ** (1 / self.windows))[:, None]
+        self._mean = None
+        self._var = np.zeros((len(self.windows), n_series))
+
+    def update(self, x):
+        """Add the next observation of every series and return the (half-lives x series) z-scores."""
+        x = np.asarray(x, dtype=float)
+        if self._mean is None:
+            self._mean = np.broadcast_to(x, self._var.shape).copy()
+        else:
+            a = self._alpha
+            delta = x - self._mean
+            self._mean += a * delta
+            self._var = (1 - a) * (self._var + a * delta * delta)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = (x - self._mean) / np.sqrt(self._var)
+        z[self._var == 0] = np.nan
+        return z
+
+#---------------------------------------------------------
+# Batch
+#---------------------------------------------------------
+
+def rolling_covariance(x, y, window, block=1024):
+    """
+    Rolling means and sample covariance (ddof=1) of the columns of x and y over trailing windows.
+
+    Window sums are differences of cumulative sums, restarted every block
+    rows on the first values the block's windows see: the rounding errors
+    are those of a block long series, however far a trending series drifts
+    from its start.
+
+    :param x, y: (T x N) arrays
+    :param window: Window length, in observations
+    :return: (mean_x, mean_y, cov), (T - window + 1 x N) arrays for the windows ending at rows window - 1 onwards
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n_out = len(x) - window + 1
+    mean_x, mean_y, cov = (np.empty((max(n_out, 0),) + x.shape[1:]) for _ in range(3))
+    for first in range(0, n_out, block):
+        last = min(first + block, n_out)
+        rows = slice(first, last + window - 1)  # every observation of the windows ending in the block
+        cx, cy = x[rows] - x[first], y[rows] - y[first]
+        sums = np.zeros((3, len(cx) + 1) + x.shape[1:])
+        np.cumsum(cx, axis=0, out=sums[0, 1:])
+        np.cumsum(cy, axis=0, out=sums[1, 1:])
+        np.cumsum(cx * cy, axis=0, out=sums[2, 1:])
+        sx, sy, sxy = sums[:, window:] - sums[:, :-window]
+        mean_x[first:last] = x[first] + sx / window
+        mean_y[first:last] = y[first] + sy / window
+        cov[first:last] = (sxy - sx * sy / window) / (window - 1)
+    return mean_x, mean_y, cov
+
+
+def rolling_zscore(values, windows):
+    """
+    Rolling window z-scores of every column for every window, in one pass.
+
+    The window means and variances come from rolling_covariance, so the cost
+    does not depend on the window lengths.
+
+    :param values: (T x N) array, e.g. the spreads of N commodities
+    :param windows: Window lengths, in observations
+    :return: (windows x T x N) z-scores, NaN until a window is full, sample std (ddof=1)
+    """
+    values = np.asarray(values, dtype=float)
+    windows = np.asarray(windows, dtype=np.intp)
+    if (windows < 2).any():
+        raise ValueError("windows must be at least 2 observations long")
+
+    z = np.full((len(windows),) + values.shape, np.nan)
+    for k, w in enumerate(windows):
+        if w > len(values):
+            continue
+        mean, _, var = rolling_covariance(values, values, w)
+        np.maximum(var, 0.0, out=var)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z[k, w - 1:] = (values[w - 1:] - mean) / np.sqrt(var)
+    return z
+
+
+def ewma_zscore(values, halflives):
+    """(half-lives x T x N) exponentially weighted z-scores of the (T x N) values, see EwmaZScore."""
+    values = np.asarray(values, dtype=float)
+    scores = EwmaZScore(halflives, values.shape[1])
+    z = np.empty((len(scores.windows),) + values.shape)
+    for t in range(len(values)):
+        z[:, t] = scores.update(values[t])
+    return z
+
+
+def mean_reversion_positions(z, entry=2.0, exit=0.5):
+    """
+    Positions of a mean-reversion rule on z-scores, along the time axis (-2).
+
+    Go long the spread (+1) when z < -entry, short (-1) when z > entry, and
+    flat once |z| < exit; in between the previous position is held. Entries
+    and exits are marked and carried forward, so every window and series is
+    done in one vectorized pass.
+
+    :param z: (..., T, N) z-scores, e.g. from rolling_zscore
+    :return: Array of the shape of z with -1, 0 or 1
+    """
+    if not 0 <= exit < entry:
+        raise ValueError("thresholds must satisfy 0 <= exit < entry")
+    z = np.asarray(z, dtype=float)
+    events = np.full(z.shape, np.nan)
+    events[np.abs(z) < exit] = 0.0
+    events[z < -entry] = 1.0
+    events[z > entry] = -1.0
+    # (T x everything else) for forward_fill, and back
+    moved = np.moveaxis(events, -2, 0)
+    filled = forward_fill(moved.reshape(len(moved), -1)).reshape(moved.shape)
+    return np.nan_to_num(np.moveaxis(filled, 0, -2))
+
+#---------------------------------------------------------
+# Classes
+#---------------------------------------------------------
+
+@dataclass
+class SpreadSignals:
+    """Z-scores and mean-reversion positions of the spreads of several commodities, for several windows."""
+    dates: pd.DatetimeIndex
+    commodities: list
+    windows: list
+    zscore: np.ndarray  # (windows x dates x commodities)
+    position: np.ndarray  # -1, 0 or 1, same shape
+
+    def frame(self, window):
+        """(dates x commodities) z-scores of one window as a DataFrame."""
+        return pd.DataFrame(self.zscore[self.windows.index(window)], index=self.dates, columns=self.commodities)
+
+    def latest(self):
+        """{window: {commodity: z-score}} of the last date."""
+        return {w: dict(zip(self.commodities, self.zscore[k, -1].tolist())) for k, w in enumerate(self.windows)}
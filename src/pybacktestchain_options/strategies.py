@@ -1,32 +1,49 @@
-from utils import OptionUtils
+import numpy as np
+
+from hedging import simulate_hedge
+from monte_carlo import OptionBook, OptionLeg
 
 
 class OptionStrategies:
     """
     Defines option trading strategies.
+
+    Every strategy is delta hedged with the underlying along price path(s)
+    through hedging.simulate_hedge and returns its HedgeResult. S is a price
+    path (array, Series or DataFrame of paths), T the maturity in years from
+    the first price. Extra keyword arguments (rehedge_every, cost, times,
+    ...) are passed to simulate_hedge.
     """
 
     @staticmethod
-    def delta_hedged_strategy(S, K, T, r, sigma, option_type="call"):
+    def delta_hedged_strategy(S, K, T, r, sigma, option_type="call", quantity=1.0, **kwargs):
         """
         Delta-hedged strategy: Adjust positions to maintain a neutral delta.
         """
-        delta = OptionUtils.delta(S, K, T, r, sigma, option_type)
-        return f"Delta hedge requires offsetting {delta:.2f} delta with stock."
+        if option_type not in ("call", "put"):
+            raise ValueError("option_type must be 'call' or 'put'")
+        book = OptionBook([OptionLeg(quantity, K, T, option_type == "call")])
+        return simulate_hedge(book, S, r, sigma, **kwargs)
 
     @staticmethod
-    def gamma_positive_strategy(S, K, T, r, sigma):
+    def gamma_positive_strategy(S, K, T, r, sigma, quantity=1.0, **kwargs):
         """
         Gamma-positive strategy: Buy straddles to benefit from large moves.
+
+        The hedged straddle earns when the realised volatility of S exceeds sigma.
         """
-        call_price = OptionUtils.black_scholes_price(S, K, T, r, sigma, "call")
-        put_price = OptionUtils.black_scholes_price(S, K, T, r, sigma, "put")
-        return f"Buy 1 call and 1 put at strike {K}: Call={call_price:.2f}, Put={put_price:.2f}"
+        return simulate_hedge(OptionBook.straddle(K, T, quantity), S, r, sigma, **kwargs)
 
     @staticmethod
-    def volatility_play_strategy(S, K, T, r, sigma):
+    def volatility_play_strategy(S, K, T, r, sigma, quantity=1.0, **kwargs):
         """
         Play volatility changes with high Vega options.
+
+        Buys straddles, struck at the money forward (where vega is the highest)
+        when K is None, and marks them with sigma, which may be a path of implied
+        volatilities aligned with S: the P&L then follows the implied volatility moves.
         """
-        vega = OptionUtils.vega(S, K, T, r, sigma)
-        return f"Trade options with high Vega: Vega={vega:.2f}."
+        if K is None:
+            first = S.iloc[0] if hasattr(S, "iloc") else np.atleast_2d(S)[:, 0]
+            K = float(np.mean(first)) * np.exp(r * T)
+        return simulate_hedge(OptionBook.straddle(K, T, quantity), S, r, sigma, **kwargs)
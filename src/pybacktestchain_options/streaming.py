@@ -0,0 +1,85 @@
+import json
+import queue
+import threading
+
+_END = object()
+
+#---------------------------------------------------------
+# Classes
+#---------------------------------------------------------
+
+class StreamClosed(Exception):
+    """Raised in the producer when the consumer of an EventStream went away."""
+
+
+class EventStream:
+    """Bounded queue of backtest events between a producer thread and one consumer.
+
+    A producer passes the stream as a listener: each event (a dict) is queued,
+    and emitting blocks while maxsize events are waiting, so a slow consumer
+    slows the backtest down instead of growing memory. Iterating yields the
+    events until the producer calls close(). If the consumer stops early, the
+    next emit raises StreamClosed so the producer can stop too.
+    """
+
+    def __init__(self, maxsize=1024, poll=0.1):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._cancelled = threading.Event()
+        self.poll = poll
+
+    def __call__(self, event):
+        self.emit(event)
+
+    def emit(self, event):
+        while True:
+            if self._cancelled.is_set():
+                raise StreamClosed("The event stream consumer went away.")
+            try:
+                self._queue.put(event, timeout=self.poll)
+                return
+            except queue.Full:
+                continue
+
+    def close(self, error=None):
+        """End the stream, after an error event if error is given."""
+        try:
+            if error is not None:
+                self.emit({'type': 'error', 'error': str(error)})
+            self.emit(_END)
+        except StreamClosed:
+            pass
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def __iter__(self):
+        try:
+            while True:
+                event = self._queue.get()
+                if event is _END:
+                    return
+                yield event
+        finally:
+            self.cancel()
+
+    def ndjson(self):
+        """Iterate the events as newline-delimited JSON lines."""
+        for event in self:
+            yield json.dumps(event, default=str) + '\n'
+
+
+def run_streamed(target, stream):
+    """Run target(stream) in a daemon thread, closing the stream when it returns or fails."""
+    def run():
+        try:
+            target(stream)
+        except StreamClosed:
+            return
+        except Exception as e:
+            stream.close(e)
+            return
+        stream.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
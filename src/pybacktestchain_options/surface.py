@@ -0,0 +1,117 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from utils import _INV_SQRT_2PI, OptionGreeks, ndtr
+
+#---------------------------------------------------------
+# Classes
+#---------------------------------------------------------
+
+@dataclass
+class SurfacePricer:
+    """Black-Scholes prices and Greeks of a whole strike x maturity grid.
+
+    Maturities run along the rows and strikes along the columns. Everything
+    that does not depend on the spot (sqrt(T), the discount factors, log(K),
+    the drift part of d1 and the Greek scalings) is computed once per grid
+    and cached, so pricing at a new spot only costs a handful of array
+    passes. Call refresh() after changing r, sigma or is_call.
+
+    r may be a scalar or one rate per maturity, sigma and is_call anything
+    that broadcasts to the (maturities x strikes) grid, e.g. sigma[:, None]
+    for one volatility per maturity.
+    """
+    strikes: np.ndarray
+    maturities: np.ndarray  # in years
+    r: object = 0.0
+    sigma: object = 0.2
+    is_call: object = True
+
+    def __post_init__(self):
+        self.strikes = np.asarray(self.strikes, dtype=float)
+        self.maturities = np.asarray(self.maturities, dtype=float)
+        if self.strikes.ndim != 1 or self.maturities.ndim != 1:
+            raise ValueError("strikes and maturities must be 1-D")
+        if (self.strikes <= 0).any() or (self.maturities <= 0).any():
+            raise ValueError("strikes and maturities must be positive")
+        self.refresh()
+
+    @property
+    def shape(self):
+        return len(self.maturities), len(self.strikes)
+
+    def refresh(self):
+        """Recompute the cached, spot independent terms of the grid."""
+        shape = self.shape
+        T = self.maturities[:, None]
+        K = self.strikes[None, :]
+        r = np.asarray(self.r, dtype=float)
+        if r.ndim == 1:
+            r = r[:, None]
+        sigma = np.broadcast_to(np.asarray(self.sigma, dtype=float), shape)
+
+        # per-maturity and per-strike terms
+        sqrt_t = np.sqrt(T)
+        disc = np.exp(-r * T)
+        log_k = np.log(K)
+
+        phi = np.where(np.broadcast_to(np.asarray(self.is_call, dtype=bool), shape), 1.0, -1.0)
+        self._phi = phi
+        self._vol_t = sigma * sqrt_t
+        self._inv_vol_t = 1.0 / self._vol_t
+        # d1 = log(S) / (sigma sqrt(T)) + _d1_shift
+        self._d1_shift = ((r + 0.5 * sigma**2) * T - log_k) * self._inv_vol_t
+        self._disc_k = np.broadcast_to(K * disc, shape).copy()
+        self._theta_s = sigma / sqrt_t * (-0.5 / 365)
+        self._theta_k = phi * r * self._disc_k / 365
+        self._vega_s = np.broadcast_to(sqrt_t / 100, shape).copy()
+
+    def price(self, S, out=None):
+        """
+        Price the grid at spot S.
+
+        :param S: Current price of the underlying (scalar)
+        :param out: Optional OptionGreeks from OptionGreeks.empty(pricer.shape), filled in place
+        :return: OptionGreeks of (maturities x strikes) arrays, with the conventions of
+                 OptionUtils.price_and_greeks
+        """
+        shape = self.shape
+        if out is None:
+            out = OptionGreeks.empty(shape)
+        elif out.shape != shape or out.work is None:
+            raise ValueError(f"out buffers must have shape {shape}")
+        S = float(S)
+        d1, x, pdf = (out.work[i, ...] for i in range(3))
+        phi = self._phi
+
+        np.multiply(self._inv_vol_t, np.log(S), out=d1)
+        d1 += self._d1_shift
+
+        np.square(d1, out=pdf)
+        pdf *= -0.5
+        np.exp(pdf, out=pdf)
+        pdf *= _INV_SQRT_2PI
+
+        np.multiply(phi, d1, out=out.delta)
+        ndtr(out.delta, out=out.delta)              # N(phi d1)
+
+        np.subtract(d1, self._vol_t, out=x)         # d2
+        x *= phi
+        ndtr(x, out=x)                              # N(phi d2)
+
+        np.multiply(self._theta_k, x, out=out.theta)
+        x *= self._disc_k
+        np.multiply(out.delta, S, out=out.price)
+        out.price -= x
+        out.price *= phi
+        out.delta *= phi
+
+        np.multiply(pdf, S, out=out.vega)
+        np.multiply(out.vega, self._theta_s, out=x)
+        np.subtract(x, out.theta, out=out.theta)
+        out.vega *= self._vega_s
+
+        np.multiply(pdf, self._inv_vol_t, out=out.gamma)
+        out.gamma /= S
+        return out
@@ -0,0 +1,155 @@
+import itertools
+import logging
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from market_cache import MarketDataCache
+from data_module import commodity_legs, get_commodities_data, slice_commodities_data
+from broker import CommoBackTest
+
+# Market data of the sweep, set once per worker process by _init_worker
+_HISTORIES = {}
+_NAME = 'sweep'
+
+#---------------------------------------------------------
+# Helpers
+#---------------------------------------------------------
+
+def expand_grid(**params):
+    """Cartesian product of keyword value lists, as a list of configuration dicts.
+
+    expand_grid(cash=[1e5, 1e6], engine=['loop']) gives
+    [{'cash': 1e5, 'engine': 'loop'}, {'cash': 1e6, 'engine': 'loop'}]."""
+    names = list(params)
+    return [dict(zip(names, values)) for values in itertools.product(*params.values())]
+
+
+def _init_worker(histories, name):
+    global _HISTORIES, _NAME
+    _HISTORIES = histories
+    _NAME = name
+
+
+def _run_config(task):
+    """Run one configuration in a worker and return its summary row."""
+    i, config = task
+    config = dict(config)
+    config.setdefault('backtest_name', f"{_NAME}-{i:05d}")
+    # one chain per worker process, so two workers never append to the same block store
+    config['name_blockchain'] = f"{_NAME}-{os.getpid()}"
+    row = {'run': i, 'backtest_name': config['backtest_name'], 'name_blockchain': config['name_blockchain'], 'pid': os.getpid()}
+    start = time.perf_counter()
+    try:
+        if config.pop('commo_equity', "COMMO") == "EQUITY":
+            # imported here, only EQUITY configs need the pybacktestchain stack
+            from universal_backtest import UniversalBackTest
+            backtest = UniversalBackTest(commo_equity="EQUITY", **config)
+            backtest.run_backtest()
+            broker = backtest.backtest.broker
+            final_value = float('nan')
+            metrics = {}
+        else:
+            config['data'] = slice_commodities_data(_HISTORIES, config['commodity_pairs'],
+                                                    config['initial_date'], config['final_date'])
+            backtest = CommoBackTest(**config)
+            backtest.run_backtest()
+            broker = backtest.broker
+            final_value = backtest.final_value
+            metrics = backtest.performance.summary()
+            del metrics['final_value']
+        row['n_transactions'] = len(broker.get_transaction_log())
+        row['final_cash'] = broker.cash
+        row['final_value'] = final_value
+        row.update(metrics)
+        row['error'] = None
+    except Exception as e:
+        logging.warning(f"Sweep run {i} failed: {e}")
+        row['error'] = repr(e)
+    row['seconds'] = time.perf_counter() - start
+    return row
+
+#---------------------------------------------------------
+# Classes
+#---------------------------------------------------------
+
+@dataclass
+class BacktestSweep:
+    """Run many backtest configurations across a process pool.
+
+    Each entry of grid is a dict of CommoBackTest keywords, merged over base
+    (see expand_grid); entries with commo_equity='EQUITY' are UniversalBackTest
+    keywords instead. Market data of every commodity leg is downloaded
+    once, over the widest window of the grid, and handed to each worker when
+    it starts; runs then only slice it. A worker writes its CSVs under
+    unique backtest names and its blocks to its own chain, named after the
+    sweep and its pid. Equity runs fetch their own data.
+    """
+    grid: list
+    base: dict = field(default_factory=dict)
+    name: str = 'sweep'
+    max_workers: int = None  # os.cpu_count() when None, 1 runs in this process
+    chunksize: int = None  # runs sent to a worker at a time, about 4 chunks per worker when None
+    cache_dir: str = None  # market data cache used by the initial load
+    provider: object = None  # market data provider, yfinance when None
+    fetch_workers: int = None  # concurrent downloads of the initial load
+
+    def configs(self):
+        return [{**self.base, **config} for config in self.grid]
+
+    def load_data(self):
+        """Fetch every commodity leg of the grid once, over the widest window.
+        Returns {ticker: history frame}."""
+        runs = [config for config in self.configs() if config.get('commo_equity', "COMMO") == "COMMO"]
+        if not runs:
+            return {}
+        tickers = set()
+        for config in runs:
+            tickers.update(ticker for _, ticker in commodity_legs(config['commodity_pairs']))
+        start = min(config['initial_date'] for config in runs).strftime('%Y-%m-%d')
+        end = max(config['final_date'] for config in runs).strftime('%Y-%m-%d')
+        cache = MarketDataCache(self.cache_dir) if self.cache_dir else None
+        data = get_commodities_data({ticker: ticker for ticker in sorted(tickers)}, start, end, cache,
+                                    self.provider, max_workers=self.fetch_workers)
+        if data.empty:
+            return {}
+        return {ticker: frame.drop(columns='Contract').reset_index(drop=True) for ticker, frame in data.groupby('ticker')}
+
+    def run(self):
+        """Run the grid and return one summary row per configuration, in grid order."""
+        configs = self.configs()
+        histories = self.load_data()
+        # create the output folders up front rather than racing on them in the workers
+        os.makedirs('backtests', exist_ok=True)
+        os.makedirs('blockchain', exist_ok=True)
+
+        tasks = list(enumerate(configs))
+        workers = self.max_workers or os.cpu_count() or 1
+        workers = min(workers, len(tasks)) if tasks else 1
+        if workers <= 1:
+            _init_worker(histories, self.name)
+            rows = [_run_config(task) for task in tasks]
+        else:
+            chunksize = self.chunksize or max(1, math.ceil(len(tasks) / (4 * workers)))
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(histories, self.name)) as pool:
+                rows = list(pool.map(_run_config, tasks, chunksize=chunksize))
+
+        params = pd.DataFrame([_describe(config) for config in configs])
+        return pd.concat([params, pd.DataFrame(rows).drop(columns='run')], axis=1)
+
+
+def _describe(config):
+    """Flatten a configuration into scalar columns for the result frame."""
+    row = {}
+    for key, value in config.items():
+        if key in ('provider', 'data', 'backtest_name', 'name_blockchain'):
+            continue
+        if key == 'commodity_pairs':
+            value = ','.join(value)
+        row[key] = value
+    return row
@@ -0,0 +1,258 @@
+from api import backtest_fingerprint, create_app, parse_backtest_request
+from blockstore import BlockStore
+from market_cache import MarketDataCache
+from broker import CommoBackTest
+from data_module import SyntheticProvider
+from datetime import datetime
+import json
+from jobs import JobQueue
+import sqlite3
+import threading
+import time
+import pytest
+
+REQUEST = {"commo_equity": "COMMO", "initial_date": "2023-01-01", "final_date": "2023-06-30", "cash": 1000}
+
+
+class BlockingRunner:
+    """Runner holding every job until release() is called."""
+
+    def __init__(self):
+        self.released = threading.Event()
+        self.payloads = []
+
+    def __call__(self, payload, listener=None):
+        self.payloads.append(payload)
+        self.released.wait(5)
+        if payload["cash"] == 13:
+            raise RuntimeError("unlucky cash")
+        return {"backtest_name": "bt", "final_value": payload["cash"] * 2}
+
+    def release(self):
+        self.released.set()
+
+
+def wait_for(client, job_id, status, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/jobs/{job_id}").get_json()
+        if job["status"] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not reach {status}")
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_dir(tmp_path, monkeypatch):
+    """Results are cached relative to the working directory."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def runner():
+    runner = BlockingRunner()
+    yield runner
+    runner.release()
+
+
+def test_submit_poll_result(tmp_path, runner):
+    app = create_app(runner, str(tmp_path / "jobs.sqlite"), max_workers=1, max_queue=4)
+    client = app.test_client()
+
+    response = client.post("/run_backtest", json=REQUEST)
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+    assert client.get(f"/jobs/{job_id}/result").status_code == 202
+    wait_for(client, job_id, "running")
+
+    runner.release()
+    job = wait_for(client, job_id, "done")
+    assert job["run_seconds"] >= 0 and job["queue_seconds"] >= 0
+    assert job["payload"]["cash"] == 1000
+    result = client.get(f"/jobs/{job_id}/result")
+    assert result.status_code == 200
+    assert result.get_json()["result"] == {"backtest_name": "bt", "final_value": 2000}
+
+
+def test_validation_and_unknown_jobs(tmp_path, runner):
+    client = create_app(runner, str(tmp_path / "jobs.sqlite")).test_client()
+    assert client.post("/run_backtest", json=dict(REQUEST, commo_equity="FX")).status_code == 400
+    assert client.post("/run_backtest", json=dict(REQUEST, initial_date="01/01/2023")).status_code == 400
+    assert client.post("/run_backtest", json=dict(REQUEST, cash=-1)).status_code == 400
+    assert client.get("/jobs/nope").status_code == 404
+    assert client.get("/jobs/nope/result").status_code == 404
+
+
+def test_profile_flags_are_only_kept_when_set():
+    assert "profile" not in parse_backtest_request(REQUEST)
+    payload = parse_backtest_request(dict(REQUEST, profile=True, trace_memory=False))
+    assert payload["profile"] is True and "trace_memory" not in payload
+
+
+def test_failed_job(tmp_path, runner):
+    client = create_app(runner, str(tmp_path / "jobs.sqlite")).test_client()
+    runner.release()
+    job_id = client.post("/run_backtest", json=dict(REQUEST, cash=13)).get_json()["job_id"]
+    wait_for(client, job_id, "failed")
+    response = client.get(f"/jobs/{job_id}/result")
+    assert response.status_code == 500
+    assert "unlucky cash" in response.get_json()["error"]
+
+
+def test_backpressure(tmp_path, runner):
+    client = create_app(runner, str(tmp_path / "jobs.sqlite"), max_workers=1, max_queue=2).test_client()
+    codes = [client.post("/run_backtest", json=REQUEST).status_code for _ in range(4)]
+    assert codes == [202, 202, 202, 429]
+    runner.release()
+
+
+def test_unfinished_jobs_survive_restart(tmp_path, runner):
+    db_path = str(tmp_path / "jobs.sqlite")
+    first = JobQueue(runner, db_path, max_workers=1, max_queue=4, lease_seconds=0.2)
+    running = first.submit(dict(REQUEST, cash=1))
+    queued = first.submit(dict(REQUEST, cash=2))
+    # simulate the process dying: the rows stay queued/running in the table and the lease is not renewed
+    first.shutdown(wait=False)
+    with sqlite3.connect(db_path) as db:
+        assert {s for (s,) in db.execute("SELECT status FROM jobs")} <= {"queued", "running"}
+    time.sleep(0.3)
+
+    restarted = BlockingRunner()
+    restarted.release()
+    client = create_app(restarted, db_path).test_client()
+    for job_id, cash in ((running, 1), (queued, 2)):
+        wait_for(client, job_id, "done")
+        assert client.get(f"/jobs/{job_id}/result").get_json()["result"]["final_value"] == 2 * cash
+    runner.release()
+    first.shutdown()
+
+
+def test_queues_sharing_a_database_run_each_job_once(tmp_path, runner):
+    db_path = str(tmp_path / "jobs.sqlite")
+    first = JobQueue(runner, db_path, max_workers=1, max_queue=4)
+    job_ids = [first.submit(dict(REQUEST, cash=cash)) for cash in (1, 2, 3)]
+    # a second process, e.g. the reloader child of a debug server, recovers the same table
+    second = JobQueue(runner, db_path, max_workers=2, max_queue=4)
+    runner.release()
+    first.shutdown()
+    second.shutdown()
+
+    assert sorted(payload["cash"] for payload in runner.payloads) == [1, 2, 3]
+    with sqlite3.connect(db_path) as db:
+        rows = db.execute("SELECT id, status FROM jobs").fetchall()
+    assert sorted(rows) == sorted((job_id, "done") for job_id in job_ids)
+
+
+def test_concurrent_jobs_share_a_valid_blockchain(tmp_path):
+    both_running = threading.Barrier(2, timeout=5)
+
+    def commodity_runner(payload, listener=None):
+        pairs = {"OIL": {"Near Term": "CL=F", "Long Term": "CLM25.NYM"}}
+        backtest = CommoBackTest(datetime(2023, 1, 2), datetime(2023, 2, 28), pairs, payload["cash"], False,
+                                 f"bt{payload['cash']}", provider=SyntheticProvider())
+        both_running.wait()
+        backtest.run_backtest()
+        for i in range(100):  # more commits of the same chain, as a sweep makes
+            backtest.broker.blockchain.add_block(f"{backtest.backtest_name}-{i}", "log")
+        return {"backtest_name": backtest.backtest_name, "final_value": backtest.final_value}
+
+    client = create_app(commodity_runner, str(tmp_path / "jobs.sqlite"), max_workers=2, results_dir=None).test_client()
+    job_ids = [client.post("/run_backtest", json=dict(REQUEST, cash=cash)).get_json()["job_id"] for cash in (1000, 2000)]
+    for job_id in job_ids:
+        wait_for(client, job_id, "done", timeout=30)
+
+    chain = BlockStore("backtest")
+    assert len(chain) == 1 + 2 * 101
+    assert chain.is_valid()
+
+
+def test_repeated_request_is_served_from_cache(tmp_path, runner):
+    client = create_app(runner, str(tmp_path / "jobs.sqlite"), results_dir=str(tmp_path / "results")).test_client()
+    runner.release()
+    job_id = client.post("/run_backtest", json=REQUEST).get_json()["job_id"]
+    wait_for(client, job_id, "done")
+
+    # verbose does not change the result, so it is not part of the key
+    response = client.post("/run_backtest", json=dict(REQUEST, verbose=False))
+    assert response.status_code == 200
+    assert response.get_json()["cached"] is True
+    assert response.get_json()["result"] == {"backtest_name": "bt", "final_value": 2000}
+    assert len(runner.payloads) == 1
+    assert client.post("/run_backtest", json=dict(REQUEST, cash=5)).status_code == 202
+
+
+def test_refetched_market_data_is_computed_again(tmp_path, runner):
+    client = create_app(runner, str(tmp_path / "jobs.sqlite"), results_dir=str(tmp_path / "results"),
+                        market_data_dir=str(tmp_path / "market_data")).test_client()
+    runner.release()
+    wait_for(client, client.post("/run_backtest", json=REQUEST).get_json()["job_id"], "done")
+    assert client.post("/run_backtest", json=REQUEST).status_code == 200
+
+    # the prices of the window are fetched again, as after an expiry of the market data cache
+    MarketDataCache(str(tmp_path / "market_data")).get("CL=F", "2023-01-01", "2023-06-30", SyntheticProvider())
+    assert client.post("/run_backtest", json=REQUEST).status_code == 202
+    payload = parse_backtest_request(REQUEST)
+    assert backtest_fingerprint(payload) != backtest_fingerprint(dict(payload, commo_equity="EQUITY"))
+
+
+def test_identical_requests_in_flight_run_once(tmp_path, runner):
+    client = create_app(runner, str(tmp_path / "jobs.sqlite"), max_workers=3,
+                        results_dir=str(tmp_path / "results")).test_client()
+    job_ids = [client.post("/run_backtest", json=REQUEST).get_json()["job_id"] for _ in range(3)]
+    wait_for(client, job_ids[0], "running")
+    runner.release()
+    for job_id in job_ids:
+        wait_for(client, job_id, "done")
+        assert client.get(f"/jobs/{job_id}/result").get_json()["result"]["final_value"] == 2000
+    assert len(runner.payloads) == 1
+
+
+def streaming_runner(payload, listener=None):
+    for day in range(3):
+        listener({"type": "transaction", "Date": f"2023-01-0{day + 2}", "Cash": payload["cash"]})
+        listener({"type": "equity", "Date": f"2023-01-0{day + 2}", "Portfolio Value": payload["cash"] + day})
+    if payload["cash"] == 13:
+        raise RuntimeError("unlucky cash")
+    listener({"type": "done", "backtest_name": "bt"})
+
+
+def test_stream_backtest(tmp_path):
+    client = create_app(streaming_runner, str(tmp_path / "jobs.sqlite")).test_client()
+    response = client.post("/stream_backtest", json=REQUEST)
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [e["type"] for e in events] == ["transaction", "equity"] * 3 + ["done"]
+    assert events[-2]["Portfolio Value"] == 1002
+
+    events = [json.loads(line) for line in client.post("/stream_backtest", json=dict(REQUEST, cash=13)).get_data(as_text=True).splitlines()]
+    assert events[-1] == {"type": "error", "error": "unlucky cash"}
+    assert client.post("/stream_backtest", json=dict(REQUEST, cash=0)).status_code == 400
+
+
+def test_stream_limit(tmp_path):
+    client = create_app(streaming_runner, str(tmp_path / "jobs.sqlite"), max_streams=1).test_client()
+    first = client.post("/stream_backtest", json=REQUEST, buffered=False)
+    assert client.post("/stream_backtest", json=REQUEST).status_code == 429
+    first.get_data()
+    first.close()
+    assert client.post("/stream_backtest", json=REQUEST).status_code == 200
+
+
+def test_unread_stream_is_released(tmp_path):
+    stopped = threading.Event()
+
+    def endless_runner(payload, listener=None):
+        try:
+            while True:
+                listener({"type": "equity", "Portfolio Value": payload["cash"]})
+        finally:
+            stopped.set()
+
+    client = create_app(endless_runner, str(tmp_path / "jobs.sqlite"), max_streams=1, stream_buffer=1).test_client()
+    client.post("/stream_backtest", json=REQUEST, buffered=False).close()  # closed before the first read
+    assert stopped.wait(2)
+    response = client.post("/stream_backtest", json=REQUEST, buffered=False)
+    assert response.status_code == 200
+    response.close()
@@ -0,0 +1,78 @@
+from broker import CommoBackTest
+from data_module import DataModule, SpreadStrategy, SyntheticProvider, get_commodities_data
+import pytest
+import pandas as pd
+import numpy as np
+from datetime import datetime
+
+PAIRS = {
+    "OIL": {"Near Term": "CL=F", "Long Term": "CLM25.NYM"},
+    "GAS": {"Near Term": "NG=F", "Long Term": "NGM25.NYM"},
+    "WHEAT": {"Near Term": "ZW=F", "Long Term": "ZWN25.CBT"},
+    "CORN": {"Near Term": "ZC=F", "Long Term": "ZCN25.CBT"},
+}
+COMMO = ["CORN", "GAS", "OIL", "WHEAT"]
+
+
+@pytest.fixture
+def in_tmp_dir(tmp_path, monkeypatch):
+    """Backtests write their csv and blockchain relative to the working directory."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_aligned_legs_match_daily_lookups():
+    data = get_commodities_data(PAIRS, "2023-01-01", "2023-03-01", provider=SyntheticProvider())
+    data = data[data["Date"] != data["Date"].iloc[5]]  # a missing day inside the window
+    strategy = SpreadStrategy(DataModule(data))
+    spread_data = strategy.compute_spread()
+    calendar = pd.date_range("2023-01-01", "2023-03-01", freq="B")
+
+    near, long, valid = strategy.aligned_legs(calendar, COMMO, spread_data)
+
+    for i, t in enumerate(calendar):
+        day = t.strftime("%Y-%m-%d")
+        assert valid[i] == (day in spread_data.index)
+        if valid[i]:
+            row = spread_data.loc[day]
+            assert list(near[i]) == [row[f"{c} - Near Term"] for c in COMMO]
+            assert list(long[i]) == [row[f"{c} - Long Term"] for c in COMMO]
+        else:
+            assert np.isnan(near[i]).all()
+
+
+def test_run_backtest_writes_log(in_tmp_dir):
+    backtest = CommoBackTest(datetime(2023, 1, 1), datetime(2023, 6, 30), PAIRS, 1_000_000, False, "synthetic",
+                             provider=SyntheticProvider())
+    backtest.run_backtest()
+
+    log = backtest.broker.get_transaction_log()
+    trading_days = len(pd.bdate_range("2023-01-02", "2023-06-29"))  # the provider end date is exclusive
+    assert len(log) == len(COMMO) * (trading_days - 1)  # the first day opens the positions
+    assert (in_tmp_dir / "backtests" / "synthetic.csv").exists()
+
+
+@pytest.mark.parametrize("engine", ["loop", "vectorized"])
+def test_listener_streams_transactions_and_equity(in_tmp_dir, engine):
+    events = []
+    backtest = CommoBackTest(datetime(2023, 1, 1), datetime(2023, 3, 1), PAIRS, 100_000, False, engine,
+                             provider=SyntheticProvider(), engine=engine, listener=events.append)
+    log = backtest.run_backtest()
+
+    transactions = [e for e in events if e["type"] == "transaction"]
+    equity = [e for e in events if e["type"] == "equity"]
+    assert len(transactions) == len(log)
+    assert [t["Cash"] for t in transactions] == list(log["Cash"])
+    assert len(equity) == len(pd.bdate_range("2023-01-02", "2023-02-28"))
+    assert equity[-1]["Cash"] == backtest.broker.cash
+    assert events[-1] == {"type": "done", "backtest_name": engine, "final_value": backtest.final_value,
+                          "transactions": len(log)}
+
+
+def test_run_backtest_trades_the_commodities_of_its_pairs(in_tmp_dir):
+    pairs = {"GOLD": {"Near Term": "GC=F", "Long Term": "GCM25.NYM"}, "OIL": PAIRS["OIL"]}
+    backtest = CommoBackTest(datetime(2023, 1, 1), datetime(2023, 3, 1), pairs, 1_000_000, False, "two",
+                             provider=SyntheticProvider())
+    log = backtest.run_backtest()
+
+    assert set(log["Commodity"]) == {"GOLD", "OIL"}
@@ -0,0 +1,102 @@
+from blockstore import BlockStore, open_blockchain
+from broker import CommoBroker
+from pybacktestchain.blockchain import Blockchain
+import multiprocessing
+import os
+import threading
+import pytest
+
+
+@pytest.fixture
+def in_tmp_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_append_and_reopen(in_tmp_dir):
+    store = BlockStore("chain")
+    assert len(store) == 1 and store[0].name_backtest == "Genesis Block"
+    for i in range(5):
+        store.add_block(f"bt{i}", "payload " * i)
+    data_size = os.path.getsize(store.paths[0])
+    store.add_block("bt5", "more")
+    # appending never rewrites existing records
+    with open(store.paths[0], "rb") as f:
+        assert len(f.read()) > data_size
+
+    reopened = BlockStore("chain")
+    assert len(reopened) == 7
+    assert reopened[3].data == "payload payload "
+    assert reopened[-1].name_backtest == "bt5"
+    assert reopened[4].previous_hash == reopened[3].hash
+    assert reopened.is_valid()
+
+
+def test_tampering_is_detected(in_tmp_dir):
+    store = BlockStore("chain")
+    store.add_block("bt", "original")
+    with open(store.paths[0], "r+b") as f:
+        content = f.read()
+        f.seek(content.rindex(b"bt"))
+        f.write(b"xx")
+    assert not BlockStore("chain").is_valid()
+
+
+def test_interrupted_index_write_is_dropped(in_tmp_dir):
+    store = BlockStore("chain")
+    store.add_block("bt", "data")
+    with open(store.paths[1], "ab") as f:
+        f.write(b"\x01\x02\x03")
+    reopened = BlockStore("chain")
+    assert len(reopened) == 2
+    reopened.add_block("bt2", "data")
+    assert reopened[-1].previous_hash == reopened[1].hash and reopened.is_valid()
+
+
+def append_blocks(name, n):
+    store = BlockStore("chain")
+    for i in range(n):
+        store.add_block(f"{name}-{i}", "data")
+
+
+def test_concurrent_appends_keep_the_chain_valid(in_tmp_dir):
+    shared = BlockStore("chain")
+    # processes first, a fork must not copy a lock held by one of the threads
+    processes = [multiprocessing.get_context("fork").Process(target=append_blocks, args=(f"process{p}", 50))
+                 for p in range(2)]
+    threads = [threading.Thread(target=append_blocks, args=(f"thread{t}", 50)) for t in range(4)]
+    threads += [threading.Thread(target=lambda t=t: [shared.add_block(f"shared{t}-{i}", "data") for i in range(50)])
+                for t in range(4)]
+    for worker in processes + threads:
+        worker.start()
+    for worker in processes + threads:
+        worker.join()
+
+    store = BlockStore("chain")
+    assert len(store) == 1 + 10 * 50
+    assert len({block.name_backtest for block in store}) == len(store)
+    assert store.is_valid()
+
+
+def test_migration_from_pickle(in_tmp_dir):
+    os.makedirs("blockchain")
+    legacy = Blockchain("legacy")
+    legacy.add_block("bt1", "first")
+    legacy.add_block("bt2", "second")
+
+    store = open_blockchain("legacy")
+    assert [b.hash for b in store] == [b.hash for b in legacy.chain]
+    assert [b.data for b in store] == ["", "first", "second"]
+    store.add_block("bt3", "third")
+    assert store.is_valid()
+    assert len(open_blockchain("legacy")) == 4  # migrated once
+
+
+def test_broker_uses_block_store(in_tmp_dir):
+    broker = CommoBroker(1000, verbose=False)
+    broker.initialize_blockchain("backtest")
+    broker.blockchain.add_block("run", "log")
+    assert os.path.exists("blockchain/backtest.idx")
+    other = CommoBroker(1000, verbose=False)
+    other.initialize_blockchain("backtest")
+    assert other.blockchain[-1].data == "log"
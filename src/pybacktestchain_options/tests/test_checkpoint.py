@@ -0,0 +1,115 @@
+from broker import CommoBackTest
+from checkpoint import Checkpoint
+from data_module import SyntheticProvider
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime
+
+PAIRS = {
+    "OIL": {"Near Term": "CL=F", "Long Term": "CLM25.NYM"},
+    "GAS": {"Near Term": "NG=F", "Long Term": "NGM25.NYM"},
+    "WHEAT": {"Near Term": "ZW=F", "Long Term": "ZWN25.CBT"},
+    "CORN": {"Near Term": "ZC=F", "Long Term": "ZCN25.CBT"},
+}
+
+
+@pytest.fixture
+def in_tmp_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+class Crash(Exception):
+    pass
+
+
+def crash_after(n_days):
+    def listener(event):
+        if event["type"] == "equity":
+            listener.days += 1
+            if listener.days > n_days:
+                raise Crash()
+    listener.days = 0
+    return listener
+
+
+def run(name, final_date, engine="loop", **kwargs):
+    backtest = CommoBackTest(datetime(2023, 1, 1), final_date, PAIRS, 100_000, False, name,
+                             provider=SyntheticProvider(), engine=engine, **kwargs)
+    log = backtest.run_backtest()
+    return backtest, log
+
+
+def assert_same_run(a, b):
+    (backtest_a, log_a), (backtest_b, log_b) = a, b
+    pd.testing.assert_frame_equal(log_a, log_b)
+    assert backtest_a.final_value == backtest_b.final_value
+    pd.testing.assert_series_equal(backtest_a.performance.equity, backtest_b.performance.equity)
+
+
+@pytest.mark.parametrize("engine", ["loop", "vectorized"])
+def test_resume_after_a_crash_matches_a_cold_run(in_tmp_dir, engine):
+    cold = run("cold", datetime(2023, 6, 30), engine)
+
+    with pytest.raises(Crash):
+        run("crashed", datetime(2023, 6, 30), "loop", checkpoint_dir="checkpoints", checkpoint_every=20,
+            listener=crash_after(70))
+    snapshot = Checkpoint.load("checkpoints/crashed.ckpt.npz")
+    assert snapshot.position == 60
+
+    assert_same_run(run("crashed", datetime(2023, 6, 30), engine, checkpoint_dir="checkpoints"), cold)
+
+
+@pytest.mark.parametrize("engine", ["loop", "vectorized"])
+def test_extending_a_finished_run_matches_a_cold_run(in_tmp_dir, engine):
+    cold = run("cold", datetime(2023, 6, 30), engine)
+
+    run("extended", datetime(2023, 3, 31), engine, checkpoint_dir="checkpoints")
+    events = []
+    extended = run("extended", datetime(2023, 6, 30), engine, checkpoint_dir="checkpoints", listener=events.append)
+
+    assert_same_run(extended, cold)
+    first_day = next(e["Date"] for e in events if e["type"] == "equity")
+    assert first_day == "2023-03-31"  # the old final date had no bar yet, it is simulated again
+
+
+def test_snapshots_of_other_runs_are_ignored(in_tmp_dir):
+    run("shared", datetime(2023, 3, 31), checkpoint_dir="checkpoints")
+    other_cash = CommoBackTest(datetime(2023, 1, 1), datetime(2023, 6, 30), PAIRS, 50_000, False, "shared",
+                               provider=SyntheticProvider(), checkpoint_dir="checkpoints")
+    other_cash.run_backtest()
+    cold = CommoBackTest(datetime(2023, 1, 1), datetime(2023, 6, 30), PAIRS, 50_000, False, "cold",
+                         provider=SyntheticProvider())
+    cold.run_backtest()
+
+    assert other_cash.final_value == cold.final_value
+
+
+def test_snapshots_of_other_prices_are_ignored(in_tmp_dir):
+    run("moved", datetime(2023, 3, 31), checkpoint_dir="checkpoints")
+    cold = CommoBackTest(datetime(2023, 1, 1), datetime(2023, 6, 30), PAIRS, 100_000, False, "cold",
+                         provider=SyntheticProvider(seed=1))
+    cold.run_backtest()
+
+    resumed = CommoBackTest(datetime(2023, 1, 1), datetime(2023, 6, 30), PAIRS, 100_000, False, "moved",
+                            provider=SyntheticProvider(seed=1), checkpoint_dir="checkpoints")
+    resumed.run_backtest()
+
+    assert resumed.final_value == cold.final_value
+    assert resumed.data_source != CommoBackTest(datetime(2023, 1, 1), datetime(2023, 6, 30), PAIRS,
+                                                data=pd.DataFrame()).data_source
+
+
+def test_snapshot_round_trip(in_tmp_dir):
+    backtest, log = run("round", datetime(2023, 2, 1), checkpoint_dir="checkpoints")
+
+    snapshot = Checkpoint.load("checkpoints/round.ckpt.npz")
+
+    assert snapshot.cash == backtest.broker.cash
+    assert snapshot.positions.commodities == backtest.broker.positions.commodities
+    np.testing.assert_array_equal(snapshot.positions.near_qty, backtest.broker.positions.near_qty)
+    # portfolio values are filled in after the simulation, when the whole equity curve is known
+    pd.testing.assert_frame_equal(snapshot.log.to_frame().drop(columns="Portfolio Value"),
+                                  log.drop(columns="Portfolio Value"))
+    assert Checkpoint.load("checkpoints/round.ckpt.npz", fingerprint="other") is None
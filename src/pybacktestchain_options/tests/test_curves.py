@@ -0,0 +1,77 @@
+from curves import SPOT, FuturesCurves
+from data_module import COMMODITY_TICKER_PAIRS, DataModule, SpreadStrategy, SyntheticProvider, get_commodities_data
+import numpy as np
+import pandas as pd
+import pytest
+
+TENORS = ["M1", "M2", "M3", "M6", "M12"]
+
+
+@pytest.fixture
+def curve_data():
+    pairs = {name: {tenor: f"{name}{tenor}" for tenor in TENORS} for name in ("OIL", "GAS", "WHEAT")}
+    pairs["GOLD"] = "GC=F"  # single ticker commodity
+    data = get_commodities_data(pairs, "2023-01-01", "2023-03-01", provider=SyntheticProvider())
+    return data.drop(index=[2, 100])  # two missing quotes
+
+
+def test_curves_hold_every_contract(curve_data):
+    curves = FuturesCurves.from_frame(curve_data)
+
+    assert curves.commodities == ["GAS", "GOLD", "OIL", "WHEAT"]
+    assert curves.tenors == TENORS + [SPOT]
+    assert curves.with_tenors("M1", "M12") == ["GAS", "OIL", "WHEAT"]
+    pivot = curve_data.pivot(index="Date", columns="Contract", values="Close")
+    frame = curves.to_frame()
+    pd.testing.assert_frame_equal(frame[pivot.columns], pivot, check_names=False)
+    assert curves.complete().sum() == len(pivot.dropna())
+
+
+def test_spreads_are_slices_of_the_curves(curve_data):
+    curves = FuturesCurves.from_frame(curve_data)
+    pivot = curve_data.pivot(index="Date", columns="Contract", values="Close")
+
+    for name in ("OIL", "GAS"):
+        j = curves.commodities.index(name)
+        m1, m3, m6 = (pivot[f"{name} - {t}"].to_numpy() for t in ("M1", "M3", "M6"))
+        np.testing.assert_array_equal(curves.calendar_spread("M1", "M6")[:, j], m1 - m6)
+        np.testing.assert_allclose(curves.butterfly("M1", "M3", "M6")[:, j], m1 - 2 * m3 + m6)
+        np.testing.assert_allclose(curves.combination({"M1": 0.5, "M2": 0, "M6": -1.5}, [name])[:, 0],
+                                   0.5 * m1 - 1.5 * m6)
+    assert curves.leg(0, [0, 2]).shape == (len(curves.dates), 2)
+
+
+def test_aligned_tenors_match_the_calendar(curve_data):
+    curves = FuturesCurves.from_frame(curve_data)
+    calendar = pd.date_range("2023-01-01", "2023-03-01", freq="B")
+
+    m1, m12, valid = curves.aligned(calendar, ["M1", "M12"], ["OIL", "WHEAT"])
+
+    assert valid.sum() == curves.complete(["OIL", "WHEAT"], ["M1", "M12"]).sum()
+    dates = curves.dates.tz_localize(None)
+    for i in np.flatnonzero(valid):
+        row = dates.get_loc(calendar[i])
+        assert list(m1[i]) == list(curves.leg("M1", ["OIL", "WHEAT"])[row])
+        assert list(m12[i]) == list(curves.leg("M12", ["OIL", "WHEAT"])[row])
+    assert np.isnan(m1[~valid]).all()
+
+
+def test_empty_curves_have_no_complete_dates():
+    curves = FuturesCurves.from_frame(pd.DataFrame(columns=["Date", "Close", "Contract", "Commodity", "Tenor"]))
+
+    assert curves.complete().shape == (0,)
+    assert curves.complete(tenors=[]).shape == (0,)
+
+
+def test_spread_strategy_reads_its_commodities_from_the_data():
+    pairs = {name: COMMODITY_TICKER_PAIRS[name] for name in ("GOLD", "SILVER", "OIL")}
+    data = get_commodities_data(pairs, "2023-01-01", "2023-02-01", provider=SyntheticProvider())
+    strategy = SpreadStrategy(DataModule(data))
+
+    spread_data = strategy.compute_spread()
+
+    assert strategy.commodities() == ["GOLD", "OIL", "SILVER"]
+    assert [c for c in spread_data.columns if c.endswith("Spread")] == [
+        "GOLD - Spread", "OIL - Spread", "SILVER - Spread"]
+    np.testing.assert_array_equal(spread_data["GOLD - Spread"],
+                                  spread_data["GOLD - Near Term"] - spread_data["GOLD - Long Term"])
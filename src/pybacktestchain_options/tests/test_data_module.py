@@ -0,0 +1,121 @@
+import data_module
+from data_module import COMMODITY_TICKER_PAIRS, SyntheticProvider, get_commodities_data, get_commodity_data
+from market_cache import MarketDataCache
+import random
+import threading
+import time
+import pandas as pd
+
+
+class JitteryProvider(SyntheticProvider):
+    """Synthetic provider with random latency, so threads finish out of order."""
+
+    def history(self, ticker, start_date, end_date):
+        time.sleep(random.uniform(0, 0.02))
+        return super().history(ticker, start_date, end_date)
+
+
+class FlakyProvider(SyntheticProvider):
+    """Fails the first call for every ticker."""
+
+    def __init__(self):
+        super().__init__()
+        self.seen = set()
+
+    def history(self, ticker, start_date, end_date):
+        if ticker not in self.seen:
+            self.seen.add(ticker)
+            raise ConnectionError("transient failure")
+        return super().history(ticker, start_date, end_date)
+
+
+class HangingProvider(SyntheticProvider):
+    """Never answers in time for the crude oil contracts."""
+
+    def history(self, ticker, start_date, end_date):
+        if ticker.startswith("CL"):
+            time.sleep(1)
+        return super().history(ticker, start_date, end_date)
+
+
+class SlowProvider(SyntheticProvider):
+    """Answers after delay seconds and records the largest number of calls in flight."""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def history(self, ticker, start_date, end_date):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            return super().history(ticker, start_date, end_date)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def test_concurrent_fetch_keeps_definition_order():
+    sequential = get_commodities_data(COMMODITY_TICKER_PAIRS, "2023-01-01", "2023-03-01", provider=SyntheticProvider())
+    concurrent = get_commodities_data(COMMODITY_TICKER_PAIRS, "2023-01-01", "2023-03-01",
+                                      provider=JitteryProvider(), max_workers=4)
+
+    pd.testing.assert_frame_equal(sequential, concurrent)
+    assert list(concurrent["Contract"].unique()) == [
+        f"{name} - {term}" for name in COMMODITY_TICKER_PAIRS for term in ("Near Term", "Long Term")]
+
+
+def test_concurrent_fetch_is_faster_than_sequential():
+    provider = SyntheticProvider(latency=0.05)
+    start = time.perf_counter()
+    get_commodities_data(COMMODITY_TICKER_PAIRS, "2023-01-01", "2023-02-01", provider=provider, max_workers=12)
+    elapsed = time.perf_counter() - start
+
+    n_legs = 2 * len(COMMODITY_TICKER_PAIRS)
+    assert elapsed < 0.5 * 0.05 * n_legs  # well under the summed latencies
+
+
+def test_fetch_retries_with_backoff():
+    data = get_commodities_data(COMMODITY_TICKER_PAIRS, "2023-01-01", "2023-02-01",
+                                provider=FlakyProvider(), max_workers=4, retries=1, backoff=0.01)
+
+    assert data["Contract"].nunique() == 2 * len(COMMODITY_TICKER_PAIRS)
+
+
+def test_fetch_timeout_drops_slow_tickers():
+    start = time.perf_counter()
+    data = get_commodities_data(COMMODITY_TICKER_PAIRS, "2023-01-01", "2023-02-01",
+                                provider=HangingProvider(), max_workers=4, timeout=0.2)
+
+    assert time.perf_counter() - start < 1
+    assert not data["Contract"].str.startswith("OIL").any()
+    assert data["Contract"].nunique() == 2 * len(COMMODITY_TICKER_PAIRS) - 2
+
+
+def test_abandoned_fetches_stay_bounded(monkeypatch):
+    monkeypatch.setattr(data_module, "_FETCH_SLOTS", threading.BoundedSemaphore(2))
+    provider = SlowProvider(0.2)
+
+    get_commodities_data(COMMODITY_TICKER_PAIRS, "2023-01-01", "2023-02-01", provider=provider,
+                         max_workers=8, timeout=0.05, retries=2, backoff=0.01)
+    time.sleep(0.3)  # let the abandoned calls finish
+
+    assert provider.peak <= 2
+
+
+def test_retry_waits_for_the_abandoned_cache_write(tmp_path):
+    cache = MarketDataCache(str(tmp_path / "market_data"), verbose=False)
+    provider = SlowProvider(0.3)
+
+    data = get_commodity_data("CL=F", "2023-01-02", "2023-02-01", cache, provider, timeout=0.1, retries=4,
+                              backoff=0.05)
+
+    assert provider.calls == 1 and provider.peak == 1  # the retry found the first attempt's rows on disk
+    assert len(data) == 22
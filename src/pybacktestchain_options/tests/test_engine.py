@@ -0,0 +1,84 @@
+from broker import CommoBroker, CommoBackTest
+from data_module import SyntheticProvider
+from engine import simulate_spread_book
+import pytest
+import pandas as pd
+import numpy as np
+from datetime import datetime
+
+
+def loop_broker(near, long, valid, cash, calendar, commodities):
+    """Reference: the per-day, per-commodity CommoBroker.update_pos loop."""
+    broker = CommoBroker(cash, verbose=False)
+    for i, t in enumerate(calendar):
+        if valid[i]:
+            for j, commodity in enumerate(commodities):
+                broker.update_pos(commodity, 1, 1, near[i, j], long[i, j], t)
+    return broker
+
+
+def synthetic_prices(seed, n_days, n_commo):
+    rng = np.random.default_rng(seed)
+    near = rng.uniform(1, 10, (n_days, n_commo)).round(1)
+    long = np.abs(near + rng.normal(0, 2, (n_days, n_commo)).round(1)) + 0.5
+    valid = rng.random(n_days) < 0.9
+    return near, long, valid
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("cash", [5, 100, 1_000, 1e9])
+def test_vectorized_engine_matches_broker(seed, cash):
+    """Same log, cash and positions as update_pos, whether or not the cash caps bind."""
+    near, long, valid = synthetic_prices(seed, 120, 6)
+    calendar = pd.bdate_range("2020-01-01", periods=len(near))
+    commodities = [f"C{j}" for j in range(near.shape[1])]
+
+    reference = loop_broker(near, long, valid, cash, calendar, commodities)
+    broker = CommoBroker(cash, verbose=False)
+    broker.execute_spread_book(calendar, commodities, near, long, valid)
+
+    pd.testing.assert_frame_equal(broker.get_transaction_log(), reference.get_transaction_log(), check_exact=True)
+    assert broker.cash == reference.cash
+    for commodity, position in reference.positions.items():
+        assert broker.positions[commodity].near_term_quantity == position.near_term_quantity
+        assert broker.positions[commodity].long_term_quantity == position.long_term_quantity
+        assert broker.positions[commodity].entry_spread == position.entry_spread
+
+
+def test_vectorized_engine_continues_existing_book():
+    near, long, valid = synthetic_prices(7, 60, 4)
+    calendar = pd.bdate_range("2020-01-01", periods=len(near))
+    commodities = ["CORN", "GAS", "OIL", "WHEAT"]
+
+    reference = loop_broker(near, long, valid, 500, calendar, commodities)
+    broker = loop_broker(near[:30], long[:30], valid[:30], 500, calendar[:30], commodities)
+    broker.execute_spread_book(calendar[30:], commodities, near[30:], long[30:], valid[30:])
+
+    pd.testing.assert_frame_equal(broker.get_transaction_log(), reference.get_transaction_log(), check_exact=True)
+    assert broker.cash == reference.cash
+
+
+def test_simulate_spread_book_records_daily_book():
+    near, long, valid = synthetic_prices(1, 20, 3)
+    result = simulate_spread_book(near, long, valid, 1e9)
+
+    assert result.near_qty.shape == (20, 3)
+    assert result.cash.shape == (20,)
+    assert result.last == np.flatnonzero(valid)[-1]
+
+
+def test_backtest_engine_switch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pairs = {"OIL": {"Near Term": "CL=F", "Long Term": "CLM25.NYM"}, "GAS": {"Near Term": "NG=F", "Long Term": "NGM25.NYM"},
+             "WHEAT": {"Near Term": "ZW=F", "Long Term": "ZWN25.CBT"}, "CORN": {"Near Term": "ZC=F", "Long Term": "ZCN25.CBT"}}
+    logs = {}
+    for engine in ["loop", "vectorized"]:
+        backtest = CommoBackTest(datetime(2022, 1, 1), datetime(2023, 1, 1), pairs, 1e9, False, engine,
+                                 provider=SyntheticProvider(), engine=engine)
+        backtest.run_backtest()
+        logs[engine] = backtest.broker.get_transaction_log()
+
+    pd.testing.assert_frame_equal(logs["loop"], logs["vectorized"], check_exact=True)
+    with pytest.raises(ValueError):
+        CommoBackTest(datetime(2022, 1, 1), datetime(2023, 1, 1), pairs, provider=SyntheticProvider(),
+                      verbose=False, engine="gpu").run_backtest()
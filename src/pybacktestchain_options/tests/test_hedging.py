@@ -0,0 +1,98 @@
+from hedging import HedgeResult, simulate_hedge
+from monte_carlo import OptionBook, OptionLeg, PathModel
+from strategies import OptionStrategies
+import pytest
+import numpy as np
+import pandas as pd
+
+
+@pytest.fixture
+def paths():
+    return PathModel(S0=100.0, mu=0.0, sigma=0.2).sample(200, 63, 0.25, seed=3)
+
+
+def loop_hedge(book, S, times, r, sigma, every, cost):
+    """Reference: step through one path, keeping the cash account explicitly."""
+    cash, hedge = 0.0, 0.0
+    equity = []
+    for j, t in enumerate(times):
+        if j:
+            cash *= np.exp(r * (t - times[j - 1]))
+        value, delta = book.mark(np.array([S[j]]), t, r, sigma)
+        if j == 0:
+            cash -= value[0]
+        if j % every == 0:
+            trade = -delta[0] - hedge
+            cash -= trade * S[j] + abs(trade) * S[j] * cost
+            hedge += trade
+        equity.append(value[0] + hedge * S[j] + cash)
+    return np.array(equity)
+
+
+def test_simulate_hedge_matches_loop(paths):
+    """The vectorised P&L should equal the equity of an explicit step by step hedge."""
+    book = OptionBook([OptionLeg(2.0, 105.0, 0.25, True), OptionLeg(-1.0, 95.0, 0.2, False)])
+    times = np.arange(paths.shape[1]) / 252
+    result = simulate_hedge(book, paths[:5], r=0.05, sigma=0.25, rehedge_every=(1, 4), cost=0.001)
+
+    assert result.pnl.shape == (2, 5, paths.shape[1])
+    for i, every in enumerate((1, 4)):
+        for p in range(5):
+            expected = loop_hedge(book, paths[p], times, 0.05, 0.25, every, 0.001)
+            np.testing.assert_allclose(result.pnl[i, p], expected, atol=1e-9)
+    np.testing.assert_allclose(result.final_pnl, result.option_pnl + result.hedge_pnl + result.financing
+                               - result.costs, atol=1e-9)
+
+
+def test_hedging_error_shrinks_with_frequency(paths):
+    result = OptionStrategies.delta_hedged_strategy(paths, 100.0, 0.25, 0.0, 0.2, rehedge_every=[1, 5, 21])
+    std = result.summary()['std_pnl']
+
+    assert std.is_monotonic_increasing
+    assert std.loc[1] < 0.5 * std.loc[21]
+    assert (result.n_trades[0] > result.n_trades[2]).all()
+
+
+def test_gamma_positive_straddle_earns_realised_volatility():
+    paths = PathModel(S0=100.0, mu=0.0, sigma=0.4).sample(200, 63, 0.25, seed=4)
+    long_vol = OptionStrategies.gamma_positive_strategy(paths, 100.0, 0.25, 0.0, 0.2)
+    short_vol = OptionStrategies.gamma_positive_strategy(paths, 100.0, 0.25, 0.0, 0.6)
+
+    assert long_vol.final_pnl.mean() > 0
+    assert short_vol.final_pnl.mean() < 0
+
+
+def test_costs_reduce_pnl(paths):
+    free = OptionStrategies.delta_hedged_strategy(paths, 100.0, 0.25, 0.0, 0.2)
+    costly = OptionStrategies.delta_hedged_strategy(paths, 100.0, 0.25, 0.0, 0.2, cost=0.002)
+
+    assert (costly.costs > 0).all()
+    np.testing.assert_allclose(costly.final_pnl, free.final_pnl - costly.costs)
+
+
+def test_volatility_play_follows_implied_volatility():
+    """With a flat spot, the hedged straddle P&L tracks the implied volatility it is marked at."""
+    dates = pd.bdate_range('2024-01-02', periods=21)
+    S = pd.Series(100.0, index=dates)
+    implied = np.linspace(0.2, 0.3, len(dates))
+    result = OptionStrategies.volatility_play_strategy(S, None, 0.5, 0.0, implied)
+
+    assert isinstance(result, HedgeResult)
+    series = result.series()
+    assert series.index.equals(dates)
+    assert series.iloc[-1] > 0
+    assert series.is_monotonic_increasing
+
+
+def test_delta_hedged_strategy_rejects_bad_option_type(paths):
+    with pytest.raises(ValueError):
+        OptionStrategies.delta_hedged_strategy(paths, 100.0, 0.25, 0.0, 0.2, option_type="straddle")
+
+
+def test_mark_matches_value():
+    book = OptionBook.straddle(100.0, 0.5)
+    S = np.array([[90.0, 100.0, 110.0]])
+    value, _ = book.mark(S, np.array([0.0, 0.25, 0.5]), 0.01, 0.2)
+
+    for j, t in enumerate((0.0, 0.25, 0.5)):
+        assert np.isclose(value[0, j], book.value(S[:, j], t, 0.01, 0.2)[0])
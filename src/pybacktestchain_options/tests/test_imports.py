@@ -0,0 +1,38 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+PACKAGE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ["scipy", "yfinance", "flask", "pybacktestchain.broker", "pybacktestchain.data_module"]
+
+
+def import_in_fresh_interpreter(module):
+    """Import module in a new interpreter: seconds taken, heavy modules loaded, root logging handlers."""
+    code = (
+        "import json, logging, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = sorted(m for m in {HEAVY!r} if m in sys.modules)\n"
+        "print(json.dumps([elapsed, heavy, len(logging.getLogger().handlers)]))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code], cwd=PACKAGE, capture_output=True, text=True,
+                            check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+@pytest.mark.parametrize("module", ["utils", "surface", "monte_carlo", "hedging", "strategies"])
+def test_pricing_imports_without_scipy(module):
+    elapsed, heavy, handlers = import_in_fresh_interpreter(module)
+    assert heavy == []
+    assert elapsed < 2.0, f"import {module} took {elapsed:.2f}s"
+
+
+@pytest.mark.parametrize("module", ["data_module", "broker", "universal_backtest", "api", "sweep"])
+def test_backtest_stack_loads_providers_lazily(module):
+    elapsed, heavy, handlers = import_in_fresh_interpreter(module)
+    assert heavy == []
+    assert handlers == 0  # importing does not configure logging
+    assert elapsed < 5.0, f"import {module} took {elapsed:.2f}s"
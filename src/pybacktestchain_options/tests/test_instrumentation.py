@@ -0,0 +1,71 @@
+from instrumentation import NO_INSTRUMENTATION, Instrumentation
+from broker import CommoBackTest
+from data_module import SyntheticProvider
+import json
+import pytest
+from datetime import datetime
+
+PAIRS = {
+    "OIL": {"Near Term": "CL=F", "Long Term": "CLM25.NYM"},
+    "GAS": {"Near Term": "NG=F", "Long Term": "NGM25.NYM"},
+    "WHEAT": {"Near Term": "ZW=F", "Long Term": "ZWN25.CBT"},
+    "CORN": {"Near Term": "ZC=F", "Long Term": "ZCN25.CBT"},
+}
+
+
+@pytest.fixture
+def in_tmp_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_stages_accumulate_time_calls_and_rows():
+    instrumentation = Instrumentation()
+    with instrumentation:
+        for n in (3, 4):
+            with instrumentation.stage('work') as stage:
+                stage.rows = n
+        with instrumentation.stage('other', rows=7):
+            pass
+
+    report = instrumentation.report()
+    assert report['stages']['work']['calls'] == 2 and report['stages']['work']['rows'] == 7
+    assert report['stages']['other'] == {'seconds': report['stages']['other']['seconds'], 'calls': 1, 'rows': 7}
+    assert report['seconds'] >= report['stages']['work']['seconds'] > 0
+    assert 'profile' not in report and 'memory' not in report
+
+
+def test_disabled_instrumentation_records_nothing():
+    with NO_INSTRUMENTATION, NO_INSTRUMENTATION.stage('work') as stage:
+        stage.rows = 10
+    assert NO_INSTRUMENTATION.report() == {'seconds': 0.0, 'stages': {}}
+
+
+def test_profile_and_memory_captures(tmp_path):
+    instrumentation = Instrumentation(profile=True, trace_memory=True, top=5)
+    with instrumentation:
+        blocks = [bytearray(1 << 20) for _ in range(4)]
+    del blocks
+
+    report = instrumentation.report()
+    assert report['memory']['peak_mb'] >= 4
+    assert len(report['profile']) <= 5
+    instrumentation.write(str(tmp_path / "run.json"))
+    assert json.loads((tmp_path / "run.json").read_text())['memory'] == report['memory']
+    assert (tmp_path / "run.json.prof").exists()
+
+
+@pytest.mark.parametrize("engine", ["loop", "vectorized"])
+def test_backtest_records_stages(in_tmp_dir, engine):
+    instrumentation = Instrumentation()
+    backtest = CommoBackTest(datetime(2023, 1, 1), datetime(2023, 3, 1), PAIRS, 100_000, False, engine,
+                             provider=SyntheticProvider(), engine=engine, instrumentation=instrumentation)
+    log = backtest.run_backtest()
+
+    stages = instrumentation.report()['stages']
+    assert set(stages) == {'fetch', 'spreads', 'align', 'simulate', 'log_transaction', 'evaluate', 'csv',
+                           'blockchain'}
+    assert stages['log_transaction']['rows'] == len(log)
+    assert stages['csv']['rows'] == len(log)
+    written = json.loads((in_tmp_dir / "backtests" / f"{engine}.timings.json").read_text())
+    assert written['stages'].keys() == stages.keys()
@@ -0,0 +1,114 @@
+from market_cache import MarketDataCache
+from data_module import get_commodity_data
+import os
+import time
+from datetime import date, timedelta
+import pytest
+import pandas as pd
+import numpy as np
+
+
+class FakeProvider:
+    """Deterministic stand-in for yfinance that records every request."""
+
+    def __init__(self):
+        self.calls = []
+
+    def history(self, ticker, start_date, end_date):
+        self.calls.append((ticker, start_date, end_date))
+        dates = pd.date_range(start_date, end_date, freq='B', inclusive='left', tz='America/New_York', name='Date')
+        close = 100 + np.arange(len(dates), dtype=float)
+        return pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close,
+                             'Volume': 1000}, index=dates)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return MarketDataCache(str(tmp_path / 'market_data'), verbose=False)
+
+
+def test_cache_only_fetches_missing_ranges(cache):
+    """Widening a window should only request the dates not already on disk."""
+    provider = FakeProvider()
+    first = get_commodity_data('CL=F', '2023-01-02', '2023-02-01', cache, provider)
+    second = get_commodity_data('CL=F', '2023-01-16', '2023-03-01', cache, provider)
+    third = get_commodity_data('CL=F', '2023-01-02', '2023-03-01', cache, provider)
+
+    assert provider.calls == [('CL=F', '2023-01-02', '2023-02-01'), ('CL=F', '2023-02-01', '2023-03-01')]
+    assert len(first) == 22
+    assert second['Date'].min().strftime('%Y-%m-%d') == '2023-01-16'
+    assert len(third) == len(pd.bdate_range('2023-01-02', '2023-02-28'))
+    assert third['ticker'].eq('CL=F').all()
+
+
+def test_empty_past_gaps_are_not_fetched_again(cache):
+    """Past gaps without rows are cached as empty, only the edge reaching today is requested again."""
+    provider = FakeProvider()
+
+    class Empty:
+        def history(self, ticker, start_date, end_date):
+            provider.calls.append((ticker, start_date, end_date))
+            return pd.DataFrame()
+
+    assert get_commodity_data('CL=F', '2023-01-02', '2023-02-01', cache, Empty()).empty
+    assert get_commodity_data('CL=F', '2023-01-02', '2023-02-01', cache, provider).empty
+    assert provider.calls == [('CL=F', '2023-01-02', '2023-02-01')]
+
+    today = date.today()
+    start, end = (today - timedelta(days=30)).isoformat(), (today + timedelta(days=7)).isoformat()
+    get_commodity_data('CL=F', start, end, cache, Empty())
+    retried = get_commodity_data('CL=F', start, end, cache, provider)
+
+    assert provider.calls[1:] == [('CL=F', start, end), ('CL=F', today.isoformat(), end)]
+    assert len(retried) == len(pd.bdate_range(today, end, inclusive='left'))
+
+
+def test_versions_follow_the_cached_data(cache):
+    provider = FakeProvider()
+    assert cache.versions(['CL=F'], '2023-01-02', '2023-03-01') == {'CL=F': None}
+
+    get_commodity_data('CL=F', '2023-01-02', '2023-02-01', cache, provider)
+    first = cache.versions(['CL=F', 'NG=F'], '2023-01-16', '2023-03-01')
+    assert first['CL=F'][1] == [['2023-01-16', '2023-02-01']] and first['NG=F'] is None
+
+    get_commodity_data('CL=F', '2023-01-02', '2023-03-01', cache, provider)
+    assert cache.versions(['CL=F', 'NG=F'], '2023-01-16', '2023-03-01') != first
+
+
+def test_cache_matches_direct_provider(cache):
+    provider = FakeProvider()
+    cached = get_commodity_data('NG=F', '2023-01-02', '2023-01-20', cache, provider)
+    direct = get_commodity_data('NG=F', '2023-01-02', '2023-01-20', provider=FakeProvider())
+
+    pd.testing.assert_frame_equal(cached, direct)
+
+
+def test_offline_mode_never_calls_provider(cache, tmp_path):
+    get_commodity_data('ZC=F', '2023-01-02', '2023-02-01', cache, FakeProvider())
+    offline = MarketDataCache(cache.directory, offline=True, verbose=False)
+    provider = FakeProvider()
+
+    result = get_commodity_data('ZC=F', '2023-01-02', '2023-03-01', offline, provider)
+    missing = get_commodity_data('ZW=F', '2023-01-02', '2023-03-01', offline, provider)
+
+    assert provider.calls == []
+    assert len(result) == 22
+    assert missing.empty
+
+
+def test_eviction_by_size_and_age(cache):
+    provider = FakeProvider()
+    for ticker in ['CL=F', 'NG=F', 'ZC=F']:
+        get_commodity_data(ticker, '2023-01-02', '2023-02-01', cache, provider)
+        time.sleep(0.01)
+    assert not any(name.startswith('.tmp-') for name in os.listdir(cache.directory))
+
+    entry_size = cache.entries()['bytes'].max()
+    cache.max_bytes = 2 * entry_size
+    cache.evict()
+    assert sorted(cache.entries()['key']) == ['NG_F', 'ZC_F']  # CL=F was least recently used
+
+    cache.max_age = 0
+    get_commodity_data('NG=F', '2023-01-02', '2023-02-01', cache, provider)
+    assert provider.calls[-1] == ('NG=F', '2023-01-02', '2023-02-01')  # expired entry is refetched
+    assert list(cache.entries()['key']) == ['NG_F']
@@ -0,0 +1,61 @@
+from monte_carlo import MonteCarloEngine, OptionBook, OptionLeg, PathModel
+from utils import OptionUtils
+import numpy as np
+import pytest
+
+
+def test_gbm_terminal_moments():
+    model = PathModel(S0=100, mu=0.05, sigma=0.2)
+    engine = MonteCarloEngine(model, n_paths=200_000, n_steps=10, horizon=1.0, chunk_size=50_000, seed=1)
+    spots = engine.run(OptionBook(underlying=1.0)).pnl + 100
+    assert spots.mean() == pytest.approx(100 * np.exp(0.05), rel=3e-3)
+    assert np.log(spots).std() == pytest.approx(0.2, rel=1e-2)
+
+
+def test_jumps_keep_the_drift():
+    model = PathModel(S0=100, mu=0.03, sigma=0.15, jump_intensity=2.0, jump_mean=-0.1, jump_std=0.15)
+    engine = MonteCarloEngine(model, n_paths=200_000, n_steps=50, horizon=1.0, chunk_size=50_000, seed=2)
+    result = engine.run(OptionBook(underlying=1.0))
+    assert result.pnl.mean() + 100 == pytest.approx(100 * np.exp(0.03), rel=5e-3)
+    # jumps fatten the left tail compared to GBM with the same diffusion
+    gbm = MonteCarloEngine(PathModel(100, 0.03, 0.15), n_paths=200_000, n_steps=50, chunk_size=50_000, seed=2).run(
+        OptionBook(underlying=1.0))
+    assert result.value_at_risk(0.99) > gbm.value_at_risk(0.99)
+
+
+def test_risk_neutral_option_pnl_is_fair():
+    r, sigma = 0.03, 0.25
+    book = OptionBook([OptionLeg(1.0, 105, 1.0, True), OptionLeg(-2.0, 95, 1.0, False)])
+    engine = MonteCarloEngine(PathModel(100, r, sigma), n_paths=400_000, n_steps=4, chunk_size=100_000, seed=3)
+    result = engine.run(book, r=r)
+    price = OptionUtils.black_scholes_price(100, 105, 1.0, r, sigma, "call") \
+        - 2 * OptionUtils.black_scholes_price(100, 95, 1.0, r, sigma, "put")
+    assert result.initial_value == pytest.approx(price)
+    # the expected payoff discounted at r is the premium paid, within 4 standard errors
+    standard_error = result.std / np.sqrt(len(result.pnl))
+    assert (result.mean + price) * np.exp(-r) == pytest.approx(price, abs=4 * standard_error)
+
+
+def test_chunks_are_reproducible_and_independent_of_workers():
+    model = PathModel(S0=100, mu=0.0, sigma=0.3)
+    book = OptionBook.straddle(100, 0.5)
+    kwargs = dict(n_paths=2_500, n_steps=20, horizon=0.25, chunk_size=1_000, seed=7, mark_every=5)
+    serial = MonteCarloEngine(model, **kwargs).run(book)
+    parallel = MonteCarloEngine(model, max_workers=2, **kwargs).run(book)
+    np.testing.assert_array_equal(serial.pnl, parallel.pnl)
+    np.testing.assert_array_equal(serial.worst, parallel.worst)
+    assert len(serial.pnl) == 2_500
+    assert (serial.worst <= serial.pnl).all()
+    other_seed = MonteCarloEngine(model, **dict(kwargs, seed=8)).run(book)
+    assert not np.array_equal(serial.pnl, other_seed.pnl)
+
+
+@pytest.mark.parametrize('kwargs', [dict(n_steps=0), dict(n_paths=0), dict(chunk_size=0)])
+def test_empty_simulations_are_rejected(kwargs):
+    with pytest.raises(ValueError):
+        MonteCarloEngine(PathModel(S0=100, mu=0.0, sigma=0.2), **kwargs)
+
+
+def test_book_value_at_expiry_is_payoff():
+    book = OptionBook.straddle(100, 0.5)
+    np.testing.assert_allclose(book.value(np.array([90.0, 100.0, 120.0]), 0.5, 0.01, 0.2), [10.0, 0.0, 20.0])
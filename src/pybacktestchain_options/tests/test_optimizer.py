@@ -0,0 +1,152 @@
+from data_module import DataModule, SpreadStrategy, SyntheticProvider, get_commodities_data
+from optimizer import min_variance_weights, rolling_hedge_ratios, window_covariances
+import numpy as np
+import pytest
+from scipy.optimize import minimize
+
+PAIRS = {
+    "OIL": {"Near Term": "CL=F", "Long Term": "CLM25.NYM"},
+    "GAS": {"Near Term": "NG=F", "Long Term": "NGM25.NYM"},
+    "WHEAT": {"Near Term": "ZW=F", "Long Term": "ZWN25.CBT"},
+}
+
+
+def correlated_spreads(n_days=400, n_spreads=6, seed=0):
+    """Daily spread changes sharing one factor, so minimum variance portfolios are leveraged."""
+    rng = np.random.default_rng(seed)
+    factor = rng.normal(0, 1, (n_days, 1)) * rng.uniform(0.5, 1.5, n_spreads)
+    return factor + rng.normal(0, 0.3, (n_days, n_spreads))
+
+
+def slsqp(cov, gross_limit):
+    k = len(cov)
+    constraints = [{'type': 'eq', 'fun': lambda w: w.sum() - 1},
+                   {'type': 'ineq', 'fun': lambda w: gross_limit - np.abs(w).sum()}]
+    result = minimize(lambda w: w @ cov @ w, np.full(k, 1 / k), method='SLSQP', constraints=constraints,
+                      options={'ftol': 1e-15, 'maxiter': 1000})
+    return result.x
+
+
+def test_hedge_ratios_match_a_regression_on_each_window():
+    rng = np.random.default_rng(1)
+    long = 50 + np.cumsum(rng.normal(0, 1, (300, 3)), axis=0)
+    near = 1.3 * long + np.cumsum(rng.normal(0, 0.5, (300, 3)), axis=0)
+
+    ratio, residual = rolling_hedge_ratios(near, long, [20, 60])
+
+    assert ratio.shape == residual.shape == (2, 300, 3)
+    assert np.isnan(ratio[0, :20]).all() and not np.isnan(ratio[0, 20:]).any()
+    dn, dl = np.diff(near, axis=0), np.diff(long, axis=0)
+    for k, w in enumerate([20, 60]):
+        for t in (w, 150, 299):
+            for p in range(3):
+                slope, intercept = np.polyfit(dl[t - w:t, p], dn[t - w:t, p], 1)
+                assert ratio[k, t, p] == pytest.approx(slope)
+                hedged = dn[t - w:t, p] - slope * dl[t - w:t, p]
+                assert residual[k, t, p] == pytest.approx(hedged.var(ddof=1))
+
+
+def test_hedge_ratios_stay_accurate_on_trending_changes():
+    rng = np.random.default_rng(2)
+    long = np.cumsum(np.cumsum(rng.normal(0.01, 0.1, (100_000, 1)), axis=0), axis=0)  # accelerating prices
+    near = 0.7 * long + np.cumsum(rng.normal(0, 1, (100_000, 1)), axis=0)
+
+    ratio, _ = rolling_hedge_ratios(near, long, [20])
+
+    dn, dl = np.diff(near[:, 0]), np.diff(long[:, 0])
+    for t in (20, 50_000, 99_999):
+        slope = np.polyfit(dl[t - 20:t], dn[t - 20:t], 1)[0]
+        assert ratio[0, t, 0] == pytest.approx(slope, rel=1e-6)
+
+
+def test_window_covariances_match_numpy():
+    changes = correlated_spreads(100, 4)
+
+    cov = window_covariances(changes, 30, [29, 64, 99])
+
+    for c, end in zip(cov, [29, 64, 99]):
+        np.testing.assert_allclose(c, np.cov(changes[end - 29:end + 1].T))
+
+
+def test_unconstrained_weights_are_the_closed_form():
+    cov = np.cov(correlated_spreads(200, 5).T)
+    inv_ones = np.linalg.solve(cov, np.ones(5))
+
+    result = min_variance_weights(cov)
+
+    np.testing.assert_allclose(result.weights, inv_ones / inv_ones.sum())
+    assert result.converged and result.iterations == 0
+
+
+@pytest.mark.parametrize("gross_limit", [1.0, 1.3, 2.0])
+def test_gross_limited_weights_match_slsqp(gross_limit):
+    cov = window_covariances(correlated_spreads(), 60, np.arange(59, 400, 60))
+
+    result = min_variance_weights(cov, gross_limit)
+
+    assert result.converged.all()
+    np.testing.assert_allclose(result.weights.sum(axis=1), 1.0)
+    assert (np.abs(result.weights).sum(axis=1) <= gross_limit + 1e-9).all()
+    for c, w in zip(cov, result.weights):
+        reference = slsqp(c, gross_limit)  # may exceed the limit by ~1e-7
+        assert w @ c @ w <= reference @ c @ reference * (1 + 1e-6)
+
+
+def test_warm_start_from_the_previous_window():
+    cov = window_covariances(correlated_spreads(), 60, np.arange(59, 400))
+    cold = min_variance_weights(cov, 1.5)
+
+    warm = min_variance_weights(cov[1:], 1.5, warm_start=cold.weights[:-1])
+
+    np.testing.assert_allclose(warm.weights, cold.weights[1:], atol=1e-8)
+    assert warm.converged.all()
+    assert warm.iterations <= cold.iterations
+    with pytest.raises(ValueError):
+        min_variance_weights(cov, 0.5)
+
+
+def test_singular_covariances_do_not_break_the_batch():
+    changes = correlated_spreads(200, 4)
+    cov = window_covariances(changes, 60, [59, 119, 179])
+    flat = changes.copy()
+    flat[:, 2] = 0.0  # a spread that did not move
+    cov[1] = np.cov(flat[60:120].T)
+    cov[2, 0, 0] = np.nan
+
+    for gross_limit in (np.inf, 1.2):
+        result = min_variance_weights(cov, gross_limit)
+
+        np.testing.assert_array_equal(result.converged, [True, False, False])
+        assert np.isnan(result.weights[1:]).all()
+        np.testing.assert_allclose(result.weights[0], min_variance_weights(cov[0], gross_limit).weights)
+    short = window_covariances(changes, 3, [10])  # fewer observations than spreads
+    assert not min_variance_weights(short).converged.any()
+
+
+def test_hedge_ratio_follows_the_inputs():
+    strategy = SpreadStrategy(DataModule(None))
+
+    np.testing.assert_allclose(strategy.optimize_spread(0, 0.02, 0.9), [1.0, -0.9])
+    np.testing.assert_allclose(strategy.optimize_spread(0, 0.5, -0.3), [1.0, 0.3])
+    np.testing.assert_allclose(strategy.optimize_spread(0, 0.02, 0.5, long_std_dev=0.04), [1.0, -0.25])
+    np.testing.assert_allclose(strategy.optimize_spread(0, 0.04, 0.5, long_std_dev=0.02), [1.0, -1.0])
+    np.testing.assert_allclose(strategy.optimize_spread(0, 0.02, 0.9, margin_limit=0.95), [0.5, -0.45])
+
+
+def test_spread_strategy_weights():
+    data = get_commodities_data(PAIRS, "2022-01-01", "2023-06-30", provider=SyntheticProvider())
+    strategy = SpreadStrategy(DataModule(data))
+
+    np.testing.assert_allclose(strategy.optimize_spread(0.01, 0.02, 1.0), [1.0, -1.0])
+    np.testing.assert_allclose(strategy.optimize_spread(0.01, [0.02, 0.02], [1.0, -1.0], margin_limit=1.0),
+                               [[0.5, -0.5], [0.5, 0.5]])
+
+    dates, commodities, ratio, _ = strategy.hedge_ratios([20, 60])
+    assert commodities == strategy.commodities()
+    assert ratio.shape == (2, len(dates), len(commodities))
+
+    weights = strategy.spread_weights(window=60, gross_limit=1.2, step=20)
+    assert list(weights.columns) == commodities
+    np.testing.assert_allclose(weights.sum(axis=1), 1.0)
+    assert (weights.abs().sum(axis=1) <= 1.2 + 1e-9).all()
+    assert weights.index[0] == dates[60]
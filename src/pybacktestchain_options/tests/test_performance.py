@@ -0,0 +1,72 @@
+from broker import CommoBackTest
+from data_module import SyntheticProvider
+from performance import evaluate, forward_fill
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import datetime
+
+PAIRS = {
+    "OIL": {"Near Term": "CL=F", "Long Term": "CLM25.NYM"},
+    "GAS": {"Near Term": "NG=F", "Long Term": "NGM25.NYM"},
+    "WHEAT": {"Near Term": "ZW=F", "Long Term": "ZWN25.CBT"},
+    "CORN": {"Near Term": "ZC=F", "Long Term": "ZCN25.CBT"},
+}
+
+
+@pytest.fixture
+def in_tmp_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_forward_fill():
+    prices = np.array([[np.nan, 1.0], [2.0, np.nan], [np.nan, np.nan], [4.0, 5.0]])
+    expected = np.array([[np.nan, 1.0], [2.0, 1.0], [2.0, 1.0], [4.0, 5.0]])
+    np.testing.assert_array_equal(forward_fill(prices), expected)
+
+
+def test_metrics_match_pandas_reference():
+    rng = np.random.default_rng(3)
+    days, n = 300, 3
+    calendar = pd.bdate_range("2020-01-01", periods=days)
+    near = 50 + np.cumsum(rng.normal(0, 1, (days, n)), axis=0)
+    long = near + rng.normal(0, 1, (days, n))
+    near[[10, 11, 50]] = np.nan
+    long[[10, 11, 50]] = np.nan
+    near_qty = np.cumsum(rng.integers(-1, 2, (days, n)), axis=0).astype(float)
+    long_qty = np.cumsum(rng.integers(-1, 2, (days, n)), axis=0).astype(float)
+    cash = 10_000 + np.cumsum(rng.normal(0, 10, days))
+
+    report = evaluate(calendar, ["A", "B", "C"], near, long, near_qty, long_qty, cash)
+
+    near_f = pd.DataFrame(near).ffill().to_numpy()
+    long_f = pd.DataFrame(long).ffill().to_numpy()
+    equity = pd.Series(cash + (near_qty * near_f + long_qty * long_f).sum(axis=1), index=calendar)
+    pd.testing.assert_series_equal(report.equity, equity, check_names=False)
+    returns = equity.pct_change().dropna()
+    assert report.sharpe == pytest.approx(returns.mean() / returns.std() * np.sqrt(252))
+    assert report.max_drawdown == pytest.approx((equity / equity.cummax() - 1).min())
+    # commodity P&L and the trading residual add up to the equity change
+    assert report.attribution.to_numpy().sum() == pytest.approx(equity.iloc[-1] - equity.iloc[0])
+    expected_pnl = (np.vstack([np.zeros((1, n)), near_qty[:-1]]) * np.diff(near_f, axis=0, prepend=np.nan))
+    expected_pnl += np.vstack([np.zeros((1, n)), long_qty[:-1]]) * np.diff(long_f, axis=0, prepend=np.nan)
+    np.testing.assert_allclose(report.attribution[["A", "B", "C"]].to_numpy()[1:], expected_pnl[1:])
+
+
+@pytest.mark.parametrize("engine", ["loop", "vectorized"])
+def test_backtest_equity_curve(in_tmp_dir, engine):
+    events = []
+    backtest = CommoBackTest(datetime(2023, 1, 1), datetime(2023, 6, 30), PAIRS, 100_000, False, engine,
+                             provider=SyntheticProvider(), engine=engine, listener=events.append)
+    log = backtest.run_backtest()
+    report = backtest.performance
+
+    # the daily curve matches the broker's own valuation on every trading day
+    equity = {e["Date"]: e["Portfolio Value"] for e in events if e["type"] == "equity"}
+    for day, value in equity.items():
+        assert report.equity[day] == pytest.approx(value)
+    assert backtest.final_value == pytest.approx(report.equity.iloc[-1])
+    # transactions carry the portfolio value of their day instead of a placeholder
+    np.testing.assert_allclose(log["Portfolio Value"], report.equity[log["Date"]].to_numpy())
+    assert set(report.summary()) == {"final_value", "total_return", "sharpe", "max_drawdown", "annual_turnover"}
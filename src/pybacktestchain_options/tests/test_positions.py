@@ -0,0 +1,72 @@
+from positions import PositionBook, PositionView, SpreadPosition
+from broker import CommoBroker
+import pytest
+import numpy as np
+
+
+def test_position_book_behaves_like_a_dict_of_positions():
+    book = PositionBook(capacity=2)
+    book['OIL'] = SpreadPosition('OIL', 1, 2, 0.5)
+    book.add('GAS', 3, 4, 0.25)
+    book.add('CORN', 5, 6, 0.75)  # grows past the initial capacity
+
+    assert len(book) == 3 and list(book) == ['OIL', 'GAS', 'CORN']
+    assert 'GAS' in book and 'WHEAT' not in book
+    assert book.get('WHEAT') is None
+    with pytest.raises(KeyError):
+        book['WHEAT']
+    assert book['GAS'] == SpreadPosition('GAS', 3.0, 4.0, 0.25)
+    assert isinstance(book['GAS'], PositionView)
+
+    book['OIL'].near_term_quantity += 10  # writes through to the arrays
+    np.testing.assert_array_equal(book.near_qty, [11.0, 3.0, 5.0])
+    np.testing.assert_array_equal(book.entry_spread, [0.5, 0.25, 0.75])
+
+
+def test_position_book_delete_keeps_rows_contiguous():
+    book = PositionBook()
+    for i, commodity in enumerate(['OIL', 'GAS', 'CORN']):
+        book.add(commodity, i, 10 * i, 0.0)
+    view = book['CORN']
+
+    del book['OIL']
+
+    assert list(book) == ['CORN', 'GAS']
+    np.testing.assert_array_equal(book.rows(['GAS', 'OIL', 'CORN']), [1, -1, 0])
+    assert view.long_term_quantity == 20.0
+
+
+def test_position_book_bulk_updates_and_views():
+    book = PositionBook()
+    book.add('OIL', 1, 1, 0.1)
+    book.set_many(['GAS', 'OIL'], near_qty=[2.0, 3.0], long_qty=[4.0, 5.0])
+
+    assert book.commodities == ['OIL', 'GAS']
+    np.testing.assert_array_equal(book.near_qty, [3.0, 2.0])
+    np.testing.assert_array_equal(book.long_qty, [5.0, 4.0])
+    assert book['OIL'].entry_spread == 0.1 and np.isnan(book['GAS'].entry_spread)
+    book.near_qty[1] = 7.0  # zero-copy view
+    assert book['GAS'].near_term_quantity == 7.0
+
+    assert book.value(['GAS', 'WHEAT', 'OIL'], [10.0, 99.0, 20.0], [1.0, 99.0, 2.0]) == 7 * 10 + 4 + 3 * 20 + 5 * 2
+
+
+def test_broker_accepts_a_dict_of_positions():
+    broker = CommoBroker(100.0, positions={'OIL': SpreadPosition('OIL', 2, 3, 0.5)}, verbose=False)
+
+    assert isinstance(broker.positions, PositionBook)
+    assert broker.get_portfolio_value({'OIL': [10.0, 20.0], 'GAS': None}) == 100.0 + 2 * 10 + 3 * 20
+    assert broker.mark_to_market(['GAS', 'OIL'], [1.0, 10.0], [1.0, 20.0]) == 100.0 + 2 * 10 + 3 * 20
+
+
+def test_assigned_dicts_become_books():
+    broker = CommoBroker(1000, verbose=False)
+    assert isinstance(broker.positions, PositionBook) and len(broker.positions) == 0
+
+    broker.positions = {}
+    broker.update_pos('OIL', 1, 1, 10.0, 12.0, '2025-01-02')
+    assert isinstance(broker.positions, PositionBook) and 'OIL' in broker.positions
+
+    broker.positions = {'GAS': SpreadPosition('GAS', 1, 2, 0.5)}
+    assert broker.positions['GAS'] == SpreadPosition('GAS', 1.0, 2.0, 0.5)
+    assert CommoBroker(1000, {'GAS': SpreadPosition('GAS', 1, 2, 0.5)}, verbose=False).positions['GAS'].long_term_quantity == 2
@@ -0,0 +1,107 @@
+from broker import CommoBackTest
+from data_module import SyntheticProvider, get_commodities_data
+from performance import RunningPerformance, evaluate
+from replay import ReplayBackTest, iter_bars, write_bars
+import numpy as np
+import pandas as pd
+import pytest
+import tracemalloc
+from datetime import datetime
+
+PAIRS = {
+    "OIL": {"Near Term": "CL=F", "Long Term": "CLM25.NYM"},
+    "GAS": {"Near Term": "NG=F", "Long Term": "NGM25.NYM"},
+    "WHEAT": {"Near Term": "ZW=F", "Long Term": "ZWN25.CBT"},
+    "CORN": {"Near Term": "ZC=F", "Long Term": "ZCN25.CBT"},
+}
+
+
+@pytest.fixture
+def in_tmp_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def minute_feed(n_minutes, chunksize=500, seed=0):
+    """Minute bars of every leg of PAIRS, generated chunk by chunk like a live feed."""
+    rng = np.random.default_rng(seed)
+    contracts = [f"{name} - {term}" for name in PAIRS for term in ("Near Term", "Long Term")]
+    level = np.full(len(contracts), 50.0)
+    start = pd.Timestamp("2023-01-02 09:30")
+    for first in range(0, n_minutes, chunksize):
+        minutes = np.arange(first, min(first + chunksize, n_minutes))
+        steps = np.exp(np.cumsum(rng.normal(0, 0.001, (len(minutes), len(contracts))), axis=0))
+        prices, level = level * steps, level * steps[-1]
+        yield pd.DataFrame({
+            "Date": np.repeat(start + pd.to_timedelta(minutes, unit="min"), len(contracts)),
+            "Contract": np.tile(contracts, len(minutes)),
+            "Close": prices.ravel(),
+        })
+
+
+@pytest.mark.parametrize("ext", ["parquet", "csv"])
+def test_replay_matches_the_loop_engine(in_tmp_dir, ext):
+    data = get_commodities_data(PAIRS, "2023-01-01", "2023-06-30", provider=SyntheticProvider())
+    backtest = CommoBackTest(datetime(2023, 1, 1), datetime(2023, 6, 30), PAIRS, 1_000_000, False, "full", data=data)
+    log = backtest.run_backtest()
+    write_bars(data, f"bars.{ext}", row_group_size=37)
+
+    events = []
+    replay = ReplayBackTest(f"bars.{ext}", PAIRS, 1_000_000, False, "replay", chunksize=37, listener=events.append)
+    summary = replay.run()
+
+    transactions = pd.DataFrame([e for e in events if e["type"] == "transaction"])
+    assert list(transactions["Commodity"]) == list(log["Commodity"])
+    for column in ("Near Term Qty", "Long Term Qty", "Cash", "Portfolio Value"):
+        np.testing.assert_allclose(transactions[column], log[column])
+    written = pd.read_csv(in_tmp_dir / "backtests" / "replay.csv", index_col=0)
+    np.testing.assert_allclose(written["Cash"], log["Cash"])
+    assert summary["final_value"] == pytest.approx(backtest.final_value)
+    assert summary["max_drawdown"] == pytest.approx(backtest.performance.max_drawdown)
+    assert events[-1]["transactions"] == len(log)
+    assert len(replay.broker.get_transaction_log()) == 0  # nothing kept in memory
+
+
+def test_bars_span_chunk_boundaries():
+    frame = pd.concat(minute_feed(30, chunksize=30))
+    chunks = [frame.iloc[i:i + 7] for i in range(0, len(frame), 7)]  # 8 rows per bar
+
+    bars = list(iter_bars(chunks))
+
+    assert len(bars) == 30
+    assert all(len(contracts) == 8 for _, contracts, _ in bars)
+    assert [t for t, _, _ in bars] == list(pd.date_range("2023-01-02 09:30", periods=30, freq="min"))
+    with pytest.raises(ValueError):
+        list(iter_bars([frame.iloc[8:], frame.iloc[:8]]))
+
+
+def test_minute_feed_replays_in_constant_memory(in_tmp_dir):
+    def peak(n_minutes):
+        replay = ReplayBackTest(minute_feed(n_minutes), PAIRS, 1_000_000, False, f"minutes{n_minutes}")
+        tracemalloc.start()
+        try:
+            events = replay.events()
+            first = next(events)
+            for event in events:
+                pass
+            return first, event, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    first, done, short = peak(500)
+    _, _, long = peak(3_000)
+    assert first["Date"] == "2023-01-02T09:30:00"
+    assert done["type"] == "done" and done["transactions"] > 0
+    assert long < 1.5 * short
+
+
+def test_running_performance_matches_evaluate():
+    equity = 100 * np.exp(np.cumsum(np.random.default_rng(1).normal(0, 0.01, 300)))
+    report = evaluate(pd.RangeIndex(300), [], np.empty((300, 0)), np.empty((300, 0)), np.empty((300, 0)),
+                      np.empty((300, 0)), equity)
+    running = RunningPerformance()
+    for value in equity:
+        running.update(value)
+
+    for key, value in running.summary().items():
+        assert value == pytest.approx(report.summary()[key])
@@ -0,0 +1,87 @@
+from result_cache import ResultCache, canonical_hash, data_fingerprint, window_fingerprint
+from datetime import date
+import os
+import threading
+import time
+import pytest
+
+
+def test_canonical_hash():
+    assert canonical_hash({"a": 1, "b": [1, 2]}) == canonical_hash({"b": [1, 2], "a": 1})
+    assert canonical_hash({"a": 1}) != canonical_hash({"a": 2})
+    assert canonical_hash({"a": 1}, "2023-06-30") != canonical_hash({"a": 1}, "2023-07-03")
+
+
+def test_window_fingerprint():
+    today = date(2024, 1, 10)
+    assert window_fingerprint("2023-06-30", today) == "2023-06-30"
+    assert window_fingerprint("2024-12-31", today) == "2024-01-10"
+
+
+def test_data_fingerprint():
+    today = date(2024, 1, 10)
+    versions = {"CL=F": [1.0, [["2023-01-01", "2023-06-30"]]]}
+    fingerprint = data_fingerprint("2023-06-30", "Yahoo", versions, today)
+    assert fingerprint == data_fingerprint("2023-06-30", "Yahoo", dict(versions), today)
+    assert fingerprint != data_fingerprint("2023-06-30", "Synthetic", versions, today)
+    assert fingerprint != data_fingerprint("2023-06-30", "Yahoo", {"CL=F": [2.0, [["2023-01-01", "2023-06-30"]]]}, today)
+    assert fingerprint != data_fingerprint("2023-06-29", "Yahoo", versions, today)
+
+
+def test_lru_eviction(tmp_path):
+    cache = ResultCache(str(tmp_path), max_entries=2)
+    for i, key in enumerate("abc"[:2]):
+        cache.put(key, {"value": i})
+        os.utime(cache._path(key), (i, i))
+    assert cache.get("a") == {"value": 0}  # a becomes the most recently used
+    cache.put("c", {"value": 2})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"value": 0} and cache.get("c") == {"value": 2}
+
+
+def test_size_bound(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=200)
+    for i in range(10):
+        cache.put(str(i), {"payload": "x" * 50})
+    assert sum(size for _, size, _ in cache.entries()) <= 200
+
+
+def test_concurrent_misses_are_coalesced(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"value": 42}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert [r for r, _ in results] == [{"value": 42}] * 5
+    assert sorted(hit for _, hit in results) == [False, True, True, True, True]
+
+
+def test_failures_are_not_cached(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("k", lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+    assert cache.get_or_compute("k", lambda: {"ok": True}) == ({"ok": True}, False)
+
+
+def test_owner_checks_the_cache_again(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    cache.put("k", {"value": 1})
+    get, calls = cache.get, []
+
+    def racing_get(key):  # the first get ran just before another owner's put
+        calls.append(key)
+        return None if len(calls) == 1 else get(key)
+
+    cache.get = racing_get
+
+    assert cache.get_or_compute("k", lambda: pytest.fail("recomputed")) == ({"value": 1}, True)
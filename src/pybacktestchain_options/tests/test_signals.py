@@ -0,0 +1,110 @@
+from data_module import COMMODITY_TICKER_PAIRS, DataModule, SpreadStrategy, SyntheticProvider, get_commodities_data
+from replay import ReplayBackTest, write_bars
+from signals import (EwmaZScore, RollingZScore, ewma_zscore, mean_reversion_positions, rolling_covariance,
+                     rolling_zscore)
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import pandas as pd
+import pytest
+
+WINDOWS = [5, 20, 60]
+
+
+@pytest.fixture
+def spreads():
+    rng = np.random.default_rng(0)
+    return 100 + np.cumsum(rng.normal(0, 1, (400, 3)), axis=0)
+
+
+def pandas_rolling(values, window):
+    frame = pd.DataFrame(values)
+    rolling = frame.rolling(window)
+    return ((frame - rolling.mean()) / rolling.std()).to_numpy()
+
+
+def test_rolling_zscores_match_pandas(spreads):
+    batch = rolling_zscore(spreads, WINDOWS)
+    online = RollingZScore(WINDOWS, spreads.shape[1])
+    streamed = np.stack([online.update(row) for row in spreads], axis=1)
+
+    for k, window in enumerate(WINDOWS):
+        expected = pandas_rolling(spreads, window)
+        np.testing.assert_allclose(batch[k], expected, rtol=1e-8, atol=1e-9)
+        np.testing.assert_allclose(streamed[k], expected, rtol=1e-8, atol=1e-9)
+
+
+def test_rolling_zscores_stay_accurate_on_a_long_trend():
+    trend = 1e4 + np.cumsum(np.random.default_rng(3).normal(0.5, 1.0, 200_000))[:, None]
+
+    z = rolling_zscore(trend, [20, 250])
+
+    for k, w in enumerate([20, 250]):
+        windows = sliding_window_view(trend[:, 0], w)
+        exact = (trend[w - 1:, 0] - windows.mean(axis=1)) / windows.std(axis=1, ddof=1)
+        np.testing.assert_allclose(z[k, w - 1:, 0], exact, rtol=0, atol=1e-6)
+
+
+def test_rolling_covariance_matches_numpy():
+    x, y = np.random.default_rng(4).normal(size=(2, 3000, 2)).cumsum(axis=1)
+
+    mean_x, mean_y, cov = rolling_covariance(x, y, 50, block=128)
+
+    for end in (49, 127, 128, 1500, 2999):
+        rows = slice(end - 49, end + 1)
+        np.testing.assert_allclose(mean_x[end - 49], x[rows].mean(axis=0))
+        np.testing.assert_allclose(mean_y[end - 49], y[rows].mean(axis=0))
+        for j in range(2):
+            np.testing.assert_allclose(cov[end - 49, j], np.cov(x[rows, j], y[rows, j])[0, 1])
+
+
+def test_ewma_zscores_match_pandas(spreads):
+    batch = ewma_zscore(spreads, [5, 30])
+    online = EwmaZScore([5, 30], spreads.shape[1])
+
+    for k, halflife in enumerate([5, 30]):
+        ewm = pd.DataFrame(spreads).ewm(halflife=halflife, adjust=False)
+        expected = ((pd.DataFrame(spreads) - ewm.mean()) / np.sqrt(ewm.var(bias=True))).to_numpy()
+        expected[0] = np.nan
+        np.testing.assert_allclose(batch[k], expected, rtol=1e-10)
+    np.testing.assert_array_equal(online.update(spreads[0]), batch[:, 0])
+
+
+def test_positions_hold_between_entry_and_exit():
+    z = np.array([0.0, 2.5, 1.0, 0.3, -1.0, -2.1, -0.7, -0.2, 3.0])[:, None]
+
+    position = mean_reversion_positions(z, entry=2.0, exit=0.5)
+
+    assert position[:, 0].tolist() == [0, -1, -1, 0, 0, 1, 1, 0, -1]
+    with pytest.raises(ValueError):
+        mean_reversion_positions(z, entry=0.5, exit=1.0)
+
+
+def test_strategy_signals_and_statistics():
+    data = get_commodities_data(COMMODITY_TICKER_PAIRS, "2023-01-01", "2023-12-31", provider=SyntheticProvider())
+    strategy = SpreadStrategy(DataModule(data))
+    spread_data = strategy.compute_spread()
+    columns = list(spread_data.columns)
+
+    signals = strategy.signals(windows=WINDOWS, entry=1.5, exit=0.25)
+    mean, std = strategy.compute_statistics(spread_data)
+
+    assert list(spread_data.columns) == columns  # not modified
+    assert list(mean.index) == [f"{c} - Spread" for c in strategy.commodities()]
+    assert signals.zscore.shape == (3, len(spread_data), len(strategy.commodities()))
+    oil = spread_data["OIL - Spread"].to_numpy()[:, None]
+    np.testing.assert_allclose(signals.frame(20)["OIL"], pandas_rolling(oil, 20)[:, 0], rtol=1e-8)
+    assert set(np.unique(signals.position)) <= {-1.0, 0.0, 1.0}
+
+
+def test_replay_reports_streaming_zscores(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pairs = {name: COMMODITY_TICKER_PAIRS[name] for name in ("OIL", "GAS")}
+    data = get_commodities_data(pairs, "2023-01-01", "2023-06-30", provider=SyntheticProvider())
+    write_bars(data, "bars.parquet")
+    events = []
+    ReplayBackTest("bars.parquet", pairs, verbose=False, listener=events.append,
+                   signals=RollingZScore([20], n_series=2)).run()
+
+    streamed = [e["Z-Scores"][20]["OIL"] for e in events if e["type"] == "equity"]
+    batch = SpreadStrategy(DataModule(data)).signals(windows=[20]).frame(20)["OIL"]
+    np.testing.assert_allclose(streamed, batch, rtol=1e-8)
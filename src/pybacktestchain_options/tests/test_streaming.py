@@ -0,0 +1,56 @@
+from streaming import EventStream, StreamClosed, run_streamed
+import threading
+import time
+import pytest
+
+
+def test_events_flow_in_order():
+    stream = EventStream(maxsize=2)
+    run_streamed(lambda emit: [emit({"i": i}) for i in range(50)], stream)
+    assert [e["i"] for e in stream] == list(range(50))
+
+
+def test_slow_consumer_bounds_the_buffer():
+    stream = EventStream(maxsize=3, poll=0.01)
+    produced = []
+
+    def produce(emit):
+        for i in range(100):
+            emit({"i": i})
+            produced.append(i)
+
+    run_streamed(produce, stream)
+    time.sleep(0.1)
+    assert len(produced) <= 3  # the producer waits for the consumer
+    events = iter(stream)
+    assert next(events) == {"i": 0}
+
+
+def test_consumer_leaving_stops_the_producer():
+    stream = EventStream(maxsize=1, poll=0.01)
+    stopped = threading.Event()
+
+    def produce(emit):
+        try:
+            while True:
+                emit({"tick": 1})
+        except StreamClosed:
+            stopped.set()
+            raise
+
+    run_streamed(produce, stream)
+    events = stream.ndjson()
+    assert next(events) == '{"tick": 1}\n'
+    events.close()
+    assert stopped.wait(1)
+
+
+def test_errors_end_the_stream():
+    stream = EventStream()
+
+    def produce(emit):
+        emit({"type": "transaction"})
+        raise ValueError("no data")
+
+    run_streamed(produce, stream)
+    assert list(stream) == [{"type": "transaction"}, {"type": "error", "error": "no data"}]
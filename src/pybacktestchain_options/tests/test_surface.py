@@ -0,0 +1,61 @@
+from surface import SurfacePricer
+from utils import OptionGreeks, OptionUtils
+import pytest
+import numpy as np
+
+STRIKES = np.linspace(60, 140, 17)
+MATURITIES = np.array([0.02, 0.1, 0.25, 0.5, 1.0, 2.0])
+
+
+def reference(S, r, sigma, is_call):
+    T, K = np.meshgrid(MATURITIES, STRIKES, indexing='ij')
+    return OptionUtils.price_and_greeks(S, K, T, np.broadcast_to(r, T.shape),
+                                        np.broadcast_to(sigma, T.shape), is_call)
+
+
+def assert_greeks_close(a, b):
+    for name in ('price', 'delta', 'gamma', 'vega', 'theta'):
+        np.testing.assert_allclose(getattr(a, name), getattr(b, name), rtol=1e-10, atol=1e-12, err_msg=name)
+
+
+def test_surface_matches_price_and_greeks():
+    """Every cell of the grid should match the batched pricer."""
+    rng = np.random.default_rng(1)
+    r = np.linspace(0.01, 0.04, len(MATURITIES))[:, None]
+    sigma = rng.uniform(0.1, 0.6, (len(MATURITIES), len(STRIKES)))
+    is_call = rng.random((len(MATURITIES), len(STRIKES))) < 0.5
+    pricer = SurfacePricer(STRIKES, MATURITIES, r=r[:, 0], sigma=sigma, is_call=is_call)
+
+    for S in (80.0, 100.0, 125.0):
+        greeks = pricer.price(S)
+        assert greeks.shape == (len(MATURITIES), len(STRIKES))
+        assert_greeks_close(greeks, reference(S, r, sigma, is_call))
+
+
+def test_surface_reuses_out_buffers_across_ticks():
+    """Repricing at a new spot into the same buffers should match a fresh pricing."""
+    pricer = SurfacePricer(STRIKES, MATURITIES, r=0.02, sigma=0.25, is_call=False)
+    out = OptionGreeks.empty(pricer.shape)
+    price_buffer = out.price
+
+    pricer.price(100.0, out=out)
+    result = pricer.price(97.5, out=out)
+
+    assert result is out and out.price is price_buffer
+    assert_greeks_close(out, reference(97.5, 0.02, 0.25, False))
+
+
+def test_surface_refresh_after_volatility_change():
+    pricer = SurfacePricer(STRIKES, MATURITIES, r=0.02, sigma=0.2)
+    pricer.sigma = np.linspace(0.15, 0.35, len(MATURITIES))[:, None]
+    pricer.refresh()
+
+    assert_greeks_close(pricer.price(100.0), reference(100.0, 0.02, pricer.sigma, True))
+
+
+def test_surface_rejects_bad_inputs():
+    with pytest.raises(ValueError):
+        SurfacePricer(STRIKES, [0.0, 1.0])
+    pricer = SurfacePricer(STRIKES, MATURITIES)
+    with pytest.raises(ValueError):
+        pricer.price(100.0, out=OptionGreeks.empty(3))
@@ -0,0 +1,65 @@
+from broker import CommoBackTest
+from data_module import SyntheticProvider
+from sweep import BacktestSweep, expand_grid
+import pytest
+from datetime import datetime
+
+PAIRS = {
+    "OIL": {"Near Term": "CL=F", "Long Term": "CLM25.NYM"},
+    "GAS": {"Near Term": "NG=F", "Long Term": "NGM25.NYM"},
+    "WHEAT": {"Near Term": "ZW=F", "Long Term": "ZWN25.CBT"},
+    "CORN": {"Near Term": "ZC=F", "Long Term": "ZCN25.CBT"},
+}
+
+
+@pytest.fixture
+def in_tmp_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+class CountingProvider(SyntheticProvider):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def history(self, ticker, start_date, end_date):
+        self.calls.append(ticker)
+        return super().history(ticker, start_date, end_date)
+
+
+def test_expand_grid():
+    grid = expand_grid(cash=[1, 2], engine=["loop", "vectorized"])
+    assert grid == [{"cash": 1, "engine": "loop"}, {"cash": 1, "engine": "vectorized"},
+                    {"cash": 2, "engine": "loop"}, {"cash": 2, "engine": "vectorized"}]
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_sweep_matches_single_runs(in_tmp_dir, max_workers):
+    other_month = dict(PAIRS, OIL={"Near Term": "CL=F", "Long Term": "CLZ25.NYM"})
+    grid = expand_grid(initial_date=[datetime(2023, 1, 1), datetime(2023, 3, 1)],
+                       cash=[1_000, 1_000_000], commodity_pairs=[PAIRS, other_month])
+    provider = CountingProvider()
+    sweep = BacktestSweep(grid, base={"final_date": datetime(2023, 6, 30), "verbose": False},
+                          max_workers=max_workers, chunksize=3, provider=provider)
+    results = sweep.run()
+
+    # every leg is downloaded once for the whole grid
+    assert sorted(provider.calls) == sorted(set(provider.calls))
+    assert len(provider.calls) == 9
+    assert len(results) == len(grid)
+    assert results["error"].isna().all()
+    assert results["backtest_name"].is_unique
+
+    for config, (_, row) in zip(grid, results.iterrows()):
+        single = CommoBackTest(config["initial_date"], datetime(2023, 6, 30), config["commodity_pairs"],
+                               config["cash"], False, "single", provider=SyntheticProvider())
+        log = single.run_backtest()
+        assert row["n_transactions"] == len(log)
+        assert row["final_cash"] == pytest.approx(single.broker.cash)
+        assert row["final_value"] == pytest.approx(single.final_value)
+        assert row["sharpe"] == pytest.approx(single.performance.sharpe)
+        assert (in_tmp_dir / "backtests" / f"{row['backtest_name']}.csv").exists()
+
+    for chain in results["name_blockchain"].unique():
+        assert (in_tmp_dir / "blockchain" / f"{chain}.idx").exists()
@@ -0,0 +1,72 @@
+from transaction_log import TRANSACTION_COLUMNS, TransactionLog
+from broker import CommoBroker
+import pandas as pd
+import numpy as np
+from datetime import datetime
+
+
+def test_log_grows_past_initial_capacity():
+    log = TransactionLog(capacity=2)
+    for day in range(1, 6):
+        log.append(datetime(2025, 1, day), "Long ST, Short LT", "CORN", day, -day, 1.5, 100.0 - day, 1)
+
+    frame = log.to_frame()
+    assert log.capacity >= 5
+    assert list(frame.columns) == TRANSACTION_COLUMNS
+    assert frame["Near Term Qty"].tolist() == [1, 2, 3, 4, 5]
+    assert frame["Date"].iloc[-1] == pd.Timestamp("2025-01-05")
+
+
+def test_time_zone_is_kept():
+    dates = pd.date_range("2025-01-02", periods=3, freq="B", tz="America/New_York")
+    log = TransactionLog()
+    log.append(dates[0], "Long ST, Short LT", "CORN", 1, -1, 1.5, 100.0, 1)
+    log.extend(pd.DataFrame({"Date": dates[1:], "Action": "Long LT, Short ST", "Commodity": "GAS",
+                             "Near Term Qty": 1.0, "Long Term Qty": 1.0, "Spread": 1.0, "Cash": 1.0,
+                             "Portfolio Value": 1.0}, columns=TRANSACTION_COLUMNS))
+
+    expected = pd.Series(dates, name="Date")
+    pd.testing.assert_series_equal(log.to_frame()["Date"], expected)
+    assert [row["Date"] for row in log.records()] == list(dates)
+    pd.testing.assert_series_equal(TransactionLog.from_arrays(log.to_arrays()).to_frame()["Date"], expected)
+
+
+def test_extend_matches_append():
+    rows = [(datetime(2025, 1, 1), "Long ST, Short LT", "CORN", 1.0, 2.0, 3.0, 4.0, 5.0),
+            (datetime(2025, 1, 2), "Long LT, Short ST", "GAS", 6.0, 7.0, 8.0, 9.0, 10.0)]
+    appended = TransactionLog()
+    for row in rows:
+        appended.append(*row)
+    extended = TransactionLog()
+    extended.extend(pd.DataFrame(rows, columns=TRANSACTION_COLUMNS))
+
+    pd.testing.assert_frame_equal(appended.to_frame(), extended.to_frame())
+
+
+def test_broker_transaction_log_seed():
+    """CommoBroker can be seeded from an existing log, and hands out copies of it."""
+    broker = CommoBroker(1000, verbose=False)
+    assert list(broker.get_transaction_log().columns) == TRANSACTION_COLUMNS
+    assert broker.get_transaction_log().empty
+
+    broker.log_transaction(datetime(2025, 1, 1), "Long ST, Short LT", "CORN", 1, 2, 3.0, 1)
+    seeded = CommoBroker(500, initial_log=broker.get_transaction_log(), verbose=False)
+    seeded.log_transaction(datetime(2025, 1, 2), "Long LT, Short ST", "OIL", 4, 5, 6.0, 1)
+
+    log = seeded.get_transaction_log()
+    assert log["Commodity"].tolist() == ["CORN", "OIL"]
+    assert np.array_equal(log["Cash"], [1000, 500])
+    log.loc[0, "Cash"] = -1
+    assert seeded.get_transaction_log().loc[0, "Cash"] == 1000
+
+
+def test_broker_transaction_log_attribute():
+    """transaction_log reads as the DataFrame of the transactions, as before the columnar log."""
+    broker = CommoBroker(1000, verbose=False)
+    assert list(broker.transaction_log.columns) == TRANSACTION_COLUMNS and broker.transaction_log.empty
+
+    broker.update_pos("CORN", 1, 1, 10.0, 12.0, datetime(2025, 1, 2))  # opens the position
+    broker.update_pos("CORN", 1, 1, 10.0, 13.0, datetime(2025, 1, 3))
+
+    assert broker.transaction_log["Commodity"].tolist() == ["CORN"]
+    pd.testing.assert_frame_equal(broker.transaction_log, broker.get_transaction_log())
@@ -0,0 +1,115 @@
+from utils import IVStatus, OptionGreeks, OptionUtils, _ndtr_numpy, ndtr
+import math
+import pytest
+import numpy as np
+
+
+@pytest.fixture
+def book():
+    """Random mixed call/put book."""
+    rng = np.random.default_rng(42)
+    n = 200
+    return dict(
+        S=rng.uniform(50, 150, n),
+        K=rng.uniform(50, 150, n),
+        T=rng.uniform(0.05, 2.0, n),
+        r=0.03,
+        sigma=rng.uniform(0.1, 0.6, n),
+        is_call=rng.random(n) < 0.5,
+    )
+
+
+def test_price_and_greeks_matches_scalar_path(book):
+    """Batched prices and Greeks should match the per-call OptionUtils methods."""
+    greeks = OptionUtils.price_and_greeks(**book)
+
+    for i in range(len(book["S"])):
+        args = (book["S"][i], book["K"][i], book["T"][i], book["r"], book["sigma"][i])
+        option_type = "call" if book["is_call"][i] else "put"
+        assert np.isclose(greeks.price[i], OptionUtils.black_scholes_price(*args, option_type))
+        assert np.isclose(greeks.delta[i], OptionUtils.delta(*args, option_type))
+        assert np.isclose(greeks.gamma[i], OptionUtils.gamma(*args))
+        assert np.isclose(greeks.vega[i], OptionUtils.vega(*args))
+        assert np.isclose(greeks.theta[i], OptionUtils.theta(*args, option_type))
+
+
+def test_price_and_greeks_fills_out_buffers(book):
+    """Passing out= should write into (and return) the preallocated buffers."""
+    out = OptionGreeks.empty(len(book["S"]))
+    price_buffer = out.price
+
+    result = OptionUtils.price_and_greeks(out=out, **book)
+
+    assert result is out
+    assert result.price is price_buffer
+    np.testing.assert_allclose(result.price, OptionUtils.price_and_greeks(**book).price)
+
+
+def test_price_and_greeks_broadcasts_scalars():
+    """Scalar inputs broadcast against strike arrays."""
+    strikes = np.array([90.0, 100.0, 110.0])
+    greeks = OptionUtils.price_and_greeks(100, strikes, 1, 0.05, 0.2, is_call=False)
+
+    assert greeks.shape == (3,)
+    assert np.isclose(greeks.price[1], OptionUtils.black_scholes_price(100, 100, 1, 0.05, 0.2, "put"))
+
+
+def test_price_and_greeks_rejects_wrong_out_shape(book):
+    with pytest.raises(ValueError):
+        OptionUtils.price_and_greeks(out=OptionGreeks.empty(3), **book)
+
+
+def test_implied_volatility_recovers_sigma(book):
+    """Inverting batched prices should give back the volatilities used to price them."""
+    greeks = OptionUtils.price_and_greeks(**book)
+    result = OptionUtils.implied_volatility(greeks.price, book["S"], book["K"], book["T"], book["r"], book["is_call"])
+
+    identifiable = greeks.vega > 1e-2  # skip quotes whose premium barely depends on sigma
+    assert result.converged[identifiable].all()
+    np.testing.assert_allclose(result.sigma[identifiable], book["sigma"][identifiable], rtol=1e-6)
+
+
+def test_implied_volatility_flags_unsolvable_quotes():
+    """Arbitrage-violating and invalid quotes are reported per element, not raised."""
+    prices = np.array([10.0, 2.0, 150.0, np.nan, 10.0])
+    strikes = np.array([100.0, 50.0, 100.0, 100.0, -1.0])
+
+    result = OptionUtils.implied_volatility(prices, 100, strikes, 1, 0.0)
+
+    assert list(result.status) == [IVStatus.CONVERGED, IVStatus.BELOW_INTRINSIC, IVStatus.ABOVE_MAXIMUM,
+                                   IVStatus.INVALID_INPUT, IVStatus.INVALID_INPUT]
+    assert np.isfinite(result.sigma[0])
+    assert np.isnan(result.sigma[1:]).all()
+
+
+def test_implied_volatility_outside_the_bounds_is_not_converged():
+    """A root beyond sigma_bounds collapses the bracket on the bound, which must not pass as converged."""
+    S, K, T, r = 100.0, np.array([100.0, 100.0]), 1.0, 0.0
+    prices = OptionUtils.price_and_greeks(S, K, T, r, np.array([3.0, 0.5]), True).price
+
+    result = OptionUtils.implied_volatility(prices, S, K, T, r, sigma_bounds=(1e-6, 2.0))
+
+    assert list(result.status) == [IVStatus.OUT_OF_BOUNDS, IVStatus.CONVERGED]
+    assert np.isnan(result.sigma[0])
+    assert result.sigma[1] == pytest.approx(0.5)
+
+
+def test_ndtr_numpy_port_matches_scipy():
+    special = pytest.importorskip("scipy.special")
+    x = np.concatenate([np.linspace(-37, 37, 200_001), [0.0, -0.0, 1.4142135, -1.4142136, 11.3137, -11.3137]])
+    expected = special.ndtr(x)
+
+    result = _ndtr_numpy(x, np.empty_like(x))
+
+    central = np.abs(x) < 11
+    np.testing.assert_allclose(result[central], expected[central], rtol=1e-14, atol=0)
+    np.testing.assert_allclose(result, expected, rtol=1e-13, atol=0)
+    edges = np.array([np.inf, -np.inf, np.nan])
+    np.testing.assert_array_equal(_ndtr_numpy(edges, np.empty(3)), [1.0, 0.0, np.nan])
+
+
+def test_ndtr_scalars_and_in_place():
+    assert ndtr(0.3) == pytest.approx(0.5 * math.erfc(-0.3 / math.sqrt(2)), rel=1e-15)
+    x = np.array([-2.0, 0.0, 2.0])
+    assert ndtr(x, out=x) is x
+    np.testing.assert_allclose(x, [0.5 * math.erfc(v / math.sqrt(2)) for v in (2.0, 0.0, -2.0)], rtol=4e-15)
@@ -0,0 +1,185 @@
+import numpy as np
+import pandas as pd
+
+TRANSACTION_COLUMNS = ['Date', 'Action', 'Commodity', 'Near Term Qty', 'Long Term Qty', 'Spread', 'Cash', 'Portfolio Value']
+_LABEL_COLUMNS = ['Action', 'Commodity']
+_NUMERIC_COLUMNS = ['Near Term Qty', 'Long Term Qty', 'Spread', 'Cash', 'Portfolio Value']
+
+
+class TransactionLog:
+    """Append-only, columnar buffer behind CommoBroker's transaction log.
+
+    Rows are written into preallocated typed arrays that double in size when
+    full, so logging n transactions costs O(n) instead of the O(n^2) of
+    concatenating DataFrames. Action and Commodity are stored as integer codes
+    into small label tables. Dates are kept as UTC nanoseconds and the time
+    zone of the first aware date is stored once for the log. The DataFrame is only built by to_frame() and
+    cached until the next append; to_frame() hands out copies of it.
+    """
+
+    def __init__(self, capacity=1024):
+        self._size = 0
+        self._dates = np.empty(capacity, dtype=np.int64)  # nanoseconds since the epoch
+        self._tz = None  # time zone of the dates, None when they are naive
+        self._codes = {name: np.empty(capacity, dtype=np.int32) for name in _LABEL_COLUMNS}
+        self._labels = {name: [] for name in _LABEL_COLUMNS}
+        self._label_index = {name: {} for name in _LABEL_COLUMNS}
+        self._values = np.empty((len(_NUMERIC_COLUMNS), capacity))
+        self._frame = None
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        return len(self._dates)
+
+    def _reserve(self, n):
+        """Grow the buffers (at least doubling) so that n more rows fit."""
+        needed = self._size + n
+        if needed <= self.capacity:
+            return
+        capacity = max(needed, 2 * self.capacity)
+        dates = np.empty(capacity, dtype=np.int64)
+        dates[:self._size] = self._dates[:self._size]
+        self._dates = dates
+        for name, codes in self._codes.items():
+            self._codes[name] = np.empty(capacity, dtype=np.int32)
+            self._codes[name][:self._size] = codes[:self._size]
+        values = np.empty((len(_NUMERIC_COLUMNS), capacity))
+        values[:, :self._size] = self._values[:, :self._size]
+        self._values = values
+
+    def _code(self, column, label):
+        index = self._label_index[column]
+        code = index.get(label)
+        if code is None:
+            code = index[label] = len(self._labels[column])
+            self._labels[column].append(label)
+        return code
+
+    def append(self, date, action, commodity, near_qty, long_qty, spread, cash, portfolio_value):
+        """Log one transaction."""
+        if self._size == self.capacity:
+            self._reserve(1)
+        i = self._size
+        date = pd.Timestamp(date)
+        if self._tz is None and date.tz is not None:
+            self._tz = date.tz
+        self._dates[i] = date.value
+        self._codes['Action'][i] = self._code('Action', action)
+        self._codes['Commodity'][i] = self._code('Commodity', commodity)
+        values = self._values
+        values[0, i] = near_qty
+        values[1, i] = long_qty
+        values[2, i] = spread
+        values[3, i] = cash
+        values[4, i] = portfolio_value
+        self._size = i + 1
+        self._frame = None
+
+    def extend(self, columns):
+        """Log many transactions at once from a DataFrame or a dict of equal-length columns."""
+        n = len(columns['Date'])
+        if n == 0:
+            return
+        self._reserve(n)
+        rows = slice(self._size, self._size + n)
+        dates = pd.DatetimeIndex(columns['Date'])
+        if self._tz is None and dates.tz is not None:
+            self._tz = dates.tz
+        self._dates[rows] = dates.as_unit('ns').asi8
+        for name in _LABEL_COLUMNS:
+            inverse, labels = pd.factorize(columns[name])  # cheap for Categorical columns
+            mapping = np.array([self._code(name, label) for label in labels], dtype=np.int32)
+            self._codes[name][rows] = mapping[inverse]
+        for j, name in enumerate(_NUMERIC_COLUMNS):
+            self._values[j, rows] = np.asarray(columns[name], dtype=float)
+        self._size += n
+        self._frame = None
+
+    def set_portfolio_values(self, dates, values):
+        """Set the Portfolio Value of every row to values at the row's date (dates must be sorted)."""
+        n = self._size
+        if n == 0:
+            return
+        dates = pd.DatetimeIndex(dates).as_unit('ns').asi8
+        positions = np.searchsorted(dates, self._dates[:n])
+        found = positions < len(dates)
+        found[found] = dates[positions[found]] == self._dates[:n][found]
+        column = _NUMERIC_COLUMNS.index('Portfolio Value')
+        self._values[column, :n][found] = np.asarray(values, dtype=float)[positions[found]]
+        self._frame = None
+
+    def fill_portfolio_value(self, value, start=0):
+        """Set the Portfolio Value of the rows from start on to value."""
+        self._values[_NUMERIC_COLUMNS.index('Portfolio Value'), start:self._size] = value
+        self._frame = None
+
+    def clear(self):
+        """Drop every row, keeping the buffers and label tables for reuse."""
+        self._size = 0
+        self._frame = None
+
+    @classmethod
+    def from_frame(cls, frame):
+        """Build a log holding the rows of an existing transaction DataFrame."""
+        log = cls(capacity=max(1024, len(frame)))
+        if len(frame):
+            log.extend(frame)
+        return log
+
+    def to_arrays(self):
+        """Copy of the rows and label tables as a {name: array} dict of plain NumPy arrays, for snapshots."""
+        n = self._size
+        arrays = {'dates': self._dates[:n].copy(), 'values': self._values[:, :n].copy()}
+        for name in _LABEL_COLUMNS:
+            arrays[f'{name} codes'] = self._codes[name][:n].copy()
+            arrays[f'{name} labels'] = np.array(self._labels[name], dtype=str)
+        arrays['tz'] = np.array('' if self._tz is None else str(self._tz))
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Log holding the rows of to_arrays, with the same label codes."""
+        n = len(arrays['dates'])
+        log = cls(capacity=max(1024, n))
+        log._dates[:n] = arrays['dates']
+        log._values[:, :n] = arrays['values']
+        for name in _LABEL_COLUMNS:
+            log._codes[name][:n] = arrays[f'{name} codes']
+            for label in arrays[f'{name} labels']:
+                log._code(name, str(label))
+        log._tz = str(arrays['tz']) or None
+        log._size = n
+        return log
+
+    def records(self, start=0, stop=None):
+        """Rows start:stop as dicts keyed by the TRANSACTION_COLUMNS, without building the DataFrame."""
+        stop = self._size if stop is None else min(stop, self._size)
+        rows = []
+        for i in range(start, stop):
+            row = {'Date': pd.Timestamp(self._dates[i], tz=self._tz)}
+            for name in _LABEL_COLUMNS:
+                row[name] = self._labels[name][self._codes[name][i]]
+            for j, name in enumerate(_NUMERIC_COLUMNS):
+                row[name] = float(self._values[j, i])
+            rows.append(row)
+        return rows
+
+    def to_frame(self):
+        """Materialise the log as a DataFrame with the TRANSACTION_COLUMNS. Callers get a copy
+        they are free to modify."""
+        if self._frame is None:
+            n = self._size
+            if n == 0:
+                self._frame = pd.DataFrame(columns=TRANSACTION_COLUMNS)
+                return self._frame.copy()
+            dates = pd.to_datetime(self._dates[:n], unit='ns', utc=self._tz is not None)
+            columns = {'Date': dates if self._tz is None else dates.tz_convert(self._tz)}
+            for name in _LABEL_COLUMNS:
+                columns[name] = np.array(self._labels[name], dtype=object)[self._codes[name][:n]]
+            for j, name in enumerate(_NUMERIC_COLUMNS):
+                columns[name] = self._values[j, :n].copy()
+            self._frame = pd.DataFrame(columns, columns=TRANSACTION_COLUMNS)
+        return self._frame.copy()
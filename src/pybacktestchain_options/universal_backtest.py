@@ -2,41 +2,59 @@ import pandas as pd
 import logging
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from pybacktestchain.broker import Backtest, EndOfMonth, Information, StopLoss, Broker
 from broker import CommoBackTest, CommoBroker
 from data_module import COMMODITY_TICKER_PAIRS
 from pybacktestchain.utils import generate_random_name
 
+DEFAULT_COMMODITY_PAIRS = {
+    "OIL": {"Near Term": "CL=F", "Long Term": "CLM25.NYM"},  # Crude Oil
+    "GAS": {"Near Term": "NG=F", "Long Term": "NGM25.NYM"},  # Natural Gas
+    "WHEAT": {"Near Term": "ZW=F", "Long Term": "ZWN25.CBT"}, # Wheat
+    "CORN": {"Near Term": "ZC=F", "Long Term": "ZCN25.CBT"}  # Corn
+}
+
 @dataclass
 class UniversalBackTest():
     initial_date: datetime
     final_date: datetime
     commo_equity: str = "COMMO" #or "EQUITY"
-    commodity_pairs: dict = field(default_factory=lambda: {
-        "OIL": {"Near Term": "CL=F", "Long Term": "CLM25.NYM"},  # Crude Oil
-        "GAS": {"Near Term": "NG=F", "Long Term": "NGM25.NYM"},  # Natural Gas
-        "WHEAT": {"Near Term": "ZW=F", "Long Term": "ZWN25.CBT"}, # Wheat
-        "CORN": {"Near Term": "ZC=F", "Long Term": "ZCN25.CBT"}  # Corn
-    })
+    commodity_pairs: dict = field(default_factory=lambda: {name: dict(legs) for name, legs in DEFAULT_COMMODITY_PAIRS.items()})
     cash: float = 1000000  # Initial cash in the portfolio
     verbose: bool = True
     universe = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META', 'TSLA', 'NVDA', 'INTC', 'CSCO', 'NFLX']
-    information_class : type  = Information
+    information_class : type  = None  # pybacktestchain's Information when None
     s: timedelta = timedelta(days=360)
     time_column: str = 'Date'
     company_column: str = 'ticker'
     adj_close_column : str ='Adj Close'
-    rebalance_flag : type = EndOfMonth
-    risk_model : type = StopLoss
+    rebalance_flag : type = None  # pybacktestchain's EndOfMonth when None
+    risk_model : type = None  # pybacktestchain's StopLoss when None
     initial_cash: int = 1000000  # Initial cash in the portfolio
     name_blockchain: str = 'backtest'
     verbose: bool = True
+    cache_dir: str = None  # local market data cache for the COMMO backtest
+    offline: bool = False
+    max_workers: int = None  # concurrent market data fetches for the COMMO backtest
+    backtest_name: str = None  # random when None
+    engine: str = 'loop'  # spread engine of the COMMO backtest, see CommoBackTest
+    provider: object = None  # market data provider of the COMMO backtest
+    data: pd.DataFrame = None  # preloaded commodity data of the COMMO backtest
+    listener: object = None  # event callback of the COMMO backtest, see CommoBackTest
+    instrumentation: object = None  # Instrumentation of the run, per stage for COMMO, see CommoBackTest
+    checkpoint_dir: str = None  # resumable snapshots of the COMMO backtest, see CommoBackTest
+    checkpoint_every: int = 250
 
     def __post_init__(self):
-        self.backtest_name = generate_random_name()
+        if self.backtest_name is None:
+            self.backtest_name = generate_random_name()
         
     def define_backtest(self):
         if self.commo_equity == "EQUITY":
+            # imported here, pybacktestchain's broker downloads its ticker list on import
+            from pybacktestchain.broker import Backtest, Broker, EndOfMonth, Information, StopLoss
+            self.information_class = self.information_class or Information
+            self.rebalance_flag = self.rebalance_flag or EndOfMonth
+            self.risk_model = self.risk_model or StopLoss
             self.broker = Broker(cash=self.initial_cash, verbose=self.verbose)
             self.broker.initialize_blockchain(self.name_blockchain)
             self.backtest = Backtest(
@@ -62,14 +80,29 @@ class UniversalBackTest():
                                      self.commodity_pairs,
                                      self.cash,
                                      self.verbose,
-                                     self.backtest_name)
+                                     self.backtest_name,
+                                     name_blockchain=self.name_blockchain,
+                                     cache_dir=self.cache_dir,
+                                     offline=self.offline,
+                                     max_workers=self.max_workers,
+                                     provider=self.provider,
+                                     engine=self.engine,
+                                     data=self.data,
+                                     listener=self.listener,
+                                     instrumentation=self.instrumentation,
+                                     checkpoint_dir=self.checkpoint_dir,
+                                     checkpoint_every=self.checkpoint_every)
 
         else:
             pass
 
     def run_backtest(self):
         self.define_backtest()
-        self.backtest.run_backtest()
+        if self.commo_equity != "EQUITY" or self.instrumentation is None:
+            return self.backtest.run_backtest()
+        # pybacktestchain's backtest is timed as a single stage
+        with self.instrumentation, self.instrumentation.stage('backtest'):
+            return self.backtest.run_backtest()
 
 
     
\ No newline at end of file
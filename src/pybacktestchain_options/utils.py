@@ -1,5 +1,177 @@
+import math
+
 import numpy as np
-from scipy.stats import norm
+from dataclasses import dataclass, field
+from enum import IntEnum
+
+_INV_SQRT_2PI = 1.0 / np.sqrt(2.0 * np.pi)
+_SQRT_HALF = np.sqrt(0.5)
+
+# Rational approximations of erf / erfc from Cephes (ndtr.c), the ones behind
+# scipy.special.ndtr: erf on |x| < 1, erfc on 1 <= |x| < 8 and on |x| >= 8.
+_ERF_T = [9.60497373987051638749E0, 9.00260197203842689217E1, 2.23200534594684319226E3,
+          7.00332514112805075473E3, 5.55923013010394962768E4]
+_ERF_U = [1.0, 3.35617141647503099647E1, 5.21357949780152679795E2, 4.59432382970980127987E3,
+          2.26290000613890934246E4, 4.92673942608635921086E4]
+_ERFC_P = [2.46196981473530512524E-10, 5.64189564831068821977E-1, 7.46321056442269912687E0,
+           4.86371970985681366614E1, 1.96520832956077098242E2, 5.26445194995477358631E2,
+           9.34528527171957607540E2, 1.02755188689515710272E3, 5.57535335369399327526E2]
+_ERFC_Q = [1.0, 1.32281951154744992508E1, 8.67072140885989742329E1, 3.54937778887819891062E2,
+           9.75708501743205489753E2, 1.82390916687909736289E3, 2.24633760818710981792E3,
+           1.65666309194161350182E3, 5.57535340817727675546E2]
+_ERFC_R = [5.64189583547755073984E-1, 1.27536670759978104416E0, 5.01905042251180477414E0,
+           6.16021097993053585195E0, 7.40974269950448939160E0, 2.97886665372100240670E0]
+_ERFC_S = [1.0, 2.26052863220117276590E0, 9.39603524938001434673E0, 1.20489539808096656605E1,
+           1.70814450747565897222E1, 9.60896809063285878198E0, 3.36907645100081516050E0]
+
+
+def _polevl(x, coefficients):
+    result = np.full_like(x, coefficients[0])
+    for c in coefficients[1:]:
+        result *= x
+        result += c
+    return result
+
+
+def _exp_minus_square(a):
+    """exp(-a^2) without the rounding error of a^2: a = m + f with m^2 exact (Cephes expx2)."""
+    m = np.round(a * 128.0) / 128.0
+    f = a - m
+    return np.exp(-m * m) * np.exp(-(2.0 * m + f) * f)
+
+
+def _ndtr_numpy(x, out):
+    """NumPy port of Cephes ndtr, elementwise on a float array x (out may be x)."""
+    z = x * _SQRT_HALF
+    a = np.abs(z)
+
+    # 0.5 erfc(|z|) on 1 <= |z| < 8, where |z| < 1 is replaced by the erf branch below
+    t = np.clip(a, 1.0, 8.0)
+    tail = _polevl(t, _ERFC_P)
+    tail /= _polevl(t, _ERFC_Q)
+    with np.errstate(under='ignore'):
+        tail *= _exp_minus_square(t)
+    tail *= 0.5
+    np.subtract(1.0, tail, out=tail, where=z > 0)
+
+    # 0.5 + 0.5 erf(z) on |z| < 1
+    zz = np.minimum(z * z, 1.0)
+    central = _polevl(zz, _ERF_T)
+    central /= _polevl(zz, _ERF_U)
+    central *= z
+    central *= 0.5
+    central += 0.5
+
+    np.copyto(out, central)
+    np.copyto(out, tail, where=a >= 1.0)
+
+    far = np.flatnonzero(a >= 8.0)
+    if far.size:
+        af, positive = a.flat[far], z.flat[far] > 0
+        r = np.minimum(af, 40.0)
+        ratio = 0.5 * _polevl(r, _ERFC_R) / _polevl(r, _ERFC_S)
+        with np.errstate(under='ignore', divide='ignore', invalid='ignore'):
+            v = _exp_minus_square(af) * ratio
+            # past |z| ~ 26 exp(-z^2) alone underflows, fold the ratio into the exponent
+            deep = af > 26.0
+            v[deep] = np.exp(np.log(ratio[deep]) - af[deep] * af[deep])
+        out.flat[far] = np.where(positive, 1.0 - v, v)
+    out[np.isnan(x)] = np.nan
+    return out
+
+
+_FAST_NDTR = None
+
+
+def _fast_ndtr():
+    """scipy.special.ndtr when scipy is installed, imported on first use, else the NumPy port."""
+    global _FAST_NDTR
+    try:
+        from scipy.special import ndtr as scipy_ndtr
+        _FAST_NDTR = scipy_ndtr
+    except ImportError:
+        _FAST_NDTR = _ndtr_numpy
+    return _FAST_NDTR
+
+
+def ndtr(x, out=None):
+    """
+    Standard normal cumulative distribution function, elementwise.
+
+    Importing this module does not import scipy: scalars go through
+    math.erfc, arrays through scipy.special.ndtr (a compiled ufunc, imported
+    on the first array call) when scipy is installed, and otherwise through
+    a NumPy port of the Cephes approximations (within 1e-15 relative of
+    scipy for |x| < 8 and within the ~1e-14 of Cephes' erfc in the far
+    tails, about 3x slower). ``out`` may be ``x``.
+
+    :param x: Array (or scalar) of points
+    :param out: Optional float array of the shape of x to write into
+    :return: N(x), as an array (a float64 scalar for scalar input)
+    """
+    if out is None:
+        if np.ndim(x) == 0:
+            return np.float64(0.5 * math.erfc(-float(x) * _SQRT_HALF))
+        out = np.empty(np.shape(x))
+    return (_FAST_NDTR or _fast_ndtr())(np.asarray(x, dtype=float), out=out)
+
+
+def norm_pdf(x):
+    """Standard normal density, elementwise."""
+    x = np.asarray(x, dtype=float)
+    return _INV_SQRT_2PI * np.exp(-0.5 * x * x)
+
+
+@dataclass
+class OptionGreeks:
+    """
+    Prices and Greeks of a batch of vanilla options, one array per quantity.
+
+    Use OptionGreeks.empty(shape) to preallocate buffers that can be passed
+    as ``out=`` to OptionUtils.price_and_greeks and reused across calls.
+    """
+    price: np.ndarray
+    delta: np.ndarray
+    gamma: np.ndarray
+    vega: np.ndarray
+    theta: np.ndarray
+    work: np.ndarray = field(default=None, repr=False)
+
+    @classmethod
+    def empty(cls, shape):
+        """Allocate uninitialised output and scratch buffers for a batch of the given shape."""
+        shape = (shape,) if np.isscalar(shape) else tuple(shape)
+        return cls(*(np.empty(shape) for _ in range(5)), work=np.empty((3,) + shape))
+
+    @property
+    def shape(self):
+        return self.price.shape
+
+
+class IVStatus(IntEnum):
+    """Per-quote outcome of OptionUtils.implied_volatility."""
+    CONVERGED = 0
+    BELOW_INTRINSIC = 1   # premium at or below the no-arbitrage lower bound
+    ABOVE_MAXIMUM = 2     # premium at or above the no-arbitrage upper bound
+    NOT_CONVERGED = 3     # max_iter reached without meeting the tolerance
+    INVALID_INPUT = 4     # non-positive / non-finite S, K, T or price
+    OUT_OF_BOUNDS = 5     # the implied volatility lies outside sigma_bounds
+
+
+@dataclass
+class ImpliedVolResult:
+    """
+    Implied volatilities of a batch of quotes.
+
+    ``sigma`` is NaN wherever ``status`` is not IVStatus.CONVERGED.
+    """
+    sigma: np.ndarray
+    status: np.ndarray
+    iterations: int
+
+    @property
+    def converged(self):
+        return self.status == IVStatus.CONVERGED
 
 
 class OptionUtils:
@@ -24,9 +196,9 @@ class OptionUtils:
         d2 = d1 - sigma * np.sqrt(T)
 
         if option_type == "call":
-            return S * norm.cdf(d1) - K * np.exp(-r * T) * norm.cdf(d2)
+            return S * ndtr(d1) - K * np.exp(-r * T) * ndtr(d2)
         elif option_type == "put":
-            return K * np.exp(-r * T) * norm.cdf(-d2) - S * norm.cdf(-d1)
+            return K * np.exp(-r * T) * ndtr(-d2) - S * ndtr(-d1)
         else:
             raise ValueError("option_type must be 'call' or 'put'")
 
@@ -45,9 +217,9 @@ class OptionUtils:
         """
         d1 = (np.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * np.sqrt(T))
         if option_type == "call":
-            return norm.cdf(d1)
+            return ndtr(d1)
         elif option_type == "put":
-            return norm.cdf(d1) - 1
+            return ndtr(d1) - 1
         else:
             raise ValueError("option_type must be 'call' or 'put'")
 
@@ -64,7 +236,7 @@ class OptionUtils:
         :return: Gamma value
         """
         d1 = (np.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * np.sqrt(T))
-        return norm.pdf(d1) / (S * sigma * np.sqrt(T))
+        return norm_pdf(d1) / (S * sigma * np.sqrt(T))
 
     @staticmethod
     def vega(S, K, T, r, sigma):
@@ -79,7 +251,7 @@ class OptionUtils:
         :return: Vega value (per 1% volatility change)
         """
         d1 = (np.log(S / K) + (r + 0.5 * sigma**2) * T) / (sigma * np.sqrt(T))
-        return S * norm.pdf(d1) * np.sqrt(T) / 100
+        return S * norm_pdf(d1) * np.sqrt(T) / 100
 
     @staticmethod
     def theta(S, K, T, r, sigma, option_type="call"):
@@ -99,14 +271,204 @@ class OptionUtils:
 
         if option_type == "call":
             theta = (
-                -S * norm.pdf(d1) * sigma / (2 * np.sqrt(T))
-                - r * K * np.exp(-r * T) * norm.cdf(d2)
+                -S * norm_pdf(d1) * sigma / (2 * np.sqrt(T))
+                - r * K * np.exp(-r * T) * ndtr(d2)
             )
         elif option_type == "put":
             theta = (
-                -S * norm.pdf(d1) * sigma / (2 * np.sqrt(T))
-                + r * K * np.exp(-r * T) * norm.cdf(-d2)
+                -S * norm_pdf(d1) * sigma / (2 * np.sqrt(T))
+                + r * K * np.exp(-r * T) * ndtr(-d2)
             )
         else:
             raise ValueError("option_type must be 'call' or 'put'")
         return theta / 365  # Convert to per-day value
+
+    @staticmethod
+    def price_and_greeks(S, K, T, r, sigma, is_call=True, out=None):
+        """
+        Price a batch of vanilla options and compute all their Greeks in one pass.
+
+        Inputs are broadcast against each other, so a whole book can be passed
+        as NumPy arrays. d1/d2, sqrt(T), the discounted strike and the normal
+        density are computed once and shared by every output. When ``out`` is
+        given, every intermediate is written into its buffers and nothing is
+        allocated.
+
+        :param S: Current stock price(s)
+        :param K: Strike price(s)
+        :param T: Time(s) to maturity (in years)
+        :param r: Risk-free interest rate(s)
+        :param sigma: Volatility(ies) of the underlying asset
+        :param is_call: True for calls, False for puts (scalar or boolean mask)
+        :param out: Optional OptionGreeks from OptionGreeks.empty(shape), filled in place
+        :return: OptionGreeks with price, delta, gamma, vega (per 1%) and theta (per day)
+        """
+        shape = np.broadcast_shapes(np.shape(S), np.shape(K), np.shape(T),
+                                    np.shape(r), np.shape(sigma), np.shape(is_call))
+        if out is None:
+            out = OptionGreeks.empty(shape)
+        elif out.shape != shape or out.work is None:
+            raise ValueError(f"out buffers must have shape {shape}")
+
+        sqrt_t, vol_t, x = (out.work[i, ...] for i in range(3))
+        phi = out.vega    # +1 for calls, -1 for puts (vega is filled last)
+        pdf = out.gamma   # normal density at d1 (turned into gamma at the end)
+        disc_k = out.theta
+
+        np.copyto(phi, -1.0)
+        np.copyto(phi, 1.0, where=np.asarray(is_call, dtype=bool))
+        np.sqrt(T, out=sqrt_t)
+        np.multiply(sigma, sqrt_t, out=vol_t)
+
+        # d1 = (log(S/K) + (r + sigma^2/2) T) / (sigma sqrt(T)), built in x
+        np.multiply(sigma, sigma, out=pdf)
+        pdf *= 0.5
+        pdf += r
+        pdf *= T
+        np.divide(S, K, out=x)
+        np.log(x, out=x)
+        x += pdf
+        x /= vol_t
+
+        np.square(x, out=pdf)
+        pdf *= -0.5
+        np.exp(pdf, out=pdf)
+        pdf *= _INV_SQRT_2PI
+
+        np.multiply(phi, x, out=out.delta)
+        ndtr(out.delta, out=out.delta)              # N(phi d1)
+
+        x -= vol_t                                  # d2
+        x *= phi
+        ndtr(x, out=x)                              # N(phi d2)
+        np.multiply(r, T, out=disc_k)
+        np.negative(disc_k, out=disc_k)
+        np.exp(disc_k, out=disc_k)
+        disc_k *= K
+        x *= disc_k                                 # K e^{-rT} N(phi d2)
+
+        np.multiply(S, out.delta, out=out.price)
+        out.price -= x
+        out.price *= phi
+        out.delta *= phi
+
+        x *= r
+        x *= phi
+        np.multiply(S, pdf, out=out.theta)
+        out.theta *= sigma
+        out.theta /= sqrt_t
+        out.theta *= -0.5
+        out.theta -= x
+        out.theta /= 365
+
+        np.multiply(S, pdf, out=out.vega)
+        out.vega *= sqrt_t
+        out.vega /= 100
+        pdf /= S
+        pdf /= vol_t                                # gamma
+        return out
+
+    @staticmethod
+    def implied_volatility(price, S, K, T, r, is_call=True, tol=1e-10, max_iter=100,
+                           sigma_bounds=(1e-6, 10.0)):
+        """
+        Invert Black-Scholes prices to implied volatilities for a whole chain at once.
+
+        Starts from the Corrado-Miller rational approximation, then takes Halley
+        steps (Newton when the Halley correction is unreliable) using the vega of
+        OptionUtils.price_and_greeks. Each quote keeps a volatility bracket and
+        falls back to bisection when a step would leave it. Converged quotes are
+        dropped from later iterations. Quotes that cannot be solved are flagged
+        in ``status`` instead of raising.
+
+        :param price: Market premium(s)
+        :param S: Current stock price(s)
+        :param K: Strike price(s)
+        :param T: Time(s) to maturity (in years)
+        :param r: Risk-free interest rate(s)
+        :param is_call: True for calls, False for puts (scalar or boolean mask)
+        :param tol: Relative tolerance on the premium
+        :param max_iter: Maximum number of refinement steps
+        :param sigma_bounds: Volatility search interval
+        :return: ImpliedVolResult with sigma, per-quote IVStatus and iteration count
+        """
+        arrays = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (price, S, K, T, r)),
+                                     np.asarray(is_call, dtype=bool))
+        shape = arrays[0].shape
+        price, S, K, T, r, is_call = (a.ravel() for a in arrays)
+
+        sigma = np.full(price.shape, np.nan)
+        status = np.full(price.shape, IVStatus.NOT_CONVERGED, dtype=np.int8)
+
+        valid = (np.isfinite(price) & np.isfinite(S) & np.isfinite(K) & np.isfinite(T)
+                 & np.isfinite(r) & (S > 0) & (K > 0) & (T > 0) & (price >= 0))
+        status[~valid] = IVStatus.INVALID_INPUT
+        with np.errstate(invalid="ignore", over="ignore"):
+            disc_k = K * np.exp(-r * T)
+            lower = np.where(is_call, np.maximum(S - disc_k, 0.0), np.maximum(disc_k - S, 0.0))
+            upper = np.where(is_call, S, disc_k)
+        below = valid & (price <= lower)
+        above = valid & ~below & (price >= upper)
+        status[below] = IVStatus.BELOW_INTRINSIC
+        status[above] = IVStatus.ABOVE_MAXIMUM
+
+        idx = np.flatnonzero(valid & ~below & ~above)
+        p, s, k, t, rr, c, dk = (a[idx] for a in (price, S, K, T, r, is_call, disc_k))
+
+        # Corrado-Miller initial guess, on the call premium implied by put-call parity
+        call = np.where(c, p, p + s - dk)
+        half = call - 0.5 * (s - dk)
+        disc = np.maximum(half**2 - (s - dk)**2 / np.pi, 0.0)
+        vol = np.sqrt(2.0 * np.pi / t) / (s + dk) * (half + np.sqrt(disc))
+        lo = np.full(idx.shape, sigma_bounds[0])
+        hi = np.full(idx.shape, sigma_bounds[1])
+        vol = np.clip(np.nan_to_num(vol, nan=0.2), lo * 10, hi / 2)
+
+        iterations = 0
+        while idx.size and iterations < max_iter:
+            iterations += 1
+            greeks = OptionUtils.price_and_greeks(s, k, t, rr, vol, c)
+            diff = greeks.price - p
+            done = np.abs(diff) <= tol * p
+            if done.any():
+                sigma[idx[done]] = vol[done]
+                status[idx[done]] = IVStatus.CONVERGED
+                keep = ~done
+                idx, p, s, k, t, rr, c, vol, lo, hi, diff = (
+                    a[keep] for a in (idx, p, s, k, t, rr, c, vol, lo, hi, diff))
+                vega = greeks.vega[keep] * 100
+            else:
+                vega = greeks.vega * 100
+
+            # the premium increases with volatility, so the sign of diff tightens the bracket
+            np.copyto(hi, vol, where=diff > 0)
+            np.copyto(lo, vol, where=diff < 0)
+
+            with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+                newton = diff / vega
+                sqrt_t = np.sqrt(t)
+                d1 = (np.log(s / k) + (rr + 0.5 * vol**2) * t) / (vol * sqrt_t)
+                d2 = d1 - vol * sqrt_t
+                # Halley: volga / vega = d1 d2 / sigma
+                denom = 1.0 - 0.5 * newton * d1 * d2 / vol
+                step = np.where(denom > 0.5, newton / denom, newton)
+                candidate = vol - step
+            inside = np.isfinite(candidate) & (candidate > lo) & (candidate < hi)
+            vol = np.where(inside, candidate, 0.5 * (lo + hi))
+
+            stalled = (hi - lo) <= 1e-15 * hi
+            if stalled.any():
+                # the bracket collapsed: on the root, or on a bound when the root lies outside sigma_bounds
+                residual = np.abs(OptionUtils.price_and_greeks(s[stalled], k[stalled], t[stalled], rr[stalled],
+                                                               vol[stalled], c[stalled]).price - p[stalled])
+                solved = residual <= tol * p[stalled]
+                at_bound = ((vol[stalled] <= sigma_bounds[0] * (1 + 1e-12))
+                            | (vol[stalled] >= sigma_bounds[1] * (1 - 1e-12)))
+                sigma[idx[stalled][solved]] = vol[stalled][solved]
+                status[idx[stalled]] = np.where(solved, IVStatus.CONVERGED,
+                                                np.where(at_bound, IVStatus.OUT_OF_BOUNDS, IVStatus.NOT_CONVERGED))
+                keep = ~stalled
+                idx, p, s, k, t, rr, c, vol, lo, hi = (
+                    a[keep] for a in (idx, p, s, k, t, rr, c, vol, lo, hi))
+
+        return ImpliedVolResult(sigma.reshape(shape), status.reshape(shape), iterations)